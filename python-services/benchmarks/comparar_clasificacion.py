@@ -0,0 +1,163 @@
+"""
+🏞️ CLASIFICACIÓN DE ESCENA VS DETECCIÓN CON CAJAS DE IMAGEN COMPLETA
+Compara los dos modelos que produce entrenar_modelo.py sobre las mismas
+imágenes de validación: las de dataset_clasificacion/val/<categoría> que
+tampoco están en el split de entrenamiento del detector (dataset_yolo; los
+dos datasets usan el mismo split por hash, así que casi siempre son todas):
+  - precisión: categoría top-1 del clasificador frente a la clase de la
+    detección más confiada del detector (sin detección cuenta como fallo)
+  - latencia de inferencia por frame (p50 / p95)
+  - tiempo de entrenamiento (de los .json que guarda entrenar_modelo.py)
+
+Uso:
+  python comparar_clasificacion.py
+  python comparar_clasificacion.py --detector modelo_rover_custom.pt --clasificador modelo_rover_clasificador.pt
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from vision.clasificacion import imgsz_entrenamiento
+from vision.dataset import splits_guardados
+from vision.detecciones import Detecciones
+from vision.modelos import BACKENDS, cargar_modelo
+
+BASE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..")
+VALIDACION = os.path.join(BASE, "dataset_clasificacion", "val")
+DATASET_YOLO = os.path.join(BASE, "dataset_yolo")
+EXTENSIONES = ('.jpg', '.jpeg', '.png')
+
+
+def cargar_validacion(directorio):
+    """[(ruta, categoría)] de las carpetas de validación"""
+    muestras = []
+    for categoria in sorted(os.listdir(directorio)):
+        carpeta = os.path.join(directorio, categoria)
+        if os.path.isdir(carpeta):
+            muestras += [(os.path.join(carpeta, f), categoria) for f in sorted(os.listdir(carpeta))
+                         if f.lower().endswith(EXTENSIONES)]
+    return muestras
+
+
+def sin_entrenamiento_detector(muestras, yolo_path):
+    """Quita las muestras que el detector vio al entrenar (split 'train' de dataset_yolo)"""
+    splits = splits_guardados(yolo_path)
+    if not splits:
+        print(f"⚠️  Sin estado de {yolo_path}: no se puede comprobar que el detector no las haya visto")
+        return muestras
+    return [(ruta, categoria) for ruta, categoria in muestras
+            if splits.get(f"{categoria}/{os.path.basename(ruta)}") != 'train']
+
+
+def metadatos(pesos):
+    try:
+        with open(os.path.splitext(pesos)[0] + '.json') as f:
+            return json.load(f)
+    except OSError:
+        return {}
+
+
+def evaluar(nombre, predecir, muestras):
+    """Precisión global y por categoría, y latencia de `predecir(frame) → categoría`"""
+    aciertos = {}
+    latencias = []
+    for ruta, categoria in muestras:
+        frame = cv2.imread(ruta, cv2.IMREAD_COLOR)
+        t0 = time.perf_counter()
+        prediccion = predecir(frame)
+        latencias.append((time.perf_counter() - t0) * 1000)
+        aciertos.setdefault(categoria, []).append(prediccion == categoria)
+
+    # Las primeras inferencias incluyen inicialización: fuera de la latencia
+    latencias = np.array(latencias[3:] or latencias)
+    total = [a for lista in aciertos.values() for a in lista]
+    return {
+        'modelo': nombre,
+        'precision': round(float(np.mean(total)), 4),
+        'precision_por_categoria': {c: round(float(np.mean(a)), 4) for c, a in aciertos.items()},
+        'latencia_p50_ms': round(float(np.percentile(latencias, 50)), 2),
+        'latencia_p95_ms': round(float(np.percentile(latencias, 95)), 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Clasificador de escena frente a detector de imagen completa")
+    parser.add_argument("--detector", default="modelo_rover_custom.pt")
+    parser.add_argument("--clasificador", default="modelo_rover_clasificador.pt")
+    parser.add_argument("--backend", default="onnx", choices=BACKENDS)
+    parser.add_argument("--validacion", default=VALIDACION, help="Carpeta val/<categoría>")
+    parser.add_argument("--yolo", default=DATASET_YOLO, help="Dataset YOLO con el que se entrenó el detector")
+    parser.add_argument("--salida", default=None, help="Guardar resultados en JSON")
+    args = parser.parse_args()
+
+    muestras = cargar_validacion(args.validacion)
+    if not muestras:
+        print(f"❌ No hay imágenes de validación en {args.validacion}")
+        print("   Entrena el clasificador con entrenar_modelo.py para generarlas")
+        return
+    if os.path.exists(args.detector):
+        # Las dos precisiones se miden sobre imágenes que ninguno de los dos modelos vio
+        antes = len(muestras)
+        muestras = sin_entrenamiento_detector(muestras, args.yolo)
+        if len(muestras) < antes:
+            print(f"🧹 {antes - len(muestras)} imágenes excluidas: están en el entrenamiento del detector")
+        if not muestras:
+            print("❌ No quedan imágenes de validación comunes a los dos modelos")
+            return
+    print(f"🎞️  {len(muestras)} imágenes de validación\n")
+
+    resultados = []
+
+    if os.path.exists(args.clasificador):
+        imgsz = imgsz_entrenamiento(args.clasificador)
+        clasificador = cargar_modelo(args.clasificador, args.backend, imgsz, task='classify')
+
+        def clasificar(frame):
+            resultado = clasificador.predict(frame, verbose=False, imgsz=imgsz)[0]
+            return resultado.names[int(resultado.probs.top1)]
+
+        print("⏱️  Clasificador...")
+        r = evaluar('clasificacion', clasificar, muestras)
+        r.update(imgsz=imgsz, entrenamiento_s=metadatos(args.clasificador).get('segundos_entrenamiento'))
+        resultados.append(r)
+    else:
+        print(f"⚠️ No existe {args.clasificador}, se omite")
+
+    if os.path.exists(args.detector):
+        imgsz = metadatos(args.detector).get('imgsz', 320)
+        detector = cargar_modelo(args.detector, args.backend, imgsz)
+
+        def detectar(frame):
+            detecciones = Detecciones.desde_resultado(detector.predict(frame, verbose=False, conf=0.01, imgsz=imgsz)[0])
+            if len(detecciones) == 0:
+                return None
+            return detecciones.etiquetas()[int(np.argmax(detecciones.confianzas))]
+
+        print("⏱️  Detector...")
+        r = evaluar('deteccion', detectar, muestras)
+        r.update(imgsz=imgsz, entrenamiento_s=metadatos(args.detector).get('segundos_entrenamiento'))
+        resultados.append(r)
+    else:
+        print(f"⚠️ No existe {args.detector}, se omite")
+
+    print("\n📊 RESULTADOS")
+    for r in resultados:
+        entrenamiento = f"{r['entrenamiento_s'] / 60:.1f} min" if r['entrenamiento_s'] else "N/D"
+        print(f"   {r['modelo']:14} precisión {r['precision'] * 100:5.1f}% | p50 {r['latencia_p50_ms']:6.1f} ms | "
+              f"p95 {r['latencia_p95_ms']:6.1f} ms | imgsz {r['imgsz']} | entrenamiento {entrenamiento}")
+
+    if args.salida:
+        with open(args.salida, 'w') as f:
+            json.dump({'parametros': vars(args), 'resultados': resultados}, f, indent=2)
+        print(f"\n✅ Resultados guardados en {args.salida}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""
+🎯 EVALUACIÓN DEL MODO HÍBRIDO DETECTOR + TRACKER
+Compara, sobre una grabación de grabar_video.py, la caja del objetivo que
+obtiene el modo híbrido (YOLO cada N frames + flujo óptico) con la del modo
+de detección completa (YOLO en todos los frames), y el CPU usado por frame.
+
+Uso:
+  python evaluar_seguidor.py grabaciones/sesion --clase person --cada 5
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from vision.detecciones import Detecciones
+from vision.grabacion import LectorGrabacion
+from vision.modelos import BACKENDS, cargar_modelo
+from vision.seguimiento import SeguidorHibrido, a_gris_reducido, iou
+
+
+def detectar_objetivo(modelo, frame, clase, anterior, imgsz, conf):
+    """Caja del objetivo como la elige CamaraModerna: la más cercana a la anterior o la más grande"""
+    results = modelo.predict(frame, verbose=False, conf=conf, iou=0.5, imgsz=imgsz)
+    candidatos = Detecciones.desde_resultado(results[0]).de_clase(clase)
+    if len(candidatos) == 0:
+        return None, 0.0
+
+    i = candidatos.indice_mas_cercano(anterior) if anterior is not None else candidatos.indice_mas_grande()
+    return tuple(candidatos.cajas[i].tolist()), float(candidatos.confianzas[i])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Precisión y CPU del modo híbrido frente a detección completa")
+    parser.add_argument("grabacion")
+    parser.add_argument("--clase", default="person")
+    parser.add_argument("--cada", type=int, default=5, help="Frames entre detecciones en modo híbrido")
+    parser.add_argument("--modelo", default="yolo11m.pt")
+    parser.add_argument("--backend", default="onnx", choices=BACKENDS)
+    parser.add_argument("--imgsz", type=int, default=640)
+    parser.add_argument("--conf", type=float, default=0.45)
+    parser.add_argument("--max-frames", type=int, default=0)
+    parser.add_argument("--salida", default=None, help="Guardar informe JSON")
+    args = parser.parse_args()
+
+    modelo = cargar_modelo(args.modelo, args.backend, args.imgsz)
+    lector = LectorGrabacion(args.grabacion)
+    total = len(lector) if not args.max_frames else min(len(lector), args.max_frames)
+    print(f"🎞️  {total} frames de {args.grabacion} | objetivo: {args.clase}")
+
+    # 1. Referencia: detección en todos los frames
+    referencia = []
+    anterior = None
+    cpu_ref = time.process_time()
+    for i in range(total):
+        frame = cv2.imdecode(np.frombuffer(lector.leer(i)[1], np.uint8), cv2.IMREAD_COLOR)
+        caja, _ = detectar_objetivo(modelo, frame, args.clase, anterior, args.imgsz, args.conf)
+        referencia.append(caja)
+        anterior = caja or anterior
+    cpu_ref = (time.process_time() - cpu_ref) / total * 1000
+
+    # 2. Modo híbrido
+    seguidor = SeguidorHibrido(detectar_cada=args.cada)
+    hibrido = []
+    detecciones = 0
+    cpu_hib = time.process_time()
+    for i in range(total):
+        frame = cv2.imdecode(np.frombuffer(lector.leer(i)[1], np.uint8), cv2.IMREAD_COLOR)
+        caja = seguidor.agregar_frame(i, a_gris_reducido(frame, seguidor.escala))
+        if seguidor.necesita_deteccion():
+            detecciones += 1
+            encontrada, conf = detectar_objetivo(modelo, frame, args.clase, seguidor.caja, args.imgsz, args.conf)
+            if encontrada is None:
+                seguidor.perder()
+                caja = None
+            else:
+                caja = seguidor.anclar(i, encontrada, conf)
+        hibrido.append(caja)
+    cpu_hib = (time.process_time() - cpu_hib) / total * 1000
+    lector.cerrar()
+
+    # 3. Métricas sobre los frames donde la referencia ve el objetivo
+    ious = []
+    errores_centro = []
+    encontrados = 0
+    con_objetivo = 0
+    for ref, hib in zip(referencia, hibrido):
+        if ref is None:
+            continue
+        con_objetivo += 1
+        if hib is None:
+            ious.append(0.0)
+            continue
+        encontrados += 1
+        ious.append(iou(ref, hib))
+        errores_centro.append(np.hypot((ref[0] + ref[2] - hib[0] - hib[2]) / 2,
+                                       (ref[1] + ref[3] - hib[1] - hib[3]) / 2))
+
+    informe = {
+        'grabacion': args.grabacion,
+        'frames': total,
+        'frames_con_objetivo': con_objetivo,
+        'detecciones_hibrido': detecciones,
+        'iou_medio': round(float(np.mean(ious)), 3) if ious else None,
+        'recall': round(encontrados / con_objetivo, 3) if con_objetivo else None,
+        'error_centro_px': round(float(np.mean(errores_centro)), 1) if errores_centro else None,
+        'cpu_ms_por_frame_completo': round(cpu_ref, 1),
+        'cpu_ms_por_frame_hibrido': round(cpu_hib, 1),
+    }
+
+    print("\n📊 RESULTADOS")
+    for clave, valor in informe.items():
+        print(f"   {clave:28}: {valor}")
+
+    if args.salida:
+        with open(args.salida, 'w') as f:
+            json.dump(informe, f, indent=2)
+        print(f"\n✅ Informe guardado en {args.salida}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+⏱️ TIEMPO DE ARRANQUE DE web_server.py
+Lanza web_server.py con video sintético en cada modo de carga del modelo y
+mide, desde que se lanza el proceso:
+  - cuándo responde /api/stats (Flask escuchando)
+  - cuándo llega el primer frame de video
+  - cuándo el modelo está listo
+
+  sync        el comportamiento anterior: cargar el modelo antes de servir
+  background  precarga en segundo plano, el video no espera
+  lazy        el modelo se carga al activar YOLO (aquí se activa al llegar el primer frame)
+
+Uso:
+  python medir_arranque.py --modos sync background lazy --repeticiones 3
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+import urllib.request
+
+import numpy as np
+
+SERVIDOR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "camera", "web_server.py")
+URL = "http://127.0.0.1:5000"
+
+
+def _peticion(ruta, datos=None):
+    cuerpo = json.dumps(datos).encode() if datos is not None else None
+    peticion = urllib.request.Request(URL + ruta, data=cuerpo, headers={'Content-Type': 'application/json'})
+    with urllib.request.urlopen(peticion, timeout=1) as respuesta:
+        return json.loads(respuesta.read())
+
+
+def medir(modo, args):
+    """Segundos hasta HTTP, primer frame y modelo listo para un arranque"""
+    comando = [sys.executable, SERVIDOR, "--fuente", args.fuente, "--model-loading", modo]
+    inicio = time.perf_counter()
+    proceso = subprocess.Popen(comando, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    tiempos = {'http_s': None, 'primer_frame_s': None, 'modelo_listo_s': None}
+
+    try:
+        while time.perf_counter() - inicio < args.timeout:
+            if proceso.poll() is not None:
+                raise RuntimeError(f"web_server.py terminó con código {proceso.returncode}")
+            try:
+                stats = _peticion('/api/stats')
+            except OSError:
+                time.sleep(0.05)
+                continue
+
+            ahora = time.perf_counter() - inicio
+            if tiempos['http_s'] is None:
+                tiempos['http_s'] = ahora
+            if tiempos['primer_frame_s'] is None and stats['frame_seq']:
+                tiempos['primer_frame_s'] = ahora
+                if modo == 'lazy':
+                    _peticion('/api/command', {'command': 'yolo_on'})
+            if stats.get('model_ready'):
+                tiempos['modelo_listo_s'] = ahora
+                break
+            time.sleep(0.05)
+    finally:
+        proceso.terminate()
+        proceso.wait(timeout=10)
+
+    return {k: round(v, 2) if v is not None else None for k, v in tiempos.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tiempo hasta el primer frame de web_server.py")
+    parser.add_argument("--modos", nargs="+", default=['sync', 'background', 'lazy'],
+                        choices=['sync', 'background', 'lazy'])
+    parser.add_argument("--repeticiones", type=int, default=3)
+    parser.add_argument("--fuente", default="sintetica://320x240@30")
+    parser.add_argument("--timeout", type=float, default=120)
+    parser.add_argument("--salida", default=None, help="Guardar resultados en JSON")
+    args = parser.parse_args()
+
+    resultados = []
+    for modo in args.modos:
+        print(f"⏱️  Modo {modo}...")
+        medidas = [medir(modo, args) for _ in range(args.repeticiones)]
+        resumen = {'modo': modo}
+        for clave in ('http_s', 'primer_frame_s', 'modelo_listo_s'):
+            valores = [m[clave] for m in medidas if m[clave] is not None]
+            resumen[clave] = round(float(np.median(valores)), 2) if valores else None
+        resumen['medidas'] = medidas
+        resultados.append(resumen)
+
+    print("\n📊 RESULTADOS (mediana, segundos desde el lanzamiento)")
+    for r in resultados:
+        print(f"   {r['modo']:11} HTTP {r['http_s']} | primer frame {r['primer_frame_s']} | "
+              f"modelo listo {r['modelo_listo_s']}")
+
+    if args.salida:
+        with open(args.salida, 'w') as f:
+            json.dump({'parametros': vars(args), 'resultados': resultados}, f, indent=2)
+        print(f"\n✅ Resultados guardados en {args.salida}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,230 @@
+"""
+📐 BANCO DE PRUEBAS DE INFERENCIA SOBRE FRAMES CAPTURADOS
+Ejecuta una rejilla (pesos × imgsz × backend × hilos) sobre imágenes reales
+(dataset_rover/ o una grabación) y mide, para cada combinación:
+  - latencia por frame (p50 / p90 / p99) y frames/s
+  - pico de memoria residente del proceso
+  - acuerdo con un modelo de referencia (precisión, recall y F1 con IoU ≥ 0.5
+    y misma clase) para cada umbral de confianza de --conf
+
+Cada combinación corre en su propio proceso para que la memoria y el número
+de hilos no se contaminen entre medidas. Los hilos se limitan con las
+variables OMP/MKL, torch.set_num_threads y, en Linux, fijando la afinidad a
+los primeros N núcleos (esto último también limita ONNX Runtime y OpenVINO).
+
+Uso:
+  python medir_inferencia.py --pesos yolo11n.pt yolo11s.pt --imgsz 320 640 --backend onnx openvino
+  python medir_inferencia.py --grabacion grabaciones/sesion --hilos 1 2 4 --conf 0.25 0.45 --salida informe.json
+"""
+import argparse
+import glob
+import itertools
+import json
+import multiprocessing as mp
+import os
+import platform
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from vision.evaluacion import acuerdo
+from vision.modelos import BACKENDS, limitar_hilos
+
+DATASET = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "dataset_rover")
+EXTENSIONES = ('.jpg', '.jpeg', '.png')
+
+
+def cargar_imagenes(directorio, grabacion, maximo):
+    """JPEG/PNG codificados: de una grabación o de todas las carpetas de un directorio"""
+    if grabacion:
+        from vision.grabacion import LectorGrabacion
+        lector = LectorGrabacion(grabacion)
+        pasos = np.linspace(0, len(lector) - 1, min(maximo, len(lector))).astype(int)
+        imagenes = [lector.leer(int(i))[1] for i in pasos]
+        lector.cerrar()
+        return imagenes
+
+    rutas = sorted(r for r in glob.glob(os.path.join(directorio, "**", "*"), recursive=True)
+                   if r.lower().endswith(EXTENSIONES))
+    if len(rutas) > maximo:
+        # Muestreo uniforme para cubrir todas las categorías, no sólo las primeras
+        rutas = [rutas[int(i)] for i in np.linspace(0, len(rutas) - 1, maximo)]
+    imagenes = []
+    for ruta in rutas:
+        with open(ruta, 'rb') as f:
+            imagenes.append(f.read())
+    return imagenes
+
+
+def _limitar_hilos(hilos):
+    """Antes de importar torch / onnxruntime / openvino en el proceso hijo"""
+    if hasattr(os, 'sched_setaffinity'):
+        nucleos = sorted(os.sched_getaffinity(0))
+        os.sched_setaffinity(0, nucleos[:hilos])
+    limitar_hilos(hilos)
+
+
+def pico_memoria_mb():
+    """Pico de memoria residente del proceso actual (None si no se puede medir)"""
+    try:
+        import resource
+        pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux lo da en KiB, macOS en bytes
+        return round(pico / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+    except ImportError:
+        pass
+    try:
+        import psutil
+        return round(psutil.Process().memory_info().peak_wset / (1024 * 1024), 1)
+    except (ImportError, AttributeError):
+        return None
+
+
+def _medir(config, imagenes, args, conf, cola):
+    """Proceso hijo: carga el modelo, calienta y mide cada frame"""
+    _limitar_hilos(config['hilos'])
+
+    import cv2
+    from vision.detecciones import Detecciones
+    from vision.modelos import cargar_modelo
+
+    try:
+        frames = [cv2.imdecode(np.frombuffer(jpeg, np.uint8), cv2.IMREAD_COLOR) for jpeg in imagenes]
+        inicio = time.perf_counter()
+        modelo = cargar_modelo(config['pesos'], config['backend'], config['imgsz'], calentar=False)
+        for frame in frames[:args.calentamiento]:
+            modelo.predict(frame, verbose=False, conf=conf, imgsz=config['imgsz'])
+        carga = time.perf_counter() - inicio
+
+        latencias = []
+        detecciones = []
+        for _ in range(args.repeticiones):
+            detecciones = []
+            for frame in frames:
+                t0 = time.perf_counter()
+                resultado = modelo.predict(frame, verbose=False, conf=conf, iou=0.5, imgsz=config['imgsz'])[0]
+                latencias.append(time.perf_counter() - t0)
+                det = Detecciones.desde_resultado(resultado)
+                detecciones.append(np.column_stack([det.cajas, det.confianzas, det.clases]).astype(np.float32))
+
+        cola.put({'ok': True, 'latencias': latencias, 'detecciones': detecciones,
+                  'nombres': dict(modelo.names), 'carga_s': carga, 'pico_rss_mb': pico_memoria_mb()})
+    except Exception as e:
+        cola.put({'ok': False, 'error': str(e)})
+
+
+def ejecutar(config, imagenes, args, conf, ctx):
+    cola = ctx.Queue()
+    proceso = ctx.Process(target=_medir, args=(config, imagenes, args, conf, cola))
+    proceso.start()
+    resultado = cola.get()
+    proceso.join()
+    return resultado
+
+
+def resumir(config, medida, referencia, confs, frames):
+    latencias = np.array(medida['latencias']) * 1000
+    resumen = dict(config)
+    resumen.update({
+        'latencia_p50_ms': round(float(np.percentile(latencias, 50)), 1),
+        'latencia_p90_ms': round(float(np.percentile(latencias, 90)), 1),
+        'latencia_p99_ms': round(float(np.percentile(latencias, 99)), 1),
+        'frames_por_s': round(len(latencias) / (latencias.sum() / 1000), 1),
+        'pico_rss_mb': medida['pico_rss_mb'],
+        'carga_s': round(medida['carga_s'], 1),
+        'detecciones_por_frame': round(sum(len(d) for d in medida['detecciones']) / frames, 2),
+    })
+    if referencia is not None:
+        # Las clases se comparan por nombre por si los modelos no comparten índices
+        ids = {nombre: i for i, nombre in referencia['nombres'].items()}
+        candidatas = []
+        for det in medida['detecciones']:
+            det = det.copy()
+            det[:, 5] = [ids.get(medida['nombres'].get(int(c)), -1) for c in det[:, 5]]
+            candidatas.append(det)
+        resumen['acuerdo'] = [acuerdo(candidatas, referencia['detecciones'], c) for c in confs]
+    return resumen
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rejilla de modelos, imgsz, backends e hilos sobre frames reales")
+    parser.add_argument("--pesos", nargs="+", default=["yolo11n.pt"])
+    parser.add_argument("--imgsz", type=int, nargs="+", default=[320, 640])
+    parser.add_argument("--backend", nargs="+", default=["onnx"], choices=BACKENDS)
+    parser.add_argument("--hilos", type=int, nargs="+", default=[os.cpu_count() or 1])
+    parser.add_argument("--conf", type=float, nargs="+", default=[0.25, 0.45],
+                        help="Umbrales para el acuerdo (la inferencia usa el menor)")
+    parser.add_argument("--referencia", default="yolo11m.pt", help="Modelo de referencia ('' para no comparar)")
+    parser.add_argument("--imgsz-referencia", type=int, default=640)
+    parser.add_argument("--conf-referencia", type=float, default=0.25)
+    parser.add_argument("--directorio", default=DATASET, help="Carpeta con imágenes capturadas")
+    parser.add_argument("--grabacion", default=None, help="Usar una grabación en vez del directorio")
+    parser.add_argument("--max-frames", type=int, default=200)
+    parser.add_argument("--calentamiento", type=int, default=5)
+    parser.add_argument("--repeticiones", type=int, default=1, help="Pasadas medidas sobre los frames")
+    parser.add_argument("--salida", default=None, help="Guardar informe JSON")
+    args = parser.parse_args()
+
+    imagenes = cargar_imagenes(args.directorio, args.grabacion, args.max_frames)
+    if not imagenes:
+        print(f"❌ No hay imágenes en {args.grabacion or args.directorio}")
+        return
+    ctx = mp.get_context("spawn")
+    conf_minima = min(args.conf)
+    nucleos = len(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else os.cpu_count()
+    # Los hilos se recortan a los núcleos disponibles; sin repetir combinaciones
+    combinaciones = dict.fromkeys((p, s, b, min(h, nucleos)) for p, s, b, h in
+                                  itertools.product(args.pesos, args.imgsz, args.backend, args.hilos))
+    configs = [{'pesos': p, 'imgsz': s, 'backend': b, 'hilos': h} for p, s, b, h in combinaciones]
+    print(f"🎞️  {len(imagenes)} frames de {args.grabacion or args.directorio} | "
+          f"{len(configs)} combinaciones | {nucleos} núcleos\n")
+
+    referencia = None
+    if args.referencia:
+        print(f"🎯 Referencia: {args.referencia} [pytorch] imgsz={args.imgsz_referencia}")
+        config = {'pesos': args.referencia, 'imgsz': args.imgsz_referencia, 'backend': 'pytorch', 'hilos': nucleos}
+        referencia = ejecutar(config, imagenes, args, args.conf_referencia, ctx)
+        if not referencia['ok']:
+            print(f"⚠️ Referencia no disponible ({referencia['error']}), se omite el acuerdo")
+            referencia = None
+
+    resultados = []
+    for i, config in enumerate(configs, 1):
+        print(f"⏱️  [{i}/{len(configs)}] {config['pesos']} imgsz={config['imgsz']} "
+              f"{config['backend']} hilos={config['hilos']}")
+        medida = ejecutar(config, imagenes, args, conf_minima, ctx)
+        if not medida['ok']:
+            print(f"   ❌ {medida['error']}")
+            resultados.append(dict(config, error=medida['error']))
+            continue
+        resultados.append(resumir(config, medida, referencia, args.conf, len(imagenes)))
+
+    print("\n📊 RESULTADOS")
+    print(f"   {'pesos':14} {'imgsz':>5} {'backend':9} {'hilos':>5} {'p50':>7} {'p99':>7} "
+          f"{'fps':>6} {'RSS MB':>7}  acuerdo F1 por conf")
+    for r in resultados:
+        if 'error' in r:
+            continue
+        f1 = " ".join(f"{a['conf']}:{a['f1']:.2f}" for a in r.get('acuerdo', []))
+        print(f"   {r['pesos']:14} {r['imgsz']:5} {r['backend']:9} {r['hilos']:5} "
+              f"{r['latencia_p50_ms']:7.1f} {r['latencia_p99_ms']:7.1f} {r['frames_por_s']:6.1f} "
+              f"{r['pico_rss_mb'] or 0:7.0f}  {f1}")
+
+    if args.salida:
+        informe = {
+            'parametros': vars(args),
+            'entorno': {'plataforma': platform.platform(), 'python': platform.python_version(),
+                        'procesador': platform.processor(), 'nucleos': nucleos},
+            'frames': len(imagenes),
+            'resultados': resultados,
+        }
+        with open(args.salida, 'w') as f:
+            json.dump(informe, f, indent=2)
+        print(f"\n✅ Informe guardado en {args.salida}")
+
+
+if __name__ == "__main__":
+    main()
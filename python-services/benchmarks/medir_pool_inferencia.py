@@ -0,0 +1,100 @@
+"""
+🧵 ESCALADO DEL POOL DE PROCESOS DE INFERENCIA
+Mide frames/s del PoolInferencia con 1, 2, 4... trabajadores enviando frames
+tan rápido como el pool los acepta (política 'bloquear', sin descartes) y
+calcula la eficiencia respecto al escalado lineal.
+
+Uso:
+  python medir_pool_inferencia.py --trabajadores 1 2 4 8 --segundos 20
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from medir_servicio_inferencia import cargar_frames
+from vision.modelos import BACKENDS
+from vision.pool_inferencia import PoolInferencia
+
+
+def medir(args, frames, trabajadores):
+    pool = PoolInferencia(args.modelo, args.backend, args.imgsz, trabajadores=trabajadores,
+                          politica='bloquear', conf=args.conf).iniciar()
+    recibidos = []
+    fin_envio = threading.Event()
+
+    def consumir():
+        while not (fin_envio.is_set() and len(recibidos) >= pool.enviados):
+            resultado = pool.tomar(timeout=0.5)
+            if resultado is not None:
+                recibidos.append(resultado)
+
+    consumidor = threading.Thread(target=consumir, daemon=True)
+    consumidor.start()
+
+    inicio = time.perf_counter()
+    seq = 0
+    while time.perf_counter() - inicio < args.segundos:
+        pool.enviar(seq, frames[seq % len(frames)])
+        seq += 1
+    fin_envio.set()
+    consumidor.join()
+    duracion = time.perf_counter() - inicio
+
+    estadisticas = pool.estadisticas()
+    pool.cerrar()
+    en_orden = all(a[0] < b[0] for a, b in zip(recibidos, recibidos[1:]))
+    return {
+        'trabajadores': trabajadores,
+        'hilos_por_trabajador': pool.hilos,
+        'frames_por_s': round(estadisticas['procesados'] / duracion, 1),
+        'en_orden': en_orden,
+        'errores': estadisticas['errores'],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Escalado del pool de inferencia con el número de procesos")
+    parser.add_argument("--trabajadores", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--segundos", type=float, default=20)
+    parser.add_argument("--modelo", default="yolo11n.pt")
+    parser.add_argument("--backend", default="onnx", choices=BACKENDS)
+    parser.add_argument("--imgsz", type=int, default=640)
+    parser.add_argument("--conf", type=float, default=0.25)
+    parser.add_argument("--grabacion", default=None, help="Usar frames de una grabación")
+    parser.add_argument("--resolucion", default="640x480", help="Resolución de los frames sintéticos")
+    parser.add_argument("--salida", default=None, help="Guardar resultados en JSON")
+    args = parser.parse_args()
+
+    frames = [cv2.imdecode(np.frombuffer(jpeg, np.uint8), cv2.IMREAD_COLOR)
+              for jpeg in cargar_frames(args.grabacion, 64, args.resolucion)]
+    print(f"🎞️  {len(frames)} frames de prueba | {os.cpu_count()} núcleos\n")
+
+    resultados = []
+    for n in args.trabajadores:
+        print(f"⏱️  {n} trabajador(es)...")
+        resultados.append(medir(args, frames, n))
+
+    base = resultados[0]['frames_por_s'] / resultados[0]['trabajadores']
+    print("\n📊 RESULTADOS")
+    for r in resultados:
+        r['eficiencia'] = round(r['frames_por_s'] / (base * r['trabajadores']), 2) if base else None
+        print(f"   {r['trabajadores']:2} procesos x {r['hilos_por_trabajador']} hilos: "
+              f"{r['frames_por_s']:7.1f} frames/s | eficiencia {r['eficiencia']} | "
+              f"{'en orden' if r['en_orden'] else '⚠️ DESORDEN'}")
+
+    if args.salida:
+        with open(args.salida, 'w') as f:
+            json.dump({'parametros': vars(args), 'resultados': resultados}, f, indent=2)
+        print(f"\n✅ Resultados guardados en {args.salida}")
+
+
+if __name__ == "__main__":
+    main()
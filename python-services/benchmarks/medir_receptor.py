@@ -0,0 +1,100 @@
+"""
+📉 MEDICIÓN DE PÉRDIDAS DEL RECEPTOR DE web_server.py
+Envía video sintético por UDP con el protocolo de la ESP32-CAM y compara
+los frames enviados con los que el servidor reporta en /api/stats,
+primero con YOLO apagado y luego encendido.
+
+Uso (con web_server.py corriendo en la misma máquina):
+  python medir_receptor.py --resolucion 640x480 --fps 60 --segundos 20
+"""
+import argparse
+import json
+import os
+import socket
+import sys
+import time
+import urllib.request
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from vision.fuentes import FuenteSintetica
+from vision.protocolo_udp import enviar_jpeg_udp
+
+
+def api(url, datos=None):
+    if datos is None:
+        with urllib.request.urlopen(url, timeout=5) as r:
+            return json.loads(r.read())
+    req = urllib.request.Request(url, data=json.dumps(datos).encode(),
+                                 headers={'Content-Type': 'application/json'})
+    with urllib.request.urlopen(req, timeout=5) as r:
+        return json.loads(r.read())
+
+
+def medir(servidor, puerto_udp, ancho, alto, fps, segundos, yolo):
+    """Envía `segundos` de video y devuelve las métricas de esa fase"""
+    api(f"{servidor}/api/command", {'command': 'yolo_on' if yolo else 'yolo_off'})
+    time.sleep(1.0)
+
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    fuente = FuenteSintetica(ancho, alto, fps).abrir()
+
+    antes = api(f"{servidor}/api/stats")
+    enviados = 0
+    fin = time.time() + segundos
+    while time.time() < fin:
+        fotograma = fuente.leer(timeout=1.0)
+        if fotograma is None:
+            continue
+        enviar_jpeg_udp(sock, ("127.0.0.1", puerto_udp), fotograma.jpeg)
+        enviados += 1
+
+    # Margen para que el receptor vacíe el buffer del socket
+    time.sleep(1.5)
+    despues = api(f"{servidor}/api/stats")
+    sock.close()
+
+    recibidos = despues['video']['frames'] - antes['video']['frames']
+    inferidos = despues['inference']['processed'] - antes['inference']['processed']
+    return {
+        'yolo': yolo,
+        'enviados': enviados,
+        'recibidos': recibidos,
+        'tasa_perdida': round(1 - recibidos / enviados, 4) if enviados else 0.0,
+        'fps_receptor': despues['fps'],
+        'inferencias': inferidos,
+        'inferencias_por_s': round(inferidos / segundos, 1),
+        'inferencia_ms': despues['inference']['ms'],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mide pérdidas del receptor UDP con YOLO on/off")
+    parser.add_argument("--servidor", default="http://127.0.0.1:5000")
+    parser.add_argument("--puerto", type=int, default=5005)
+    parser.add_argument("--resolucion", default="320x240")
+    parser.add_argument("--fps", type=float, default=30)
+    parser.add_argument("--segundos", type=float, default=15)
+    parser.add_argument("--salida", default=None, help="Guardar resultados en JSON")
+    args = parser.parse_args()
+
+    ancho, alto = (int(v) for v in args.resolucion.split("x"))
+
+    resultados = []
+    for yolo in (False, True):
+        print(f"⏱️  {args.segundos:.0f} s a {args.resolucion}@{args.fps:.0f} con YOLO {'ON' if yolo else 'OFF'}...")
+        r = medir(args.servidor, args.puerto, ancho, alto, args.fps, args.segundos, yolo)
+        resultados.append(r)
+        print(f"   📦 enviados {r['enviados']} | recibidos {r['recibidos']} | "
+              f"pérdida {r['tasa_perdida']:.1%} | inferencias/s {r['inferencias_por_s']}")
+
+    api(f"{args.servidor}/api/command", {'command': 'yolo_off'})
+
+    if args.salida:
+        with open(args.salida, 'w') as f:
+            json.dump(resultados, f, indent=2)
+        print(f"\n✅ Resultados guardados en {args.salida}")
+
+
+if __name__ == "__main__":
+    main()
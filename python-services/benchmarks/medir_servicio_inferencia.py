@@ -0,0 +1,164 @@
+"""
+🛰️ SERVICIO DE INFERENCIA CON LOTES VS PROCESOS INDEPENDIENTES
+Simula N cámaras que piden inferencia tan rápido como pueden y compara:
+  1. N procesos independientes, cada uno con su propio modelo
+  2. Un servidor_inferencia compartido que agrupa los frames en lotes
+
+Uso:
+  python medir_servicio_inferencia.py --streams 4 --segundos 20
+  python medir_servicio_inferencia.py --grabacion grabaciones/sesion --modelo yolo11n.pt
+"""
+import argparse
+import json
+import multiprocessing as mp
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from vision.fuentes import FuenteSintetica
+from vision.grabacion import LectorGrabacion
+from vision.modelos import BACKENDS, cargar_modelo
+from vision.servicio_inferencia import ClienteInferencia, ServicioInferencia
+
+DIRECCION = ('127.0.0.1', 6199)
+
+
+def cargar_frames(grabacion, cantidad, resolucion):
+    """JPEG de prueba: de una grabación si se indica, si no sintéticos"""
+    if grabacion:
+        lector = LectorGrabacion(grabacion)
+        pasos = np.linspace(0, len(lector) - 1, min(cantidad, len(lector))).astype(int)
+        frames = [lector.leer(int(i))[1] for i in pasos]
+        lector.cerrar()
+        return frames
+
+    ancho, alto = (int(v) for v in resolucion.split('x'))
+    fuente = FuenteSintetica(ancho, alto, fps=1000, semilla=1).abrir()
+    frames = [fuente.leer().jpeg for _ in range(cantidad)]
+    fuente.cerrar()
+    return frames
+
+
+def _bucle_camara(predecir, frames, barrera, segundos, cola, indice):
+    """Pide inferencia sobre los frames en bucle durante la ventana de medida"""
+    latencias = []
+    detecciones = 0
+    barrera.wait()
+    fin = time.perf_counter() + segundos
+    i = indice
+    while time.perf_counter() < fin:
+        inicio = time.perf_counter()
+        detecciones += predecir(frames[i % len(frames)])
+        latencias.append((time.perf_counter() - inicio) * 1000)
+        i += 1
+    cola.put({'frames': len(latencias), 'detecciones': detecciones, 'latencias': latencias})
+
+
+def camara_independiente(args, frames, barrera, cola, indice):
+    import cv2
+
+    modelo = cargar_modelo(args.modelo, args.backend, args.imgsz)
+
+    def predecir(jpeg):
+        imagen = cv2.imdecode(np.frombuffer(jpeg, np.uint8), cv2.IMREAD_COLOR)
+        return len(modelo.predict(imagen, verbose=False, conf=args.conf, imgsz=args.imgsz)[0].boxes)
+
+    _bucle_camara(predecir, frames, barrera, args.segundos, cola, indice)
+
+
+def camara_cliente(args, frames, barrera, cola, indice):
+    cliente = ClienteInferencia(DIRECCION)
+
+    def predecir(jpeg):
+        return len(cliente.predecir(jpeg, conf=args.conf, imgsz=args.imgsz))
+
+    _bucle_camara(predecir, frames, barrera, args.segundos, cola, indice)
+    cliente.cerrar()
+
+
+def servidor(args, listo, parar, cola):
+    modelo = cargar_modelo(args.modelo, args.backend, args.imgsz, dynamic=True)
+    servicio = ServicioInferencia({args.modelo: modelo}, DIRECCION, lote_maximo=args.lote,
+                                  espera_maxima=args.espera_ms / 1000).iniciar()
+    listo.set()
+    parar.wait()
+    cola.put(servicio.estadisticas())
+    servicio.cerrar()
+
+
+def ejecutar(nombre, objetivo, args, frames, ctx):
+    """Lanza las cámaras, espera a que todas estén listas y agrega sus métricas"""
+    barrera = ctx.Barrier(args.streams)
+    cola = ctx.Queue()
+    procesos = [ctx.Process(target=objetivo, args=(args, frames, barrera, cola, i * 7))
+                for i in range(args.streams)]
+    for p in procesos:
+        p.start()
+    resultados = [cola.get() for _ in procesos]
+    for p in procesos:
+        p.join()
+
+    latencias = np.concatenate([r['latencias'] for r in resultados])
+    frames_total = sum(r['frames'] for r in resultados)
+    detecciones = sum(r['detecciones'] for r in resultados)
+    return {
+        'modo': nombre,
+        'frames_por_s': round(frames_total / args.segundos, 1),
+        'detecciones_por_s': round(detecciones / args.segundos, 1),
+        'latencia_p50_ms': round(float(np.percentile(latencias, 50)), 1),
+        'latencia_p95_ms': round(float(np.percentile(latencias, 95)), 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Servicio de inferencia con lotes frente a procesos independientes")
+    parser.add_argument("--streams", type=int, default=4, help="Cámaras simuladas")
+    parser.add_argument("--segundos", type=float, default=20)
+    parser.add_argument("--modelo", default="yolo11n.pt")
+    parser.add_argument("--backend", default="onnx", choices=BACKENDS)
+    parser.add_argument("--imgsz", type=int, default=640)
+    parser.add_argument("--conf", type=float, default=0.25)
+    parser.add_argument("--lote", type=int, default=8)
+    parser.add_argument("--espera-ms", type=float, default=10)
+    parser.add_argument("--grabacion", default=None, help="Usar frames de una grabación")
+    parser.add_argument("--resolucion", default="640x480", help="Resolución de los frames sintéticos")
+    parser.add_argument("--salida", default=None, help="Guardar resultados en JSON")
+    args = parser.parse_args()
+
+    ctx = mp.get_context("spawn")
+    frames = cargar_frames(args.grabacion, 64, args.resolucion)
+    print(f"🎞️  {len(frames)} frames de prueba | {args.streams} cámaras | {args.segundos:.0f} s por modo\n")
+
+    print(f"1️⃣  {args.streams} procesos independientes...")
+    independientes = ejecutar('independientes', camara_independiente, args, frames, ctx)
+
+    print("2️⃣  Servicio compartido con lotes...")
+    listo, parar, cola_servidor = ctx.Event(), ctx.Event(), ctx.Queue()
+    proceso_servidor = ctx.Process(target=servidor, args=(args, listo, parar, cola_servidor))
+    proceso_servidor.start()
+    listo.wait()
+    compartido = ejecutar('servicio', camara_cliente, args, frames, ctx)
+    parar.set()
+    compartido['lotes'] = cola_servidor.get()
+    proceso_servidor.join()
+
+    print("\n📊 RESULTADOS")
+    for r in (independientes, compartido):
+        print(f"   {r['modo']:15} {r['frames_por_s']:7.1f} frames/s | {r['detecciones_por_s']:7.1f} det/s | "
+              f"p50 {r['latencia_p50_ms']:6.1f} ms | p95 {r['latencia_p95_ms']:6.1f} ms")
+    print(f"   Lote medio del servicio: {compartido['lotes']['lote_medio']}")
+    if independientes['frames_por_s']:
+        print(f"   Ganancia: x{compartido['frames_por_s'] / independientes['frames_por_s']:.2f}")
+
+    if args.salida:
+        with open(args.salida, 'w') as f:
+            json.dump({'parametros': vars(args), 'resultados': [independientes, compartido]}, f, indent=2)
+        print(f"\n✅ Resultados guardados en {args.salida}")
+
+
+if __name__ == "__main__":
+    main()
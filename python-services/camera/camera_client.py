@@ -1,35 +1,55 @@
-import socket
-import struct
+import argparse
+import sys
 import time
 import threading
 import cv2
-import numpy as np
 import os
 from datetime import datetime
-from ultralytics import YOLO
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
 
-def obtener_socket_udp(port, rcvbuf=8388608):
-    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-    sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, rcvbuf)
-    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-    sock.bind(("", port))
-    sock.settimeout(1.0)
-    return sock
+from vision.carga_diferida import CargaDiferida
+from vision.clasificacion import CLASIFICADOR_PESOS, cargar_clasificador
+from vision.detecciones import Detecciones
+from vision.fuentes import abrir_fuente
+from vision.guardado import EscritorImagenes
+from vision.manifiesto import ManifiestoDataset
+from vision.modelos import BACKENDS, cargar_modelo
+from vision.movimiento import DetectorMovimiento
+from vision.servicio_inferencia import ClienteInferencia
+from vision import overlay
+
+# Modelo: backend 'pytorch', 'onnx' u 'openvino' (exportado y cacheado la primera vez)
+YOLO_PESOS = 'yolo11n.pt'
+YOLO_BACKEND = 'onnx'
+YOLO_IMGSZ = 640
+
+# Cargar el modelo en segundo plano al arrancar (False = sólo al pulsar D)
+PRECARGAR_MODELO = True
+
+# Saltar YOLO si la escena no cambia (se refresca como mínimo cada N segundos)
+MOTION_GATING = True
+MOTION_MAX_INTERVAL = 2.0
 
 
 class CameraClient:
-    def __init__(self, control_event, port=5005, dataset_path="dataset_rover"):
+    def __init__(self, control_event, port=5005, dataset_path="dataset_rover", fuente=None,
+                 pesos=YOLO_PESOS, backend=YOLO_BACKEND, servicio=None, clasificador=CLASIFICADOR_PESOS):
         self.control_event = control_event
         self.port = port
+        self.fuente_uri = fuente or f"udp://:{port}"
         self.frame_queue = None
         self.frame_actual = None
+        self.fotograma_actual = None
         self.rotacion_actual = 0
         self.yolo_enabled = False
-        self.model = None
+        self.ultimas_detecciones = None
+        self.paneles = overlay.CachePaneles()
+        self.detector_movimiento = DetectorMovimiento(intervalo_max=MOTION_MAX_INTERVAL)
         
         # Sistema de captura de dataset
         self.dataset_path = dataset_path
+        self.sesion = f"cliente_{datetime.now():%Y%m%d_%H%M%S}"
         self.modo_captura = False
         self.frame_capturado = None
         self.categorias = {
@@ -54,14 +74,32 @@ class CameraClient:
         self._crear_directorios_dataset()
         self._cargar_contadores()
         
-        # Cargar modelo YOLO
-        print("🤖 Cargando modelo YOLOv11n (rápido)...")
-        try:
-            self.model = YOLO('yolo11n.pt')
-            print("✅ Modelo YOLOv11n cargado correctamente")
-        except Exception as e:
-            print(f"⚠️ Error al cargar YOLO: {e}")
-            print("   La detección de objetos no estará disponible")
+        # YOLO se carga en segundo plano: el video arranca sin esperar a torch/ultralytics
+        self.cargador = CargaDiferida(self._cargar_modelo, pesos, backend, servicio, nombre='YOLO')
+        if PRECARGAR_MODELO:
+            self.cargador.iniciar()
+        
+        # Clasificación de escena (tecla E): el clasificador se carga al activarla
+        self.escena_activa = False
+        self.escena = None
+        self.cargador_escena = CargaDiferida(cargar_clasificador, clasificador, backend, nombre='clasificador')
+    
+    @property
+    def model(self):
+        """Modelo YOLO, o None mientras se carga (o si falló la carga)"""
+        return self.cargador.obtener()
+    
+    def _cargar_modelo(self, pesos, backend, servicio):
+        """Carga YOLO o se conecta al servicio de inferencia compartido"""
+        if servicio:
+            print(f"🛰️ Conectando al servicio de inferencia {servicio}...")
+            modelo = ClienteInferencia(servicio)
+            pesos = modelo.pesos
+        else:
+            print(f"🤖 Cargando modelo {pesos} [{backend}]...")
+            modelo = cargar_modelo(pesos, backend, YOLO_IMGSZ)
+        print(f"✅ Modelo {pesos} cargado correctamente")
+        return modelo
     
     def _crear_directorios_dataset(self):
         """Crea estructura de directorios para el dataset"""
@@ -74,20 +112,26 @@ class CameraClient:
                 os.makedirs(cat_path)
     
     def _cargar_contadores(self):
-        """Cuenta imágenes existentes en cada categoría"""
-        for categoria in self.categorias.values():
-            cat_path = os.path.join(self.dataset_path, categoria)
-            if os.path.exists(cat_path):
-                archivos = [f for f in os.listdir(cat_path) if f.endswith(('.jpg', '.png'))]
-                self.contadores[categoria] = len(archivos)
+        """Conteos por categoría desde el manifiesto del dataset (sin listar carpetas)"""
+        self.manifiesto = ManifiestoDataset(self.dataset_path, self.categorias.values())
+        self.contadores.update(self.manifiesto.contadores())
+        
+        # Escritura en segundo plano; el manifiesto se actualiza al terminar cada archivo
+        self.escritor = EscritorImagenes(al_guardar=self._registrar_imagen)
+    
+    def _registrar_imagen(self, ruta, datos, contexto):
+        categoria, filename = contexto
+        self.manifiesto.agregar(categoria, filename, datos, sesion=self.sesion)
     
-    def guardar_imagen(self, frame, categoria):
-        """Guarda imagen en la categoría especificada"""
+    def guardar_imagen(self, fotograma, categoria, rotacion=0):
+        """Encola el JPEG recibido para guardarlo en la categoría (sin bloquear el video)"""
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
         filename = f"{categoria}_{timestamp}.jpg"
         filepath = os.path.join(self.dataset_path, categoria, filename)
         
-        cv2.imwrite(filepath, frame)
+        if not self.escritor.guardar(filepath, fotograma, rotacion, (categoria, filename)):
+            print("⚠️ Cola de escritura llena, captura descartada")
+            return
         self.contadores[categoria] += 1
         
         emoji = self.emojis[categoria]
@@ -98,12 +142,20 @@ class CameraClient:
         total = sum(self.contadores.values())
         print(f"   📦 TOTAL GENERAL: {total} imágenes\n")
 
+    def _panel_captura(self, w):
+        """Fondo e instrucciones del modo captura (las 180 filas inferiores)"""
+        panel = overlay.Panel(w, 180, (0, 0, 0), 0.7)
+        panel.texto("CAPTURA - Elige categoria:", (10, 30), (0, 255, 255), 0.7, 2)
+        panel.texto("1:Excavacion 2:Construccion 3:Peligro 4:Zona Libre", (10, 60), (255, 255, 255), 0.5)
+        panel.texto("5:Objetivo 6:Obstaculo 7:Otro | ESC:Cancelar", (10, 85), (255, 255, 255), 0.5)
+        return panel
+
     def start(self):
         # cola interna de frames (max 1 para baja latencia)
         import queue
         self.frame_queue = queue.Queue(maxsize=1)
 
-        hilo_udp = threading.Thread(target=self._recibir_video_udp, daemon=True)
+        hilo_udp = threading.Thread(target=self._recibir_video, daemon=True)
         hilo_video = threading.Thread(target=self._mostrar_video, daemon=True)
 
         hilo_udp.start()
@@ -112,146 +164,124 @@ class CameraClient:
         # no hacemos join aquí (daemon threads)
         return hilo_udp, hilo_video
 
-    def _recibir_video_udp(self):
-        sock = obtener_socket_udp(self.port)
-
-        buffer = bytearray()
-        expected_size = None
-        ultimo_frame = time.time()
+    def _recibir_video(self):
+        fuente = abrir_fuente(self.fuente_uri)
         sin_frames = 0
 
         while self.control_event.is_set():
-            try:
-                data, _ = sock.recvfrom(65535)
-
-                # Primer paquete: tamaño (4 bytes)
-                if len(data) == 4 and expected_size is None:
-                    expected_size = struct.unpack("I", data)[0]
-                    if expected_size > 200000 or expected_size < 500:
-                        expected_size = None
-                        continue
-                    buffer = bytearray()
-                    continue
-
-                if expected_size:
-                    buffer.extend(data)
-
-                    if len(buffer) >= expected_size:
-                        frame = cv2.imdecode(
-                            np.frombuffer(buffer[:expected_size], np.uint8),
-                            cv2.IMREAD_COLOR
-                        )
-
-                        if frame is not None:
-                            # vaciar cola antigua
-                            try:
-                                while True:
-                                    self.frame_queue.get_nowait()
-                            except Exception:
-                                pass
-
-                            try:
-                                self.frame_queue.put_nowait(frame)
-                                ultimo_frame = time.time()
-                                sin_frames = 0
-                            except Exception:
-                                pass
-
-                        expected_size = None
-                        buffer = bytearray()
-
-                    elif len(buffer) > expected_size + 50000:
-                        buffer = bytearray()
-                        expected_size = None
-
-            except socket.timeout:
-                if len(buffer) > 0:
-                    buffer = bytearray()
-                    expected_size = None
+            fotograma = fuente.leer(timeout=1.0)
 
+            if fotograma is None:
                 sin_frames += 1
                 if sin_frames == 5:
                     print("⚠️ Sin video (¿ESP32 CAM desconectado?)")
+                continue
+
+            frame = fotograma.imagen
+            if frame is None:
+                continue
+
+            # vaciar cola antigua
+            try:
+                while True:
+                    self.frame_queue.get_nowait()
+            except Exception:
+                pass
 
+            try:
+                # El fotograma conserva los bytes JPEG originales para las capturas
+                self.frame_queue.put_nowait(fotograma)
+                sin_frames = 0
             except Exception:
-                buffer = bytearray()
-                expected_size = None
+                pass
 
-        sock.close()
+        fuente.cerrar()
 
     def _mostrar_video(self):
         cv2.namedWindow("ESP32-CAM", cv2.WINDOW_AUTOSIZE)
 
         while self.control_event.is_set():
             try:
-                frame = self.frame_queue.get(timeout=0.05)
+                fotograma = self.frame_queue.get(timeout=0.05)
+                frame = fotograma.imagen
 
                 if frame is not None and frame.size > 0:
+                    rotacion = self.rotacion_actual
                     # Aplicar rotación primero
-                    if self.rotacion_actual == 90:
+                    if rotacion == 90:
                         frame = cv2.rotate(frame, cv2.ROTATE_90_CLOCKWISE)
-                    elif self.rotacion_actual == 180:
+                    elif rotacion == 180:
                         frame = cv2.rotate(frame, cv2.ROTATE_180)
-                    elif self.rotacion_actual == 270:
+                    elif rotacion == 270:
                         frame = cv2.rotate(frame, cv2.ROTATE_90_COUNTERCLOCKWISE)
 
+                    # Clasificar la escena antes de dibujar nada encima
+                    clasificador = self.cargador_escena.obtener() if self.escena_activa else None
+                    if clasificador is not None:
+                        try:
+                            self.escena = clasificador.clasificar(frame)
+                        except Exception:
+                            self.escena = None
+
                     # Aplicar detección YOLO si está activada
                     if self.yolo_enabled and self.model is not None:
                         try:
-                            results = self.model.predict(frame, verbose=False, conf=0.25)
-                            frame = results[0].plot()  # Dibuja bounding boxes y labels
+                            if (not MOTION_GATING or self.ultimas_detecciones is None
+                                    or self.detector_movimiento.debe_inferir(frame)):
+                                results = self.model.predict(frame, verbose=False, conf=0.25, imgsz=YOLO_IMGSZ)
+                                self.ultimas_detecciones = Detecciones.desde_resultado(results[0])
+                            # Con la escena estática se reutilizan las detecciones anteriores
+                            detecciones = self.ultimas_detecciones
+                            overlay.dibujar_detecciones(frame, detecciones)  # Bounding boxes y labels
                             
                             # Indicador visual en pantalla
-                            cv2.putText(frame, "YOLO: ON", (10, 30), 
-                                       cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
-                            cv2.putText(frame, f"Objetos: {len(results[0].boxes)}", (10, 60), 
-                                       cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 0), 2)
+                            overlay.dibujar_texto(frame, "YOLO: ON", (10, 30), (0, 255, 0), 0.7, 2)
+                            overlay.dibujar_texto(frame, f"Objetos: {len(detecciones)}", (10, 60), (0, 255, 0), 0.6, 2)
                         except Exception as e:
                             # Mostrar error en pantalla
-                            cv2.putText(frame, f"YOLO ERROR: {str(e)[:30]}", (10, 30), 
-                                       cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 0, 255), 2)
+                            overlay.dibujar_texto(frame, f"YOLO ERROR: {str(e)[:30]}", (10, 30), (0, 0, 255), 0.5, 2)
                     else:
-                        # Indicador cuando YOLO está OFF
+                        # Indicador cuando YOLO está OFF o el modelo aún no está listo
                         if not self.yolo_enabled:
-                            cv2.putText(frame, "YOLO: OFF (Presiona D)", (10, 30), 
-                                       cv2.FONT_HERSHEY_SIMPLEX, 0.6, (128, 128, 128), 2)
+                            overlay.dibujar_texto(frame, "YOLO: OFF (Presiona D)", (10, 30), (128, 128, 128), 0.6, 2)
+                        elif not self.cargador.error:
+                            overlay.dibujar_texto(frame, "YOLO: cargando modelo...", (10, 30), (0, 200, 255), 0.6, 2)
+                        else:
+                            overlay.dibujar_texto(frame, "YOLO: no disponible", (10, 30), (0, 0, 255), 0.6, 2)
+                    
+                    if self.escena_activa:
+                        if clasificador is not None and self.escena is not None:
+                            texto_escena = f"Escena: {self.escena['clase']} {self.escena['confianza']:.0f}%"
+                        elif self.cargador_escena.error:
+                            texto_escena = "Escena: clasificador no disponible"
+                        else:
+                            texto_escena = "Escena: cargando clasificador..."
+                        overlay.dibujar_texto(frame, texto_escena, (10, 120), (255, 200, 0), 0.6, 2)
                     
                     # Modo captura: Mostrar instrucciones
                     if self.modo_captura:
-                        # Fondo semitransparente
-                        overlay = frame.copy()
+                        # Panel semitransparente con las instrucciones fijas pre-renderizadas
                         h, w = frame.shape[:2]
-                        cv2.rectangle(overlay, (0, h-180), (w, h), (0, 0, 0), -1)
-                        cv2.addWeighted(overlay, 0.7, frame, 0.3, 0, frame)
-                        
-                        # Instrucciones
-                        cv2.putText(frame, "CAPTURA - Elige categoria:", (10, h-150), 
-                                   cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 255), 2)
-                        cv2.putText(frame, "1:Excavacion 2:Construccion 3:Peligro 4:Zona Libre", (10, h-120), 
-                                   cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1)
-                        cv2.putText(frame, "5:Objetivo 6:Obstaculo 7:Otro | ESC:Cancelar", (10, h-95), 
-                                   cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1)
+                        self.paneles.obtener(('captura', w), lambda: self._panel_captura(w)).aplicar(frame, 0, h - 180)
                         
                         # Contadores
                         total = sum(self.contadores.values())
-                        cv2.putText(frame, f"Total imagenes: {total}", (10, h-60), 
-                                   cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 0), 2)
+                        overlay.dibujar_texto(frame, f"Total imagenes: {total}", (10, h-60), (0, 255, 0), 0.6, 2)
                         
                         # Mini resumen
                         resumen = f"1:{self.contadores['excavacion']} 2:{self.contadores['construccion']} 3:{self.contadores['peligro']} 4:{self.contadores['zona_libre']}"
-                        cv2.putText(frame, resumen, (10, h-35), 
-                                   cv2.FONT_HERSHEY_SIMPLEX, 0.45, (200, 200, 200), 1)
+                        overlay.dibujar_texto(frame, resumen, (10, h-35), (200, 200, 200), 0.45)
                         resumen2 = f"5:{self.contadores['objetivo']} 6:{self.contadores['obstaculo']} 7:{self.contadores['otro']}"
-                        cv2.putText(frame, resumen2, (10, h-10), 
-                                   cv2.FONT_HERSHEY_SIMPLEX, 0.45, (200, 200, 200), 1)
+                        overlay.dibujar_texto(frame, resumen2, (10, h-10), (200, 200, 200), 0.45)
                     else:
                         # Indicador de captura disponible
                         total = sum(self.contadores.values())
                         if total > 0:
-                            cv2.putText(frame, f"Dataset: {total} imgs (ESPACIO=Capturar)", (10, 90), 
-                                       cv2.FONT_HERSHEY_SIMPLEX, 0.5, (200, 200, 200), 1)
+                            overlay.dibujar_texto(frame, f"Dataset: {total} imgs (ESPACIO=Capturar)", (10, 90),
+                                                  (200, 200, 200), 0.5)
 
                     self.frame_actual = frame
+                    self.fotograma_actual = (fotograma, rotacion)
                     cv2.imshow("ESP32-CAM", frame)
             except Exception:
                 if self.frame_actual is not None:
@@ -269,7 +299,8 @@ class CameraClient:
                     # Guardar en categoría seleccionada
                     categoria = self.categorias[chr(key)]
                     if self.frame_capturado is not None:
-                        self.guardar_imagen(self.frame_capturado, categoria)
+                        fotograma, rotacion = self.frame_capturado
+                        self.guardar_imagen(fotograma, categoria, rotacion)
                         self.modo_captura = False
                         self.frame_capturado = None
             
@@ -279,8 +310,9 @@ class CameraClient:
                     self.control_event.clear()
                     break
                 elif key == ord(' '):  # ESPACIO - Capturar
-                    if self.frame_actual is not None:
-                        self.frame_capturado = self.frame_actual.copy()
+                    if self.fotograma_actual is not None:
+                        # Se guarda el JPEG recibido (sin overlay ni recodificar), no lo que se ve
+                        self.frame_capturado = self.fotograma_actual
                         self.modo_captura = True
                         print("\n" + "=" * 60)
                         print("📸 FOTO CAPTURADA - Selecciona categoría:")
@@ -289,13 +321,30 @@ class CameraClient:
                             emoji = self.emojis[cat]
                             count = self.contadores[cat]
                             print(f"  [{k}] {emoji} {cat.upper():15} ({count} imágenes)")
+                        if self.escena_activa and self.escena is not None:
+                            sugerida = [k for k, cat in self.categorias.items() if cat == self.escena['clase']]
+                            if sugerida:
+                                print(f"\n  💡 Sugerencia del clasificador: [{sugerida[0]}] {self.escena['clase']} "
+                                      f"({self.escena['confianza']:.0f}%)")
                         print("\n  [ESC] Cancelar")
                         print("=" * 60 + "\n")
                 elif key == ord('r') or key == ord('R'):
                     self.rotacion_actual = (self.rotacion_actual + 90) % 360
                     print(f"🔄 Rotación: {self.rotacion_actual}°")
+                elif key == ord('e') or key == ord('E'):
+                    self.escena_activa = not self.escena_activa
+                    self.escena = None
+                    if self.escena_activa:
+                        self.cargador_escena.iniciar()
+                        if self.cargador_escena.listo:
+                            self.cargador_escena.obtener().reiniciar()
+                    print(f"🏞️ Clasificación de escena: {'ON' if self.escena_activa else 'OFF'}")
                 elif key == ord('d') or key == ord('D'):
                     self.yolo_enabled = not self.yolo_enabled
+                    self.ultimas_detecciones = None
+                    self.detector_movimiento.reiniciar()
+                    if self.yolo_enabled:
+                        self.cargador.iniciar()
                     print("\n" + "=" * 50)
                     if self.yolo_enabled:
                         print("🤖 DETECCIÓN DE OBJETOS ACTIVADA ✅")
@@ -307,10 +356,14 @@ class CameraClient:
                     print("=" * 50 + "\n")
 
         cv2.destroyAllWindows()
+        self.escritor.cerrar()
+        self.manifiesto.cerrar()
 
 
-def start_camera(control_event, port=5005):
-    cam = CameraClient(control_event, port=port)
+def start_camera(control_event, port=5005, fuente=None, pesos=YOLO_PESOS, backend=YOLO_BACKEND, servicio=None,
+                 clasificador=CLASIFICADOR_PESOS):
+    cam = CameraClient(control_event, port=port, fuente=fuente, pesos=pesos, backend=backend, servicio=servicio,
+                       clasificador=clasificador)
     return cam.start()
 
 
@@ -320,12 +373,24 @@ def start_camera(control_event, port=5005):
 if __name__ == "__main__":
     import signal
     
+    parser = argparse.ArgumentParser(description="Cliente de cámara del rover")
+    parser.add_argument("--fuente", default="udp://:5005",
+                        help="udp://:5005, camara://0, archivo://<grabación>, sintetica://320x240@30")
+    parser.add_argument("--modelo", default=YOLO_PESOS, help="Pesos YOLO (.pt)")
+    parser.add_argument("--backend", default=YOLO_BACKEND, choices=BACKENDS)
+    parser.add_argument("--servicio", default=None,
+                        help="host:puerto de servidor_inferencia.py (usa su modelo en lugar de cargar uno)")
+    parser.add_argument("--clasificador", default=CLASIFICADOR_PESOS,
+                        help="Pesos del clasificador de escena (entrenar_modelo.py, tipo clasificación)")
+    args = parser.parse_args()
+    
     print("=" * 60)
     print("📹 CLIENTE DE CÁMARA ROVER CON IA + CAPTURA DATASET")
     print("=" * 60)
-    print("🎥 Puerto UDP: 5005")
+    print(f"🎥 Fuente de video: {args.fuente}")
     print("⌨️  ESPACIO → Capturar imagen para dataset")
     print("⌨️  D → Activar/desactivar YOLO")
+    print("⌨️  E → Activar/desactivar clasificación de escena")
     print("⌨️  R → Rotar cámara (0° → 90° → 180° → 270°)")
     print("⌨️  ESC → Salir")
     print("=" * 60)
@@ -342,7 +407,9 @@ if __name__ == "__main__":
     signal.signal(signal.SIGINT, signal_handler)
     
     # Iniciar cámara
-    hilo_udp, hilo_video = start_camera(control_event, port=5005)
+    hilo_udp, hilo_video = start_camera(control_event, port=5005, fuente=args.fuente,
+                                       pesos=args.modelo, backend=args.backend, servicio=args.servicio,
+                                       clasificador=args.clasificador)
     
     # Esperar a que terminen
     try:
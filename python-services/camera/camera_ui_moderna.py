@@ -6,17 +6,30 @@ Características:
 - Visualización profesional de detecciones
 """
 
-import socket
-import struct
+import argparse
+import os
+import sys
 import time
 import threading
-import queue
 import cv2
 import numpy as np
 import signal
-from ultralytics import YOLO
 import paho.mqtt.client as mqtt
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from vision.buzon import BuzonUltimo
+from vision.carga_diferida import CargaDiferida
+from vision.clasificacion import CLASIFICADOR_PESOS, cargar_clasificador
+from vision.detecciones import Detecciones
+from vision.fuentes import abrir_fuente
+from vision.mensajes_detecciones import PublicadorDetecciones
+from vision.modelos import BACKENDS, cargar_modelo
+from vision import overlay
+from vision.roi import calcular_roi, id_clase, predecir_roi
+from vision.seguimiento import CLASES_SEGUIBLES, SeguidorHibrido, a_gris_reducido
+from vision.servicio_inferencia import ClienteInferencia
+
 
 # ============================================
 # 🎛️ CONFIGURACIÓN DE SEGUIMIENTO - AJUSTAR AQUÍ
@@ -37,29 +50,60 @@ TIEMPO_ENTRE_GIROS = 0.1  # Pausa mínima entre giros
 TIEMPO_ENTRE_AVANCE = 0.1  # Pausa mínima entre avances
 TIEMPO_ENTRE_STOP = 0.1    # Pausa mínima entre stops
 
+# Modelo: backend 'pytorch', 'onnx' u 'openvino' (exportado y cacheado la primera vez)
+YOLO_PESOS = 'yolo11m.pt'
+YOLO_BACKEND = 'onnx'
+YOLO_IMGSZ = 640
+
+# Cargar el modelo en segundo plano al arrancar (False = sólo al pulsar D)
+PRECARGAR_MODELO = True
+
 # Suavizado de movimiento
 MAX_HISTORIAL_POSICIONES = 5  # Más = más suave pero más lento
 MAX_FRAMES_SIN_OBJETIVO = 15  # Frames antes de detenerse
 
+# Modo híbrido: YOLO cada N frames y flujo óptico entre medias (tecla H)
+MODO_HIBRIDO = False
+DETECTAR_CADA_N_FRAMES = 5
+CONFIANZA_MINIMA_TRACKER = 0.35
+
+# Inferencia sólo en una región alrededor del objetivo y sólo de su clase
+INFERENCIA_ROI = True
+FACTOR_ROI = 2.0         # Tamaño de la región respecto a la caja del objetivo
+YOLO_IMGSZ_ROI = 320     # El recorte es pequeño: basta un imgsz menor
+
+# Publicar detecciones en rover/vision/detections para otros servicios
+PUBLICAR_DETECCIONES = True
+TASA_DETECCIONES = 10.0  # Mensajes/s como máximo
+
 # ============================================
 
 
 class CamaraModerna:
-    def __init__(self, control_event, port=5005):
+    def __init__(self, control_event, port=5005, fuente=None, mostrar_metricas=False,
+                 pesos=YOLO_PESOS, backend=YOLO_BACKEND, servicio=None, clasificador=CLASIFICADOR_PESOS):
         self.control_event = control_event
         self.port = port
-        self.frame_queue = None
+        self.fuente_uri = fuente or f"udp://:{port}"
         self.frame_actual = None
+        self.rotacion = 0
+        
+        # Buzones entre etapas del pipeline (se crean en start)
+        self.buzon_render = None
+        self.buzon_inferencia = None
+        self.buzon_control = None
+        self.buzon_seguidor = None
+        self.buzon_escena = None
+        self.lock_seguimiento = threading.Lock()
         
         # YOLO
         self.yolo_enabled = False
-        self.model = None
-        self.detecciones = []
+        self.detecciones = Detecciones.vacia()
         
         # Seguimiento automático
         self.seguimiento_activo = False
         self.objeto_seguir = "person"  # Objeto por defecto a seguir
-        self.objetos_disponibles = ["person", "car", "bicycle", "dog", "cat", "bottle", "cell phone", "laptop"]
+        self.objetos_disponibles = list(CLASES_SEGUIBLES)
         self.indice_objeto = 0
         
         # Mejoras de seguimiento
@@ -69,6 +113,20 @@ class CamaraModerna:
         self.historial_posiciones = []
         self.max_historial = MAX_HISTORIAL_POSICIONES
         
+        # Detector + tracker: posiciones al ritmo de la cámara
+        self.modo_hibrido = MODO_HIBRIDO
+        self.seguidor = SeguidorHibrido(DETECTAR_CADA_N_FRAMES, CONFIANZA_MINIMA_TRACKER)
+        self.caja_seguida = None
+        
+        # Inferencia por región de interés (modelo a imgsz reducido, se carga en segundo
+        # plano la primera vez que se usa; hasta entonces se busca en el frame completo)
+        self.inferencia_roi = INFERENCIA_ROI
+        self.roi_actual = None
+        self.pesos = pesos
+        self.backend = backend
+        self.cargador_roi = CargaDiferida(cargar_modelo, pesos, backend, YOLO_IMGSZ_ROI, nombre='YOLO ROI')
+        self.servicio = servicio
+        
         # Control de duración de comandos
         self.tiempo_inicio_giro = 0
         self.max_duracion_giro = TIEMPO_MAX_GIRO
@@ -78,6 +136,7 @@ class CamaraModerna:
         # MQTT para control
         self.mqtt_client = None
         self.mqtt_conectado = False
+        self.publicador = None
         self.MQTT_BROKER = "192.168.1.102"
         self.MQTT_PORT = 1883
         self.ultimo_comando = None
@@ -85,14 +144,39 @@ class CamaraModerna:
         
         # Estadísticas
         self.fps = 0
-        
-        # Cargar YOLO
-        print("🤖 Cargando modelo YOLOv11n...")
-        try:
-            self.model = YOLO('yolo11m.pt')
-            print("✅ Modelo cargado correctamente")
-        except Exception as e:
-            print(f"⚠️ Error cargando YOLO: {e}")
+        self.fps_inferencia = 0.0
+        self.latencia_comando_ms = 0.0
+        self.mostrar_metricas = mostrar_metricas
+        
+        # Paneles estáticos de la interfaz (se pre-renderizan por tamaño)
+        self.paneles = overlay.CachePaneles()
+        self.placeholder = None
+        
+        # YOLO se carga en segundo plano: la ventana y el video no esperan a torch/ultralytics
+        self.cargador = CargaDiferida(self._cargar_modelo, nombre='YOLO')
+        if PRECARGAR_MODELO:
+            self.cargador.iniciar()
+        
+        # Clasificación de escena (tecla E): el clasificador se carga al activarla
+        self.escena_activa = False
+        self.escena = None
+        self.cargador_escena = CargaDiferida(cargar_clasificador, clasificador, backend, nombre='clasificador')
+    
+    @property
+    def model(self):
+        """Modelo YOLO, o None mientras se carga (o si falló la carga)"""
+        return self.cargador.obtener()
+    
+    def _cargar_modelo(self):
+        """Carga YOLO o se conecta al servicio de inferencia compartido"""
+        if self.servicio:
+            print(f"🛰️ Conectando al servicio de inferencia {self.servicio}...")
+            modelo = ClienteInferencia(self.servicio)
+        else:
+            print(f"🤖 Cargando modelo {self.pesos} [{self.backend}]...")
+            modelo = cargar_modelo(self.pesos, self.backend, YOLO_IMGSZ)
+        print("✅ Modelo cargado correctamente")
+        return modelo
     
     def iniciar_mqtt(self):
         """Inicia cliente MQTT para control autónomo"""
@@ -105,6 +189,8 @@ class CamaraModerna:
             self.mqtt_client.on_disconnect = self._on_disconnect
             self.mqtt_client.connect(self.MQTT_BROKER, self.MQTT_PORT, 60)
             self.mqtt_client.loop_start()
+            if PUBLICAR_DETECCIONES:
+                self.publicador = PublicadorDetecciones(self.mqtt_client, TASA_DETECCIONES)
             time.sleep(1)
             return True
         except Exception as e:
@@ -157,13 +243,10 @@ class CamaraModerna:
             return
         
         # Buscar TODOS los objetos del tipo deseado
-        objetivos_candidatos = []
-        for det in detecciones:
-            if det['clase'].lower() == self.objeto_seguir.lower():
-                objetivos_candidatos.append(det)
+        objetivos_candidatos = detecciones.de_clase(self.objeto_seguir)
         
         # Si no hay objetivos
-        if not objetivos_candidatos:
+        if len(objetivos_candidatos) == 0:
             self.frames_sin_objetivo += 1
             
             # Tolerancia: seguir último comando por unos frames
@@ -179,7 +262,7 @@ class CamaraModerna:
         
         # Seleccionar el objetivo más apropiado
         if len(objetivos_candidatos) == 1:
-            objetivo = objetivos_candidatos[0]
+            objetivo = objetivos_candidatos.objetivo(0)
         else:
             # Si hay múltiples, elegir el más cercano al último visto
             # o el más grande (más cercano a cámara)
@@ -190,8 +273,7 @@ class CamaraModerna:
                 )
             else:
                 # Elegir el más grande (más prominente)
-                objetivo = max(objetivos_candidatos, 
-                             key=lambda d: (d['bbox'][2] - d['bbox'][0]) * (d['bbox'][3] - d['bbox'][1]))
+                objetivo = objetivos_candidatos.objetivo(objetivos_candidatos.indice_mas_grande())
         
         # Guardar para siguiente frame
         self.ultimo_objetivo_visto = objetivo
@@ -293,259 +375,402 @@ class CamaraModerna:
     
     def _seleccionar_objetivo_cercano(self, candidatos, ultimo):
         """Selecciona el candidato más cercano al último objetivo visto"""
-        ultimo_x1, ultimo_y1, ultimo_x2, ultimo_y2 = ultimo['bbox']
-        ultimo_cx = (ultimo_x1 + ultimo_x2) / 2
-        ultimo_cy = (ultimo_y1 + ultimo_y2) / 2
-        
-        mejor_candidato = candidatos[0]
-        menor_distancia = float('inf')
-        
-        for candidato in candidatos:
-            x1, y1, x2, y2 = candidato['bbox']
-            cx = (x1 + x2) / 2
-            cy = (y1 + y2) / 2
-            
-            # Distancia euclidiana
-            distancia = ((cx - ultimo_cx) ** 2 + (cy - ultimo_cy) ** 2) ** 0.5
-            
-            if distancia < menor_distancia:
-                menor_distancia = distancia
-                mejor_candidato = candidato
-        
-        return mejor_candidato
-    
-    def obtener_socket_udp(self, port, rcvbuf=8388608):
-        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-        sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, rcvbuf)
-        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-        sock.bind(("", port))
-        sock.settimeout(1.0)
-        return sock
+        return candidatos.objetivo(candidatos.indice_mas_cercano(ultimo['bbox']))
     
     def start(self):
-        self.frame_queue = queue.Queue(maxsize=1)
+        # Etapas conectadas por buzones de una plaza: cada etapa toma siempre
+        # el dato más reciente y las etapas lentas no frenan a las rápidas
+        self.buzon_render = BuzonUltimo()
+        self.buzon_inferencia = BuzonUltimo()
+        self.buzon_control = BuzonUltimo()
+        self.buzon_seguidor = BuzonUltimo()
+        self.buzon_escena = BuzonUltimo()
         
         # Iniciar MQTT
         self.iniciar_mqtt()
         
-        hilo_udp = threading.Thread(target=self._recibir_video_udp, daemon=True)
+        hilo_udp = threading.Thread(target=self._recibir_video, daemon=True)
+        hilo_inferencia = threading.Thread(target=self._hilo_inferencia, daemon=True)
+        hilo_control = threading.Thread(target=self._hilo_control, daemon=True)
+        hilo_seguidor = threading.Thread(target=self._hilo_seguidor, daemon=True)
         hilo_video = threading.Thread(target=self._mostrar_video_moderno, daemon=True)
+        hilo_escena = threading.Thread(target=self._hilo_escena, daemon=True)
         
         hilo_udp.start()
+        hilo_inferencia.start()
+        hilo_control.start()
+        hilo_seguidor.start()
         hilo_video.start()
+        hilo_escena.start()
         
         return hilo_udp, hilo_video
     
-    def _recibir_video_udp(self):
-        sock = self.obtener_socket_udp(self.port)
-        buffer = bytearray()
-        expected_size = None
+    def _recibir_video(self):
+        """Etapa 1: recepción, decodificación y rotación"""
+        fuente = abrir_fuente(self.fuente_uri)
+        
+        while self.control_event.is_set():
+            fotograma = fuente.leer(timeout=1.0)
+            if fotograma is None:
+                continue
+            
+            frame = fotograma.imagen
+            if frame is None:
+                continue
+            
+            # Aplicar rotación
+            if self.rotacion == 90:
+                frame = cv2.rotate(frame, cv2.ROTATE_90_CLOCKWISE)
+            elif self.rotacion == 180:
+                frame = cv2.rotate(frame, cv2.ROTATE_180)
+            elif self.rotacion == 270:
+                frame = cv2.rotate(frame, cv2.ROTATE_90_COUNTERCLOCKWISE)
+            
+            item = (fotograma.seq, time.perf_counter(), frame)
+            self.buzon_render.poner(item)
+            if self.escena_activa:
+                self.buzon_escena.poner(item)
+            if not self.yolo_enabled:
+                continue
+            
+            if self._hibrido_activo():
+                # Todos los frames al tracker; al detector sólo cuando hace falta
+                self.buzon_seguidor.poner(item)
+                if self.seguidor.necesita_deteccion():
+                    self.seguidor.marcar_deteccion_pedida()
+                    self.buzon_inferencia.poner(item)
+            else:
+                self.buzon_inferencia.poner(item)
+        
+        fuente.cerrar()
+    
+    def _hilo_inferencia(self):
+        """Etapa 2: YOLO sobre el frame más reciente disponible"""
+        tiempo_fps = time.time()
+        inferencias = 0
         
         while self.control_event.is_set():
+            item = self.buzon_inferencia.tomar(timeout=0.1)
+            if item is None or not self.yolo_enabled or self.model is None:
+                continue
+            
+            seq, t_captura, frame = item
+            h, w = frame.shape[:2]
             try:
-                data, _ = sock.recvfrom(65535)
+                roi = self._roi_objetivo(w, h)
+                modelo_roi = self._obtener_modelo_roi() if roi is not None else None
+                if modelo_roi is None:
+                    roi = None
+                self.roi_actual = roi
+                dx, dy = 0, 0
                 
-                # Primer paquete: tamaño (4 bytes)
-                if len(data) == 4 and expected_size is None:
-                    expected_size = struct.unpack("I", data)[0]
-                    if expected_size > 200000 or expected_size < 500:
-                        expected_size = None
-                        continue
-                    buffer = bytearray()
-                    continue
+                if roi is not None:
+                    # Sólo la clase seguida y sólo alrededor de su última posición
+                    results, (dx, dy) = predecir_roi(
+                        modelo_roi, frame, roi,
+                        clases=[id_clase(self.model.names, self.objeto_seguir)],
+                        conf=0.45, iou=0.5, imgsz=YOLO_IMGSZ_ROI)
+                else:
+                    # Confianza 0.45 para reducir falsos positivos
+                    results = self.model.predict(frame, verbose=False, conf=0.45, iou=0.5, imgsz=YOLO_IMGSZ)
                 
-                if expected_size:
-                    buffer.extend(data)
-                    
-                    if len(buffer) >= expected_size:
-                        frame = cv2.imdecode(
-                            np.frombuffer(buffer[:expected_size], np.uint8),
-                            cv2.IMREAD_COLOR
-                        )
-                        
-                        if frame is not None:
-                            # Vaciar cola y agregar nuevo frame
-                            while not self.frame_queue.empty():
-                                try:
-                                    self.frame_queue.get_nowait()
-                                except:
-                                    break
-                            
-                            try:
-                                self.frame_queue.put_nowait(frame)
-                            except:
-                                pass
-                        
-                        expected_size = None
-                        buffer = bytearray()
-                    
-                    elif len(buffer) > expected_size + 50000:
-                        buffer = bytearray()
-                        expected_size = None
+                # Extraer detecciones (una sola copia de los tensores)
+                detecciones = Detecciones.desde_resultado(results[0], (dx, dy))
+            except Exception:
+                # Si YOLO falla, continuar mostrando video sin detección
+                detecciones = Detecciones.vacia()
+            
+            self.detecciones = detecciones
+            if self.publicador is not None and self.mqtt_conectado:
+                self.publicador.publicar(detecciones, seq, w, h)
             
-            except socket.timeout:
-                if buffer:
-                    buffer = bytearray()
-                    expected_size = None
+            if self._hibrido_activo():
+                # La detección re-ancla el tracker, que es quien manda comandos
+                self._anclar_seguidor(seq, detecciones, w, h)
+            else:
+                # El controlador actúa en cuanto hay detecciones, sin esperar al render
+                self.buzon_control.poner((seq, t_captura, detecciones, w, h))
             
+            inferencias += 1
+            if time.time() - tiempo_fps >= 1.0:
+                self.fps_inferencia = inferencias / (time.time() - tiempo_fps)
+                inferencias = 0
+                tiempo_fps = time.time()
+    
+    def _hilo_escena(self):
+        """Clasificación de la escena completa en paralelo a la detección"""
+        while self.control_event.is_set():
+            item = self.buzon_escena.tomar(timeout=0.1)
+            if item is None or not self.escena_activa:
+                continue
+            clasificador = self.cargador_escena.obtener()
+            if clasificador is None:
+                continue
+            try:
+                self.escena = clasificador.clasificar(item[2])
             except Exception:
-                buffer = bytearray()
-                expected_size = None
+                self.escena = None
+    
+    def _roi_objetivo(self, w, h):
+        """
+        Región donde buscar el objetivo, o None para buscar en todo el frame.
+        Tras MAX_FRAMES_SIN_OBJETIVO fallos se olvida el objetivo y se vuelve
+        a la búsqueda completa.
+        """
+        if not (self.inferencia_roi and self.seguimiento_activo):
+            return None
+        if id_clase(self.model.names, self.objeto_seguir) is None:
+            return None
+        
+        if self._hibrido_activo() and self.seguidor.caja is not None:
+            caja = self.seguidor.caja
+        elif self.ultimo_objetivo_visto is not None:
+            caja = self.ultimo_objetivo_visto['bbox']
+        else:
+            return None
+        
+        if self.frames_sin_objetivo > self.max_frames_sin_objetivo:
+            return None
+        
+        # Ampliar la región mientras el objetivo no aparece
+        factor = FACTOR_ROI * (1 + 0.25 * self.frames_sin_objetivo)
+        roi = calcular_roi(caja, w, h, factor=factor)
+        
+        # Si la región cubre casi todo el frame no compensa recortar
+        if (roi[2] - roi[0]) * (roi[3] - roi[1]) > 0.8 * w * h:
+            return None
+        return roi
+    
+    def _obtener_modelo_roi(self):
+        """
+        Modelo a imgsz reducido para los recortes, o None mientras se carga:
+        la exportación y el calentamiento no deben parar la inferencia justo
+        al fijar un objetivo
+        """
+        if self.backend == 'pytorch' or self.servicio:
+            return self.model
+        return self.cargador_roi.obtener()
+    
+    def _hilo_control(self):
+        """Etapa 3: seguimiento y envío de comandos"""
+        while self.control_event.is_set():
+            item = self.buzon_control.tomar(timeout=0.1)
+            if item is None or not self.yolo_enabled:
+                continue
+            
+            seq, t_captura, detecciones, w, h = item
+            with self.lock_seguimiento:
+                self.seguir_objeto(detecciones, w, h)
+            self._registrar_latencia(t_captura)
+    
+    def _hibrido_activo(self):
+        return self.modo_hibrido and self.seguimiento_activo and self.model is not None
+    
+    def _anclar_seguidor(self, seq, detecciones, w, h):
+        """Elige el objetivo entre las detecciones y re-ancla el tracker"""
+        candidatos = detecciones.de_clase(self.objeto_seguir)
+        
+        if len(candidatos) == 0:
+            self.seguidor.perder()
+            self.caja_seguida = None
+            # Cada detección fallida cuenta como un frame sin objetivo
+            with self.lock_seguimiento:
+                self.seguir_objeto(candidatos, w, h)
+            return
         
-        sock.close()
+        if self.seguidor.caja is not None:
+            i = candidatos.indice_mas_cercano(self.seguidor.caja)
+        else:
+            i = candidatos.indice_mas_grande()
+        self.seguidor.anclar(seq, candidatos.cajas[i], float(candidatos.confianzas[i]))
+    
+    def _hilo_seguidor(self):
+        """Etapa 3 (modo híbrido): propaga el objetivo en cada frame y controla"""
+        while self.control_event.is_set():
+            item = self.buzon_seguidor.tomar(timeout=0.1)
+            if item is None or not self.yolo_enabled or not self._hibrido_activo():
+                continue
+            
+            seq, t_captura, frame = item
+            caja = self.seguidor.agregar_frame(seq, a_gris_reducido(frame, self.seguidor.escala))
+            self.caja_seguida = caja
+            if caja is None:
+                # Sin objetivo: esperar a que el detector lo encuentre
+                continue
+            
+            h, w = frame.shape[:2]
+            objetivo = Detecciones.unica(caja, self.seguidor.confianza, self.objeto_seguir)
+            with self.lock_seguimiento:
+                self.seguir_objeto(objetivo, w, h)
+            self._registrar_latencia(t_captura)
+    
+    def _registrar_latencia(self, t_captura):
+        """Latencia captura → comando (media móvil exponencial)"""
+        latencia = (time.perf_counter() - t_captura) * 1000
+        if self.latencia_comando_ms == 0:
+            self.latencia_comando_ms = latencia
+        else:
+            self.latencia_comando_ms = 0.9 * self.latencia_comando_ms + 0.1 * latencia
+    
+    def _dibujar_detecciones(self, frame, detecciones):
+        """Dibuja las cajas de las últimas detecciones disponibles"""
+        # Naranja para la clase seguida, verde para el resto
+        seguidos = detecciones.clases == id_clase(detecciones.nombres, self.objeto_seguir)
+        colores = np.where(seguidos[:, None], np.uint8((0, 165, 255)), np.uint8((0, 255, 0)))
+        overlay.dibujar_detecciones(frame, detecciones, colores, fondo_etiqueta=False)
+        
+        # Región de búsqueda actual (inferencia por ROI)
+        roi = self.roi_actual
+        if roi is not None and self.seguimiento_activo:
+            cv2.rectangle(frame, (roi[0], roi[1]), (roi[2], roi[3]), (255, 255, 0), 1)
+        
+        # Caja propagada por el tracker (modo híbrido)
+        caja = self.caja_seguida
+        if caja is not None and self._hibrido_activo():
+            x1, y1, x2, y2 = (int(v) for v in caja)
+            cv2.rectangle(frame, (x1, y1), (x2, y2), (255, 0, 255), 2)
+        return frame
+    
+    def _panel_superior(self, w, h, panel_altura):
+        panel = overlay.Panel(w, panel_altura + 1, (30, 30, 30), 1.0, borde=(0, 255, 0))
+        return panel.texto("ROVER VISION AI", (5, 15), (0, 255, 0), min(0.5, w / 400))
+    
+    def _panel_seguimiento(self, w, banner_h, objeto, modo):
+        panel = overlay.Panel(w, banner_h, (0, 100, 255), 1.0, borde=(0, 200, 255), grosor_borde=2)
+        return panel.texto(f"TRACK: {objeto.upper()}{modo}", (5, int(banner_h / 2) + 5),
+                           (255, 255, 255), min(0.5, w / 500))
+    
+    def _panel_controles(self, w, ctrl_h):
+        panel = overlay.Panel(w, ctrl_h, (20, 20, 20), 1.0)
+        return panel.texto("D:YOLO E:Escena A:Track H:Hib TAB:Obj R:Rot ESC:Exit", (5, ctrl_h - 5),
+                           (200, 200, 200), min(0.35, w / 700))
     
     def _dibujar_interfaz_moderna(self, frame):
         """Dibuja interfaz moderna con estadísticas adaptada al tamaño"""
         h, w = frame.shape[:2]
+        detecciones = self.detecciones
         
-        # Panel superior compacto - Estadísticas
+        # Panel superior compacto - Estadísticas (fondo, borde y título pre-renderizados)
         panel_altura = min(60, int(h * 0.2))
-        cv2.rectangle(frame, (0, 0), (w, panel_altura), (30, 30, 30), -1)
-        cv2.rectangle(frame, (0, 0), (w, panel_altura), (0, 255, 0), 1)
-        
-        # Título compacto
-        titulo_size = min(0.5, w / 400)
-        cv2.putText(frame, "ROVER VISION AI", (5, 15),
-                   cv2.FONT_HERSHEY_SIMPLEX, titulo_size, (0, 255, 0), 1)
+        self.paneles.obtener(('superior', w, h), lambda: self._panel_superior(w, h, panel_altura)).aplicar(frame)
         
         # Stats en una línea
         stats_size = min(0.4, w / 600)
         stats_y = 35
-        cv2.putText(frame, f"FPS:{self.fps:.0f}", (5, stats_y),
-                   cv2.FONT_HERSHEY_SIMPLEX, stats_size, (255, 255, 255), 1)
+        overlay.dibujar_texto(frame, f"FPS:{self.fps:.0f}", (5, stats_y), (255, 255, 255), stats_size)
         
-        cv2.putText(frame, f"Obj:{len(self.detecciones)}", (int(w*0.25), stats_y),
-                   cv2.FONT_HERSHEY_SIMPLEX, stats_size, (255, 255, 255), 1)
+        if self.yolo_enabled:
+            overlay.dibujar_texto(frame, f"Inf:{self.fps_inferencia:.0f} Lat:{self.latencia_comando_ms:.0f}ms",
+                                  (int(w*0.65), stats_y), (255, 255, 255), stats_size)
+        
+        overlay.dibujar_texto(frame, f"Obj:{len(detecciones)}", (int(w*0.25), stats_y), (255, 255, 255), stats_size)
         
         # Estado YOLO
-        estado_yolo = "Y:ON" if self.yolo_enabled else "Y:OFF"
-        color_yolo = (0, 255, 0) if self.yolo_enabled else (128, 128, 128)
-        cv2.putText(frame, estado_yolo, (int(w*0.5), stats_y),
-                   cv2.FONT_HERSHEY_SIMPLEX, stats_size, color_yolo, 1)
+        if not self.yolo_enabled:
+            estado_yolo, color_yolo = "Y:OFF", (128, 128, 128)
+        elif self.cargador.listo:
+            estado_yolo, color_yolo = "Y:ON", (0, 255, 0)
+        else:
+            estado_yolo, color_yolo = "Y:...", (0, 200, 255)
+        overlay.dibujar_texto(frame, estado_yolo, (int(w*0.5), stats_y), color_yolo, stats_size)
+        
+        # Categoría de la escena (clasificador)
+        if self.escena_activa:
+            escena = self.escena
+            if escena is not None:
+                texto_escena = f"Escena:{escena['clase']} {escena['confianza']:.0f}%"
+            else:
+                texto_escena = "Escena:N/D" if self.cargador_escena.error else "Escena:..."
+            overlay.dibujar_texto(frame, texto_escena, (5, min(panel_altura - 4, stats_y + 17)),
+                                  (255, 200, 0), stats_size)
         
         # Estado seguimiento (compacto)
         if self.seguimiento_activo:
             banner_h = min(40, int(h * 0.15))
-            cv2.rectangle(frame, (0, h-banner_h), (w, h), (0, 100, 255), -1)
-            cv2.rectangle(frame, (0, h-banner_h), (w, h), (0, 200, 255), 2)
-            texto_size = min(0.5, w / 500)
-            cv2.putText(frame, f"TRACK: {self.objeto_seguir.upper()}", 
-                       (5, h-int(banner_h/2)+5), cv2.FONT_HERSHEY_SIMPLEX, texto_size, (255, 255, 255), 1)
+            modo = " [HIBRIDO]" if self.modo_hibrido else ""
+            clave = ('seguimiento', w, h, self.objeto_seguir, modo)
+            panel = self.paneles.obtener(clave, lambda: self._panel_seguimiento(w, banner_h, self.objeto_seguir, modo))
+            panel.aplicar(frame, 0, h - banner_h)
         
         # Panel lateral - Lista de objetos (solo si hay espacio)
-        if len(self.detecciones) > 0 and w > 400:
+        if len(detecciones) > 0 and w > 400:
             item_h = min(20, int(h * 0.08))
             panel_w = min(150, int(w * 0.4))
             panel_x = w - panel_w - 5
             panel_y = panel_altura + 5
-            total_h = min(len(self.detecciones) * item_h + 15, h - panel_altura - 50)
+            total_h = min(len(detecciones) * item_h + 15, h - panel_altura - 50)
             
-            cv2.rectangle(frame, (panel_x, panel_y), (w-5, panel_y + total_h), 
-                         (40, 40, 40), -1)
-            cv2.rectangle(frame, (panel_x, panel_y), (w-5, panel_y + total_h), 
-                         (0, 255, 0), 1)
+            overlay.rellenar(frame, panel_x, panel_y, w - 5, panel_y + total_h, (40, 40, 40))
+            cv2.rectangle(frame, (panel_x, panel_y), (w-5, panel_y + total_h), (0, 255, 0), 1)
             
             text_size = min(0.35, w / 800)
-            max_items = min(len(self.detecciones), int(total_h / item_h) - 1)
+            max_items = min(len(detecciones), int(total_h / item_h) - 1)
             
-            for i, det in enumerate(self.detecciones[:max_items]):
+            for i, (_, conf, clase) in enumerate(detecciones[:max_items].filas()):
                 y = panel_y + 15 + i * item_h
-                cv2.putText(frame, f"{det['clase'][:8]}: {det['conf']:.0f}%", 
-                           (panel_x + 5, y), cv2.FONT_HERSHEY_SIMPLEX, text_size, (255, 255, 255), 1)
+                overlay.dibujar_texto(frame, f"{clase[:8]}: {conf:.0f}%", (panel_x + 5, y),
+                                      (255, 255, 255), text_size)
         
         # Controles en la parte inferior (compacto)
         if not self.seguimiento_activo:
             ctrl_h = min(18, int(h * 0.07))
-            cv2.rectangle(frame, (0, h-ctrl_h), (w, h), (20, 20, 20), -1)
-            ctrl_size = min(0.35, w / 700)
-            controles = "D:YOLO A:Track TAB:Obj R:Rot ESC:Exit"
-            cv2.putText(frame, controles, (5, h-5),
-                       cv2.FONT_HERSHEY_SIMPLEX, ctrl_size, (200, 200, 200), 1)
+            self.paneles.obtener(('controles', w, h), lambda: self._panel_controles(w, ctrl_h)).aplicar(frame, 0, h - ctrl_h)
         
         return frame
     
     def _mostrar_video_moderno(self):
-        """Muestra video con interfaz moderna"""
+        """Etapa 4: muestra el frame más nuevo con las últimas detecciones"""
         cv2.namedWindow("Rover Vision AI", cv2.WINDOW_AUTOSIZE)
         
         tiempo_fps = time.time()
+        tiempo_metricas = time.time()
         frames_fps = 0
-        rotacion = 0
         
         while self.control_event.is_set():
-            try:
-                frame = self.frame_queue.get(timeout=0.05)
-                
-                if frame is not None and frame.size > 0:
-                    # Aplicar rotación
-                    if rotacion == 90:
-                        frame = cv2.rotate(frame, cv2.ROTATE_90_CLOCKWISE)
-                    elif rotacion == 180:
-                        frame = cv2.rotate(frame, cv2.ROTATE_180)
-                    elif rotacion == 270:
-                        frame = cv2.rotate(frame, cv2.ROTATE_90_COUNTERCLOCKWISE)
-                    
-                    # Detección YOLO (solo si está habilitado)
-                    if self.yolo_enabled and self.model is not None:
-                        try:
-                            # Confianza 0.45 para reducir falsos positivos
-                            results = self.model.predict(frame, verbose=False, conf=0.45, iou=0.5)
-                            
-                            # Extraer detecciones
-                            self.detecciones = []
-                            
-                            for box in results[0].boxes:
-                                x1, y1, x2, y2 = box.xyxy[0].cpu().numpy()
-                                conf = float(box.conf[0])
-                                cls = int(box.cls[0])
-                                clase = results[0].names[cls]
-                                
-                                self.detecciones.append({
-                                    'bbox': (int(x1), int(y1), int(x2), int(y2)),
-                                    'conf': conf * 100,
-                                    'clase': clase
-                                })
-                            
-                            # Dibujar bounding boxes
-                            frame = results[0].plot()
-                            
-                            # Seguimiento automático
-                            h, w = frame.shape[:2]
-                            self.seguir_objeto(self.detecciones, w, h)
-                            
-                        except Exception:
-                            # Si YOLO falla, continuar mostrando video sin detección
-                            self.detecciones = []
-                    else:
-                        # Limpiar detecciones si YOLO está desactivado
-                        self.detecciones = []
-                    
-                    # Dibujar interfaz
-                    frame = self._dibujar_interfaz_moderna(frame)
-                    
-                    # Calcular FPS
-                    frames_fps += 1
-                    if time.time() - tiempo_fps >= 1.0:
-                        self.fps = frames_fps
-                        frames_fps = 0
-                        tiempo_fps = time.time()
-                    
-                    self.frame_actual = frame
-                    cv2.imshow("Rover Vision AI", frame)
+            item = self.buzon_render.tomar(timeout=0.05)
+            
+            if item is not None:
+                seq, t_captura, frame = item
                 
-            except Exception:
-                # Mostrar último frame válido o pantalla en gris con mensaje
-                if self.frame_actual is not None:
-                    cv2.imshow("Rover Vision AI", self.frame_actual)
+                if self.yolo_enabled:
+                    frame = self._dibujar_detecciones(frame.copy(), self.detecciones)
                 else:
-                    # Crear frame gris con mensaje de espera
+                    # Limpiar detecciones si YOLO está desactivado
+                    self.detecciones = Detecciones.vacia()
+                    frame = frame.copy()
+                
+                # Dibujar interfaz
+                frame = self._dibujar_interfaz_moderna(frame)
+                
+                # Calcular FPS
+                frames_fps += 1
+                if time.time() - tiempo_fps >= 1.0:
+                    self.fps = frames_fps
+                    frames_fps = 0
+                    tiempo_fps = time.time()
+                
+                self.frame_actual = frame
+                cv2.imshow("Rover Vision AI", frame)
+                
+                if self.mostrar_metricas and time.time() - tiempo_metricas >= 5.0:
+                    print(f"📈 Render: {self.fps:.0f} FPS | Inferencia: {self.fps_inferencia:.1f} FPS | "
+                          f"Latencia comando: {self.latencia_comando_ms:.0f} ms")
+                    tiempo_metricas = time.time()
+            
+            elif self.frame_actual is not None:
+                # Mostrar último frame válido
+                cv2.imshow("Rover Vision AI", self.frame_actual)
+            else:
+                # Frame gris con mensaje de espera (se dibuja una sola vez)
+                if self.placeholder is None:
                     placeholder = np.zeros((480, 640, 3), dtype=np.uint8)
                     placeholder[:] = (50, 50, 50)
                     cv2.putText(placeholder, "Esperando video del ESP32...", (120, 220),
                                cv2.FONT_HERSHEY_SIMPLEX, 0.8, (200, 200, 200), 2)
                     cv2.putText(placeholder, "Verifica que la camara este encendida", (100, 260),
                                cv2.FONT_HERSHEY_SIMPLEX, 0.6, (150, 150, 150), 1)
-                    cv2.imshow("Rover Vision AI", placeholder)
+                    self.placeholder = placeholder
+                cv2.imshow("Rover Vision AI", self.placeholder)
             
             # Controles
             key = cv2.waitKey(1) & 0xFF
@@ -560,28 +785,56 @@ class CamaraModerna:
             elif key == ord('d') or key == ord('D'):
                 self.yolo_enabled = not self.yolo_enabled
                 print(f"{'✅' if self.yolo_enabled else '❌'} YOLO: {'ON' if self.yolo_enabled else 'OFF'}")
+                if self.yolo_enabled and not self.cargador.listo:
+                    self.cargador.iniciar()
+                    print("⏳ Cargando modelo en segundo plano...")
+            
+            elif key == ord('e') or key == ord('E'):
+                self.escena_activa = not self.escena_activa
+                self.escena = None
+                if self.escena_activa:
+                    self.cargador_escena.iniciar()
+                    if self.cargador_escena.listo:
+                        self.cargador_escena.obtener().reiniciar()
+                print(f"🏞️ Clasificación de escena: {'ON' if self.escena_activa else 'OFF'}")
             
             elif key == ord('a') or key == ord('A'):
-                self.seguimiento_activo = not self.seguimiento_activo
-                if not self.seguimiento_activo:
-                    self.enviar_comando("stop")
-                    self.historial_posiciones.clear()
-                    self.frames_sin_objetivo = 0
-                    self.ultimo_objetivo_visto = None
-                else:
-                    print(f"🎯 Iniciando seguimiento de: {self.objeto_seguir}")
+                with self.lock_seguimiento:
+                    self.seguimiento_activo = not self.seguimiento_activo
+                    self.seguidor.reiniciar()
+                    self.caja_seguida = None
+                    if not self.seguimiento_activo:
+                        self.enviar_comando("stop")
+                        self.historial_posiciones.clear()
+                        self.frames_sin_objetivo = 0
+                        self.ultimo_objetivo_visto = None
+                    else:
+                        print(f"🎯 Iniciando seguimiento de: {self.objeto_seguir}")
                 print(f"{'🎯' if self.seguimiento_activo else '⏸️'} Seguimiento: {'ACTIVO' if self.seguimiento_activo else 'DESACTIVADO'}")
             
             elif key == 9:  # TAB
-                self.indice_objeto = (self.indice_objeto + 1) % len(self.objetos_disponibles)
-                self.objeto_seguir = self.objetos_disponibles[self.indice_objeto]
-                self.ultimo_objetivo_visto = None
-                self.historial_posiciones.clear()
+                with self.lock_seguimiento:
+                    self.indice_objeto = (self.indice_objeto + 1) % len(self.objetos_disponibles)
+                    self.objeto_seguir = self.objetos_disponibles[self.indice_objeto]
+                    self.ultimo_objetivo_visto = None
+                    self.historial_posiciones.clear()
+                    self.seguidor.reiniciar()
+                    self.caja_seguida = None
                 print(f"🎯 Objeto a seguir: {self.objeto_seguir}")
             
+            elif key == ord('h') or key == ord('H'):
+                with self.lock_seguimiento:
+                    self.modo_hibrido = not self.modo_hibrido
+                    self.seguidor.reiniciar()
+                    self.caja_seguida = None
+                print(f"🧭 Modo híbrido detector+tracker: {'ON' if self.modo_hibrido else 'OFF'}")
+            
             elif key == ord('r') or key == ord('R'):
-                rotacion = (rotacion + 90) % 360
-                print(f"🔄 Rotación: {rotacion}°")
+                self.rotacion = (self.rotacion + 90) % 360
+                print(f"🔄 Rotación: {self.rotacion}°")
+        
+        print(f"📊 Render: {self.fps:.0f} FPS | Inferencia: {self.fps_inferencia:.1f} FPS | "
+              f"Latencia comando: {self.latencia_comando_ms:.0f} ms")
         
         # Detener rover al salir
         if self.seguimiento_activo:
@@ -597,18 +850,33 @@ class CamaraModerna:
 
 
 def main():
+    parser = argparse.ArgumentParser(description="Interfaz moderna con seguimiento autónomo")
+    parser.add_argument("--fuente", default="udp://:5005",
+                        help="udp://:5005, camara://0, archivo://<grabación>, sintetica://320x240@30")
+    parser.add_argument("--metricas", action="store_true",
+                        help="Imprime FPS de render/inferencia y latencia de comandos cada 5 s")
+    parser.add_argument("--modelo", default=YOLO_PESOS, help="Pesos YOLO (.pt)")
+    parser.add_argument("--backend", default=YOLO_BACKEND, choices=BACKENDS)
+    parser.add_argument("--servicio", default=None,
+                        help="host:puerto de servidor_inferencia.py (usa su modelo en lugar de cargar uno)")
+    parser.add_argument("--clasificador", default=CLASIFICADOR_PESOS,
+                        help="Pesos del clasificador de escena (entrenar_modelo.py, tipo clasificación)")
+    args = parser.parse_args()
+    
     print("=" * 70)
     print("🎨 ROVER VISION AI - INTERFAZ MODERNA CON SEGUIMIENTO AUTÓNOMO")
     print("=" * 70)
-    print("📹 Puerto UDP: 5005")
+    print(f"📹 Fuente de video: {args.fuente}")
     print("\n⌨️  CONTROLES:")
     print("   D → Activar/Desactivar YOLO")
+    print("   E → Activar/Desactivar clasificación de escena")
     print("   A → Activar/Desactivar Seguimiento Automático")
+    print("   H → Modo híbrido (YOLO cada N frames + tracker)")
     print("   TAB → Cambiar objeto a seguir")
     print("   R → Rotar cámara")
     print("   ESC → Salir")
     print("\n🎯 OBJETOS DISPONIBLES PARA SEGUIR:")
-    print("   person, car, bicycle, dog, cat, bottle, cell phone, laptop")
+    print(f"   {', '.join(CLASES_SEGUIBLES)}")
     print("=" * 70)
     print()
     
@@ -621,7 +889,9 @@ def main():
     
     signal.signal(signal.SIGINT, signal_handler)
     
-    camara = CamaraModerna(control_event, port=5005)
+    camara = CamaraModerna(control_event, port=5005, fuente=args.fuente, mostrar_metricas=args.metricas,
+                           pesos=args.modelo, backend=args.backend, servicio=args.servicio,
+                           clasificador=args.clasificador)
     camara.start()
     
     try:
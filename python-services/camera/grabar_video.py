@@ -0,0 +1,88 @@
+"""
+⏺️ GRABADOR DEL STREAM DE LA ESP32-CAM
+Guarda los JPEG recibidos por UDP (sin re-codificar) con su hora de llegada
+en segmentos indexados, para reproducirlos luego con reproducir_video.py
+"""
+import argparse
+import os
+import socket
+import sys
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from vision.grabacion import GrabadorFrames
+from vision.protocolo_udp import ReensambladorJPEG, enviar_jpeg_udp, obtener_socket_udp
+
+
+def grabar(port, directorio, reenviar_a=None):
+    """Recibe video UDP y lo graba hasta Ctrl+C"""
+    sock = obtener_socket_udp(port)
+    reensamblador = ReensambladorJPEG()
+
+    sock_reenvio = None
+    if reenviar_a:
+        sock_reenvio = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+
+    grabador = GrabadorFrames(directorio, metadatos={'puerto': port})
+    ultimo_reporte = time.time()
+    frames_reporte = 0
+
+    print(f"⏺️  Grabando UDP:{port} en {os.path.abspath(directorio)}")
+    if reenviar_a:
+        print(f"↪️  Reenviando a 127.0.0.1:{reenviar_a}")
+    print("⌨️  Ctrl+C para detener\n")
+
+    try:
+        while True:
+            try:
+                data, _ = sock.recvfrom(65535)
+            except socket.timeout:
+                reensamblador.descartar()
+                continue
+
+            jpeg = reensamblador.agregar(data)
+            if jpeg is None:
+                continue
+
+            grabador.agregar(jpeg, time.time())
+            frames_reporte += 1
+
+            if sock_reenvio is not None:
+                enviar_jpeg_udp(sock_reenvio, ("127.0.0.1", reenviar_a), jpeg)
+
+            ahora = time.time()
+            if ahora - ultimo_reporte >= 1.0:
+                mb = grabador.bytes_grabados / (1024 * 1024)
+                print(f"\r📼 {grabador.frames_grabados} frames | {mb:.1f} MB | "
+                      f"{frames_reporte / (ahora - ultimo_reporte):.1f} FPS | "
+                      f"perdidos: {reensamblador.frames_perdidos}", end="")
+                frames_reporte = 0
+                ultimo_reporte = ahora
+    except KeyboardInterrupt:
+        pass
+    finally:
+        grabador.cerrar()
+        sock.close()
+        if sock_reenvio is not None:
+            sock_reenvio.close()
+
+    print(f"\n\n✅ Grabación terminada: {grabador.frames_grabados} frames")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Graba el stream UDP de la ESP32-CAM")
+    parser.add_argument("--puerto", type=int, default=5005)
+    parser.add_argument("--salida", default=None,
+                        help="Directorio de la grabación (por defecto grabaciones/<fecha>)")
+    parser.add_argument("--reenviar", type=int, default=None, metavar="PUERTO",
+                        help="Reenvía los frames a otro puerto local para verlos mientras se graba")
+    args = parser.parse_args()
+
+    salida = args.salida or os.path.join("grabaciones", datetime.now().strftime("%Y%m%d_%H%M%S"))
+    grabar(args.puerto, salida, args.reenviar)
+
+
+if __name__ == "__main__":
+    main()
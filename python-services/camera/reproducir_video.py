@@ -0,0 +1,46 @@
+"""
+▶️ REPRODUCTOR DE GRABACIONES DEL ROVER
+Reenvía una grabación por UDP local con el protocolo de la ESP32-CAM,
+así camera_client.py, camera_ui_moderna.py o web_server.py la reciben
+como si el rover estuviera conectado
+"""
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from vision.grabacion import LectorGrabacion, ReproductorGrabacion, reenviar_udp
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Reproduce una grabación por UDP")
+    parser.add_argument("grabacion", help="Directorio creado por grabar_video.py")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--puerto", type=int, default=5005)
+    parser.add_argument("--velocidad", type=float, default=1.0,
+                        help="1 = tiempo original, 2 = doble de rápido, 0 = lo más rápido posible")
+    parser.add_argument("--inicio", type=float, default=0.0, help="Segundo desde el que empezar")
+    parser.add_argument("--bucle", action="store_true", help="Repetir indefinidamente")
+    args = parser.parse_args()
+
+    with LectorGrabacion(args.grabacion) as lector:
+        if len(lector) == 0:
+            print(f"❌ No hay frames en {args.grabacion}")
+            return
+
+        velocidad = "máxima" if not args.velocidad else f"{args.velocidad}x"
+        print(f"▶️  {len(lector)} frames ({lector.duracion():.1f} s) → "
+              f"{args.host}:{args.puerto} a velocidad {velocidad}")
+
+        reproductor = ReproductorGrabacion(lector, velocidad=args.velocidad,
+                                           inicio=args.inicio, bucle=args.bucle)
+        try:
+            enviados = reenviar_udp(reproductor, args.host, args.puerto)
+            print(f"✅ {enviados} frames enviados")
+        except KeyboardInterrupt:
+            print("\n🛑 Reproducción detenida")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""
+🛰️ SERVIDOR DE INFERENCIA COMPARTIDO
+Carga los modelos YOLO una sola vez y atiende a varias herramientas o
+cámaras por IPC local, agrupando los frames en lotes.
+
+Uso:
+  python servidor_inferencia.py --modelo yolo11n.pt --modelo yolo11m.pt
+  python camera_ui_moderna.py --servicio 127.0.0.1:6100
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from vision.modelos import BACKENDS, cargar_modelo
+from vision.servicio_inferencia import (ESPERA_MAXIMA, LOTE_MAXIMO, ServicioInferencia,
+                                        parsear_direccion)
+
+YOLO_PESOS = 'yolo11n.pt'
+YOLO_BACKEND = 'onnx'
+YOLO_IMGSZ = 640
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Servicio de inferencia YOLO compartido con lotes")
+    parser.add_argument("--modelo", action="append", help="Pesos a cargar (repetible; el primero es el de por defecto)")
+    parser.add_argument("--backend", default=YOLO_BACKEND, choices=BACKENDS)
+    parser.add_argument("--imgsz", type=int, default=YOLO_IMGSZ)
+    parser.add_argument("--direccion", default="127.0.0.1:6100", help="host:puerto de escucha")
+    parser.add_argument("--lote", type=int, default=LOTE_MAXIMO, help="Frames máximos por lote")
+    parser.add_argument("--espera-ms", type=float, default=ESPERA_MAXIMA * 1000,
+                        help="Espera máxima para completar un lote")
+    args = parser.parse_args()
+
+    modelos = {}
+    for pesos in args.modelo or [YOLO_PESOS]:
+        print(f"🤖 Cargando modelo {pesos} [{args.backend}]...")
+        # Exportación con tamaño de lote dinámico para poder agrupar frames
+        modelos[pesos] = cargar_modelo(pesos, args.backend, args.imgsz, dynamic=True)
+
+    direccion = parsear_direccion(args.direccion)
+    servicio = ServicioInferencia(modelos, direccion, lote_maximo=args.lote,
+                                  espera_maxima=args.espera_ms / 1000).iniciar()
+
+    print("=" * 60)
+    print(f"🛰️  Servicio de inferencia en {direccion[0]}:{direccion[1]}")
+    print(f"📦 Lotes de hasta {args.lote} frames o {args.espera_ms:.0f} ms")
+    print("⌨️  Ctrl+C para detener")
+    print("=" * 60)
+
+    try:
+        while True:
+            time.sleep(10)
+            e = servicio.estadisticas()
+            print(f"📊 Clientes: {e['clientes']} | Frames: {e['frames']} | "
+                  f"Lote medio: {e['lote_medio']} | Último lote: {e['ms_ultimo_lote']} ms")
+    except KeyboardInterrupt:
+        print("\n🛑 Deteniendo servicio...")
+    finally:
+        servicio.cerrar()
+
+
+if __name__ == "__main__":
+    main()
@@ -5,36 +5,87 @@ Sirve video MJPEG y controla el rover vía web
 
 from flask import Flask, Response, render_template_string, jsonify, request
 from flask_cors import CORS
+import argparse
 import cv2
-import socket
-import struct
+import os
+import sys
 import threading
 import time
 import numpy as np
-from ultralytics import YOLO
 import paho.mqtt.client as mqtt
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from vision.buzon import BuzonUltimo
+from vision.carga_diferida import CargaDiferida
+from vision.detecciones import Detecciones
+from vision.fuentes import abrir_fuente
+from vision.mensajes_detecciones import PublicadorDetecciones
+from vision.modelos import cargar_modelo
+from vision.movimiento import DetectorMovimiento
+from vision.pool_inferencia import PoolInferencia
+from vision.servicio_inferencia import ClienteInferencia
+from vision import overlay
+
 app = Flask(__name__)
 CORS(app)
 
 # Configuración
 ESP32_UDP_PORT = 5005
+VIDEO_SOURCE = f"udp://:{ESP32_UDP_PORT}"
 MQTT_BROKER = "192.168.1.102"
 MQTT_PORT = 1883
 
+# Modelo: backend 'pytorch', 'onnx' u 'openvino' (exportado y cacheado la primera vez)
+YOLO_WEIGHTS = 'yolo11n.pt'
+YOLO_BACKEND = 'onnx'
+YOLO_IMGSZ = 640
+
+# Carga del modelo: 'background' (precarga sin retrasar el video), 'lazy' (al activar YOLO)
+# o 'sync' (antes de servir, el comportamiento anterior)
+MODEL_LOADING = 'background'
+
+# host:puerto de servidor_inferencia.py para compartir su modelo (None = modelo propio)
+INFERENCE_SERVICE = None
+
+# Procesos de inferencia en paralelo, cada uno con su modelo (0 = un solo modelo en este proceso)
+INFERENCE_WORKERS = 0
+INFERENCE_DROP_POLICY = 'descartar_antiguo'
+
+# Publicar detecciones en rover/vision/detections para otros servicios
+PUBLISH_DETECTIONS = True
+DETECTIONS_RATE = 10.0  # Mensajes/s como máximo
+
+# Saltar YOLO si la escena no cambia (se refresca como mínimo cada N segundos)
+MOTION_GATING = True
+MOTION_MAX_INTERVAL = 2.0
+
 # Estado global
+STARTUP_TIME = time.perf_counter()
+first_frame_s = None
 current_frame = None
 yolo_enabled = False
 tracking_enabled = False
 rotation = 0
-detections = []
+detections = Detecciones.vacia()
 fps = 0
+video_source = None
 frame_lock = threading.Lock()
 
-# YOLO Model
-print("🤖 Cargando modelo YOLO...")
-yolo_model = YOLO('yolo11n.pt')
-print("✅ Modelo cargado")
+# Inferencia desacoplada: el receptor deja el último frame y el worker lo procesa
+inference_mailbox = BuzonUltimo()
+detections_lock = threading.Lock()
+frame_seq = 0
+detections_seq = 0
+inference_ms = 0.0
+inference_count = 0
+motion_detector = DetectorMovimiento(intervalo_max=MOTION_MAX_INTERVAL)
+
+# YOLO Model (lo carga model_loader en segundo plano con load_model)
+yolo_model = None
+model_loader = None
+inference_pool = None
+pool_submit_times = {}
 
 # MQTT Client
 mqtt_client = mqtt.Client(
@@ -48,123 +99,184 @@ def on_connect(client, userdata, flags, rc, properties=None):
 mqtt_client.on_connect = on_connect
 
 try:
-    mqtt_client.connect(MQTT_BROKER, MQTT_PORT, 60)
+    # Conexión asíncrona: un broker inalcanzable no retrasa el arranque del servidor
+    mqtt_client.connect_async(MQTT_BROKER, MQTT_PORT, 60)
     mqtt_client.loop_start()
 except Exception as e:
     print(f"⚠️ MQTT no disponible: {e}")
 
+detections_publisher = PublicadorDetecciones(mqtt_client, DETECTIONS_RATE) if PUBLISH_DETECTIONS else None
 
-def receive_video_udp():
-    """Recibe video del ESP32 por UDP"""
-    global current_frame, fps
-    
-    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-    sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 8388608)
-    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-    sock.bind(("", ESP32_UDP_PORT))
-    sock.settimeout(1.0)
+
+def publish_detections(result, seq, frame_shape):
+    """Publica las detecciones por MQTT (el publicador limita la tasa)"""
+    if detections_publisher is not None:
+        detections_publisher.publicar(result, seq, frame_shape[1], frame_shape[0])
+
+
+def receive_video(source_uri=VIDEO_SOURCE):
+    """Recibe video de la fuente configurada (ESP32 por UDP por defecto)"""
+    global current_frame, fps, video_source, frame_seq, first_frame_s
     
-    print(f"📡 Escuchando video UDP en puerto {ESP32_UDP_PORT}")
+    video_source = abrir_fuente(source_uri)
+    print(f"📡 Recibiendo video de {source_uri}")
     
-    buffer = bytearray()
-    expected_size = None
     fps_counter = 0
     fps_time = time.time()
     
     while True:
         try:
-            data, _ = sock.recvfrom(65535)
+            fotograma = video_source.leer(timeout=1.0)
+            if fotograma is None:
+                continue
             
-            # Primer paquete: tamaño
-            if len(data) == 4 and expected_size is None:
-                expected_size = struct.unpack("I", data)[0]
-                if expected_size > 200000 or expected_size < 500:
-                    expected_size = None
-                    continue
-                buffer = bytearray()
+            frame = fotograma.imagen
+            if frame is None:
                 continue
             
-            if expected_size:
-                buffer.extend(data)
-                
-                if len(buffer) >= expected_size:
-                    frame = cv2.imdecode(
-                        np.frombuffer(buffer[:expected_size], np.uint8),
-                        cv2.IMREAD_COLOR
-                    )
-                    
-                    if frame is not None:
-                        # Aplicar rotación
-                        if rotation == 90:
-                            frame = cv2.rotate(frame, cv2.ROTATE_90_CLOCKWISE)
-                        elif rotation == 180:
-                            frame = cv2.rotate(frame, cv2.ROTATE_180)
-                        elif rotation == 270:
-                            frame = cv2.rotate(frame, cv2.ROTATE_90_COUNTERCLOCKWISE)
-                        
-                        # YOLO si está habilitado
-                        if yolo_enabled:
-                            process_yolo(frame)
-                        
-                        with frame_lock:
-                            current_frame = frame.copy()
-                        
-                        # Calcular FPS
-                        fps_counter += 1
-                        if time.time() - fps_time >= 1.0:
-                            fps = fps_counter
-                            fps_counter = 0
-                            fps_time = time.time()
-                    
-                    expected_size = None
-                    buffer = bytearray()
-                
-                elif len(buffer) > expected_size + 50000:
-                    buffer = bytearray()
-                    expected_size = None
+            # Aplicar rotación
+            if rotation == 90:
+                frame = cv2.rotate(frame, cv2.ROTATE_90_CLOCKWISE)
+            elif rotation == 180:
+                frame = cv2.rotate(frame, cv2.ROTATE_180)
+            elif rotation == 270:
+                frame = cv2.rotate(frame, cv2.ROTATE_90_COUNTERCLOCKWISE)
+            
+            # YOLO si está habilitado (sin bloquear la recepción)
+            if yolo_enabled:
+                inference_mailbox.poner((fotograma.seq, frame))
+            
+            with frame_lock:
+                current_frame = frame.copy()
+                frame_seq = fotograma.seq
+            
+            if first_frame_s is None:
+                first_frame_s = time.perf_counter() - STARTUP_TIME
+                print(f"🎞️ Primer frame a los {first_frame_s:.2f} s del arranque")
+            
+            # Calcular FPS
+            fps_counter += 1
+            if time.time() - fps_time >= 1.0:
+                fps = fps_counter
+                fps_counter = 0
+                fps_time = time.time()
         
-        except socket.timeout:
-            if len(buffer) > 0:
-                buffer = bytearray()
-                expected_size = None
         except Exception as e:
             pass
 
 
+def inference_worker():
+    """Procesa con YOLO el frame más reciente; los intermedios se descartan"""
+    global detections, detections_seq, inference_ms, inference_count
+    
+    while True:
+        item = inference_mailbox.tomar(timeout=0.5)
+        if item is None or not yolo_enabled or not model_loader.listo:
+            continue
+        
+        seq, frame = item
+        
+        # Escena estática: las detecciones anteriores siguen siendo válidas
+        if MOTION_GATING and not motion_detector.debe_inferir(frame):
+            with detections_lock:
+                detections_seq = seq
+                current_detections = detections
+            publish_detections(current_detections, seq, frame.shape)
+            continue
+        
+        # Con pool el frame va a un trabajador libre y pool_results_worker publica el resultado
+        if inference_pool is not None:
+            pool_submit_times[seq] = (time.perf_counter(), frame.shape)
+            if not inference_pool.enviar(seq, frame, timeout=0.5):
+                pool_submit_times.pop(seq, None)
+            continue
+        
+        t0 = time.perf_counter()
+        result = process_yolo(frame)
+        elapsed = (time.perf_counter() - t0) * 1000
+        
+        # Publicar detecciones junto al frame al que pertenecen
+        with detections_lock:
+            detections = result
+            detections_seq = seq
+            inference_ms = elapsed
+            inference_count += 1
+        publish_detections(result, seq, frame.shape)
+
+
+def pool_results_worker():
+    """Publica los resultados del pool en orden de frame"""
+    global detections, detections_seq, inference_ms, inference_count
+    
+    while True:
+        item = inference_pool.tomar(timeout=0.5)
+        if item is None:
+            continue
+        
+        seq, result = item
+        t0, shape = pool_submit_times.pop(seq, (None, None))
+        if result is None:
+            # Frame descartado por la política del pool
+            continue
+        
+        with detections_lock:
+            detections = result
+            detections_seq = seq
+            if t0 is not None:
+                inference_ms = (time.perf_counter() - t0) * 1000
+            inference_count += 1
+        if shape is not None:
+            publish_detections(result, seq, shape)
+
+
+def load_model(service=INFERENCE_SERVICE, workers=INFERENCE_WORKERS):
+    """Carga el modelo propio, el pool de procesos o se conecta al servicio compartido"""
+    global yolo_model, inference_pool
+    if workers > 0:
+        print(f"🧵 Iniciando {workers} procesos de inferencia...")
+        inference_pool = PoolInferencia(YOLO_WEIGHTS, YOLO_BACKEND, YOLO_IMGSZ, trabajadores=workers,
+                                        politica=INFERENCE_DROP_POLICY, conf=0.45, iou=0.5).iniciar()
+        threading.Thread(target=pool_results_worker, daemon=True).start()
+    elif service:
+        print(f"🛰️ Conectando al servicio de inferencia {service}...")
+        yolo_model = ClienteInferencia(service)
+    else:
+        print("🤖 Cargando modelo YOLO...")
+        yolo_model = cargar_modelo(YOLO_WEIGHTS, YOLO_BACKEND, YOLO_IMGSZ)
+    print("✅ Modelo cargado")
+
+
 def process_yolo(frame):
     """Procesa frame con YOLO"""
-    global detections
-    
     try:
-        results = yolo_model.predict(frame, verbose=False, conf=0.45, iou=0.5)
-        
-        detections = []
-        for box in results[0].boxes:
-            conf = float(box.conf[0])
-            cls = int(box.cls[0])
-            name = results[0].names[cls]
-            
-            detections.append({
-                'name': name,
-                'confidence': round(conf * 100, 1)
-            })
+        results = yolo_model.predict(frame, verbose=False, conf=0.45, iou=0.5, imgsz=YOLO_IMGSZ)
+        return Detecciones.desde_resultado(results[0])
     except Exception:
-        detections = []
+        return Detecciones.vacia()
+
+
+def placeholder_frame():
+    """Frame de espera (se dibuja una sola vez)"""
+    frame = np.zeros((480, 640, 3), dtype=np.uint8)
+    cv2.putText(frame, "Esperando video ESP32...", (150, 240),
+               cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
+    return frame
 
 
 def generate_frames():
     """Genera stream MJPEG"""
     global current_frame
+    placeholder = placeholder_frame()
     
     while True:
         with frame_lock:
-            if current_frame is not None:
-                frame = current_frame.copy()
-            else:
-                # Frame placeholder
-                frame = np.zeros((480, 640, 3), dtype=np.uint8)
-                cv2.putText(frame, "Esperando video ESP32...", (150, 240),
-                           cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
+            frame = current_frame.copy() if current_frame is not None else placeholder
+        
+        # Cajas de las últimas detecciones sobre el stream
+        if yolo_enabled and frame is not placeholder:
+            with detections_lock:
+                current_detections = detections
+            overlay.dibujar_detecciones(frame, current_detections)
         
         # Codificar como JPEG
         ret, buffer = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, 85])
@@ -205,13 +317,35 @@ def video_feed():
 @app.route('/api/stats')
 def get_stats():
     """Obtiene estadísticas en tiempo real"""
+    with detections_lock:
+        current_detections = detections
+        current_detections_seq = detections_seq
+        inference = {
+            'ms': round(inference_ms, 1),
+            'processed': inference_count,
+            'skipped': inference_mailbox.reemplazados,
+            'motion': motion_detector.estadisticas() if MOTION_GATING else None,
+            'pool': inference_pool.estadisticas() if inference_pool else None
+        }
+    
+    startup = {
+        'first_frame_s': round(first_frame_s, 2) if first_frame_s is not None else None,
+        'model': model_loader.estado() if model_loader else None
+    }
+    
     return jsonify({
         'fps': fps,
         'yolo_enabled': yolo_enabled,
+        'model_ready': bool(model_loader and model_loader.listo),
         'tracking_enabled': tracking_enabled,
         'rotation': rotation,
-        'detections': detections,
-        'object_count': len(detections)
+        'detections': current_detections.a_json(),
+        'detections_seq': current_detections_seq,
+        'frame_seq': frame_seq,
+        'object_count': len(current_detections),
+        'inference': inference,
+        'startup': startup,
+        'video': video_source.estadisticas() if video_source else None
     })
 
 
@@ -225,8 +359,11 @@ def send_command():
     
     if command == 'yolo_on':
         yolo_enabled = True
+        model_loader.iniciar()  # Con MODEL_LOADING='lazy' la carga empieza aquí
+        motion_detector.reiniciar()
     elif command == 'yolo_off':
         yolo_enabled = False
+        inference_mailbox.vaciar()
     elif command == 'tracking_on':
         tracking_enabled = True
     elif command == 'tracking_off':
@@ -240,14 +377,35 @@ def send_command():
 
 
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Servidor web de la cámara del rover")
+    parser.add_argument("--fuente", default=VIDEO_SOURCE,
+                        help="udp://:5005, camara://0, archivo://<grabación>, sintetica://320x240@30")
+    parser.add_argument("--servicio", default=INFERENCE_SERVICE,
+                        help="host:puerto de servidor_inferencia.py (usa su modelo en lugar de cargar uno)")
+    parser.add_argument("--workers", type=int, default=INFERENCE_WORKERS,
+                        help="Procesos de inferencia en paralelo (0 = modelo en este proceso)")
+    parser.add_argument("--model-loading", default=MODEL_LOADING, choices=['background', 'lazy', 'sync'],
+                        help="Precargar en segundo plano, cargar al activar YOLO o antes de servir")
+    args = parser.parse_args()
+    
+    model_loader = CargaDiferida(load_model, args.servicio, args.workers, nombre='YOLO')
+    if args.model_loading == 'sync':
+        model_loader.esperar()
+    elif args.model_loading == 'background':
+        model_loader.iniciar()
+    
     # Iniciar thread de recepción de video
-    video_thread = threading.Thread(target=receive_video_udp, daemon=True)
+    video_thread = threading.Thread(target=receive_video, args=(args.fuente,), daemon=True)
     video_thread.start()
     
+    # Thread de inferencia independiente del receptor
+    inference_thread = threading.Thread(target=inference_worker, daemon=True)
+    inference_thread.start()
+    
     print("\n" + "=" * 60)
     print("🌐 SERVIDOR WEB ROVER VISION AI")
     print("=" * 60)
-    print(f"📡 Recibiendo video UDP en puerto: {ESP32_UDP_PORT}")
+    print(f"📡 Fuente de video: {args.fuente}")
     print(f"🌐 Interfaz web: http://localhost:5000")
     print(f"📹 Stream MJPEG: http://localhost:5000/video_feed")
     print(f"📊 API Stats: http://localhost:5000/api/stats")
@@ -0,0 +1,242 @@
+"""
+🏷️ AUTO-ETIQUETADO DEL DATASET CON CAJAS REALES
+preparar_dataset_yolo sólo escribe etiquetas de imagen completa, así que el
+detector personalizado nunca aprende a localizar. Este comando pasa un
+detector por todo dataset_rover/ y genera un dataset YOLO con cajas reales:
+
+  - N procesos, cada uno con su modelo y su parte de los núcleos, reciben
+    lotes de rutas y leen/decodifican las imágenes ellos mismos
+  - los resultados se guardan en una caché indexada por el hash de la imagen
+    (el del manifiesto del dataset) y de los pesos, así que repetir el
+    comando sólo procesa lo nuevo
+  - la caché guarda todo por encima de CONF_CACHE: cambiar --conf no obliga
+    a volver a inferir
+  - el split train/val es el de dataset_yolo y dataset_clasificacion
+    (split_estable de la ruta relativa), así que los modelos de los tres
+    datasets se pueden comparar sobre las mismas imágenes de validación;
+    las imágenes se enlazan en vez de copiarse
+
+Uso:
+  python autoetiquetar.py --modelo yolo11m.pt --conf 0.35
+  python autoetiquetar.py --clases person car --trabajadores 4 --lote 8
+"""
+import argparse
+import json
+import multiprocessing as mp
+import os
+import shutil
+import sys
+import time
+
+import numpy as np
+import yaml
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from vision.dataset import _nombre_destino, enlazar, split_estable
+from vision.detecciones import redondear
+from vision.manifiesto import ManifiestoDataset
+from vision.modelos import BACKENDS, _ruta_pesos, hash_pesos
+
+BASE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..")
+DATASET = os.path.join(BASE, "dataset_rover")
+SALIDA = os.path.join(BASE, "dataset_autoetiquetado")
+ARCHIVO_CACHE = ".autoetiquetas_cache.json"
+
+CONF_CACHE = 0.10     # Umbral con el que se guarda la caché (el de --conf se aplica al escribir)
+
+_modelo = None
+_imgsz = None
+
+
+def _iniciar_trabajador(pesos, backend, imgsz, hilos, lote):
+    """Inicializador del pool: cada proceso carga su modelo una vez"""
+    global _modelo, _imgsz
+    from vision.modelos import cargar_modelo, limitar_hilos
+
+    limitar_hilos(hilos)
+    # Los lotes necesitan un modelo exportado con batch dinámico
+    opciones = {'dynamic': True} if lote > 1 and backend != 'pytorch' else {}
+    _modelo = cargar_modelo(pesos, backend, imgsz, calentar=False, **opciones)
+    _imgsz = imgsz
+
+
+def _etiquetar_lote(lote):
+    """[(hash, ruta)] → [(hash, detecciones normalizadas [[clase, conf, x1, y1, x2, y2], ...])]"""
+    import cv2
+
+    frames, validos = [], []
+    for hash_, ruta in lote:
+        frame = cv2.imread(ruta, cv2.IMREAD_COLOR)
+        if frame is not None:
+            frames.append(frame)
+            validos.append(hash_)
+    if not frames:
+        return []
+
+    resultados = _modelo.predict(frames, verbose=False, conf=CONF_CACHE, iou=0.5, imgsz=_imgsz, batch=len(frames))
+    salida = []
+    for hash_, frame, resultado in zip(validos, frames, resultados):
+        datos = resultado.boxes.data
+        if hasattr(datos, 'cpu'):
+            datos = datos.cpu().numpy()
+        datos = np.asarray(datos, dtype=np.float32)
+        h, w = frame.shape[:2]
+        cajas = datos[:, :4] / np.array([w, h, w, h], dtype=np.float32)
+        filas = np.column_stack([datos[:, -1], datos[:, -2], cajas])
+        salida.append((hash_, redondear(filas, 5)))
+    return salida
+
+
+def cargar_cache(ruta, clave):
+    """Detecciones en caché para este modelo ({hash: filas}) y la caché completa"""
+    cache = {}
+    if os.path.exists(ruta):
+        with open(ruta) as f:
+            cache = json.load(f)
+    return cache.setdefault(clave, {'nombres': None, 'imagenes': {}}), cache
+
+
+def guardar_cache(ruta, cache):
+    temporal = ruta + ".tmp"
+    with open(temporal, 'w') as f:
+        json.dump(cache, f, separators=(',', ':'))
+    os.replace(temporal, ruta)
+
+
+def escribir_dataset(imagenes, hashes, entrada, salida, conf, clases, incluir_vacias):
+    """Dataset YOLO con las detecciones de la caché por encima de `conf`"""
+    if os.path.exists(salida):
+        shutil.rmtree(salida)
+    for split in ('train', 'val'):
+        os.makedirs(os.path.join(salida, 'images', split), exist_ok=True)
+        os.makedirs(os.path.join(salida, 'labels', split), exist_ok=True)
+
+    resumen = {'train': 0, 'val': 0, 'cajas': 0, 'vacias': 0}
+    for (ruta, categoria), hash_ in zip(imagenes, hashes):
+        filas = entrada['imagenes'].get(hash_)
+        if filas is None:
+            continue  # No se pudo leer
+        filas = [f for f in filas if f[1] >= conf and (clases is None or int(f[0]) in clases)]
+        if not filas:
+            if not incluir_vacias:
+                continue
+            resumen['vacias'] += 1
+
+        # El mismo split que los demás datasets, estable aunque se añadan o borren imágenes
+        rel = f"{categoria}/{os.path.basename(ruta)}"
+        split = split_estable(rel)
+        nombre, extension = _nombre_destino(rel)
+        enlazar(ruta, os.path.join(salida, 'images', split, nombre + extension))
+
+        with open(os.path.join(salida, 'labels', split, nombre + '.txt'), 'w') as f:
+            for clase, _, x1, y1, x2, y2 in filas:
+                f.write(f"{int(clase)} {(x1 + x2) / 2:.6f} {(y1 + y2) / 2:.6f} {x2 - x1:.6f} {y2 - y1:.6f}\n")
+        resumen[split] += 1
+        resumen['cajas'] += len(filas)
+
+    nombres = {int(k): v for k, v in entrada['nombres'].items()}
+    data_yaml = os.path.join(salida, 'data.yaml')
+    with open(data_yaml, 'w') as f:
+        yaml.dump({'path': os.path.abspath(salida), 'train': 'images/train', 'val': 'images/val',
+                   'nc': len(nombres), 'names': nombres}, f, default_flow_style=False)
+    return data_yaml, resumen
+
+
+def autoetiquetar(dataset_path=DATASET, salida=SALIDA, pesos='yolo11m.pt', backend='onnx', imgsz=640,
+                  conf=0.35, clases=None, trabajadores=None, lote=8, incluir_vacias=True):
+    """Etiqueta lo nuevo, actualiza la caché y regenera el dataset; devuelve data.yaml"""
+    print("=" * 70)
+    print("  🏷️ AUTO-ETIQUETADO DEL DATASET")
+    print("=" * 70 + "\n")
+
+    # Rutas y hashes salen del manifiesto: no hay que leer las imágenes ya indexadas
+    with ManifiestoDataset(dataset_path) as manifiesto:
+        filas = manifiesto.imagenes()
+    imagenes = [(os.path.join(dataset_path, *rel.split('/')), categoria) for rel, categoria, *_ in filas]
+    hashes = [hash_ for _, _, _, _, hash_, _, _ in filas]
+    if not imagenes:
+        print(f"❌ No hay imágenes en {dataset_path}")
+        return None
+
+    ruta_cache = os.path.join(dataset_path, ARCHIVO_CACHE)
+    clave = f"{os.path.basename(pesos)}_{hash_pesos(_ruta_pesos(pesos))}_{imgsz}"
+    entrada, cache = cargar_cache(ruta_cache, clave)
+
+    pendientes = {}
+    for (ruta, _), hash_ in zip(imagenes, hashes):
+        if hash_ not in entrada['imagenes']:
+            pendientes.setdefault(hash_, ruta)  # Duplicados exactos: una sola inferencia
+    print(f"📦 {len(imagenes)} imágenes | {len(imagenes) - len(pendientes)} en caché | {len(pendientes)} nuevas")
+
+    if pendientes:
+        trabajadores = trabajadores or max(1, (os.cpu_count() or 2) // 2)
+        hilos = max(1, (os.cpu_count() or 1) // trabajadores)
+        tareas = list(pendientes.items())
+        lotes = [tareas[i:i + lote] for i in range(0, len(tareas), lote)]
+        print(f"🧵 {trabajadores} procesos x {hilos} hilos, lotes de {lote}")
+
+        ctx = mp.get_context("spawn")
+        inicio = time.time()
+        hechas = 0
+        with ctx.Pool(trabajadores, initializer=_iniciar_trabajador,
+                      initargs=(pesos, backend, imgsz, hilos, lote)) as pool:
+            for resultados in pool.imap_unordered(_etiquetar_lote, lotes):
+                for hash_, filas in resultados:
+                    entrada['imagenes'][hash_] = filas
+                hechas += len(resultados)
+                # Guardar de vez en cuando: una interrupción no pierde lo ya etiquetado
+                if hechas % 500 < len(resultados):
+                    guardar_cache(ruta_cache, cache)
+                    ritmo = hechas / max(time.time() - inicio, 1e-6) * 60
+                    print(f"   {hechas}/{len(tareas)} ({ritmo:.0f} imágenes/min)")
+
+        if entrada['nombres'] is None:
+            from vision.modelos import cargar_modelo
+            entrada['nombres'] = dict(cargar_modelo(pesos, backend, imgsz, calentar=False).names)
+        guardar_cache(ruta_cache, cache)
+        duracion = time.time() - inicio
+        print(f"✅ {hechas} imágenes en {duracion:.1f} s ({hechas / max(duracion, 1e-6) * 60:.0f} imágenes/min)")
+
+    if entrada['nombres'] is None:
+        print("❌ La caché no tiene los nombres de clase del modelo")
+        return None
+
+    ids = None
+    if clases:
+        nombres = {v: int(k) for k, v in entrada['nombres'].items()}
+        desconocidas = [c for c in clases if c not in nombres]
+        if desconocidas:
+            # Sin esto, las cajas se filtrarían todas y saldría un dataset de etiquetas vacías
+            print(f"❌ Clases que el modelo no conoce: {', '.join(desconocidas)}")
+            print(f"   Disponibles: {', '.join(sorted(nombres))}")
+            return None
+        ids = {nombres[c] for c in clases}
+
+    data_yaml, resumen = escribir_dataset(imagenes, hashes, entrada, salida, conf, ids, incluir_vacias)
+    print(f"\n📁 {resumen['train']} train / {resumen['val']} val | {resumen['cajas']} cajas con conf ≥ {conf} "
+          f"| {resumen['vacias']} imágenes sin objetos")
+    print(f"✅ Dataset: {data_yaml}")
+    return data_yaml
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Auto-etiquetado de dataset_rover con un detector")
+    parser.add_argument("--dataset", default=DATASET)
+    parser.add_argument("--salida", default=SALIDA)
+    parser.add_argument("--modelo", default="yolo11m.pt")
+    parser.add_argument("--backend", default="onnx", choices=BACKENDS)
+    parser.add_argument("--imgsz", type=int, default=640)
+    parser.add_argument("--conf", type=float, default=0.35)
+    parser.add_argument("--clases", nargs="+", default=None, help="Sólo estas clases (por nombre)")
+    parser.add_argument("--trabajadores", type=int, default=None)
+    parser.add_argument("--lote", type=int, default=8)
+    parser.add_argument("--sin-vacias", action="store_true", help="Omitir imágenes sin detecciones")
+    args = parser.parse_args()
+
+    autoetiquetar(args.dataset, args.salida, args.modelo, args.backend, args.imgsz, args.conf,
+                  args.clases, args.trabajadores, args.lote, not args.sin_vacias)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,30 +1,46 @@
 """
 🎓 CAPTURA DE DATASET DESDE EL ROVER
-Captura imágenes desde la cámara del rover y etiquétalas en categorías
+Captura imágenes desde la cámara del rover y etiquétalas en categorías.
+
+Modos (tecla M):
+  individual  una imagen por pulsación
+  ráfaga      una pulsación toma N frames a M fps
+  continuo    graba mientras se mantiene pulsada la tecla de la categoría
+              (con la repetición de teclado del sistema)
+
+En ráfaga y continuo cada frame pasa por un filtro de calidad (nitidez,
+exposición y distancia de dHash al último guardado): sólo se guardan
+frames nítidos y distintos entre sí.
 """
-import socket
-import struct
+import argparse
 import cv2
-import numpy as np
 import os
+import sys
 from datetime import datetime
 import time
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
 
-def obtener_socket_udp(port, rcvbuf=8388608):
-    """Configura socket UDP para recibir video"""
-    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-    sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, rcvbuf)
-    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-    sock.bind(("", port))
-    sock.settimeout(1.0)
-    return sock
+from vision.calidad import MIN_DISTANCIA_HASH, MIN_NITIDEZ, FiltroCalidad
+from vision.fuentes import abrir_fuente
+from vision.guardado import EscritorImagenes
+from vision.manifiesto import ManifiestoDataset
+from vision import overlay
+
+MODOS = ('individual', 'rafaga', 'continuo')
+RAFAGA_FRAMES = 10
+CAPTURA_FPS = 5.0
+SOLTAR_TECLA = 0.6         # Sin repetición de la tecla durante este tiempo = soltada
+PRIMERA_REPETICION = 1.0   # El sistema tarda más en empezar a repetir la tecla
 
 
 class DatasetCapture:
-    def __init__(self, dataset_path="dataset_rover", port=5005):
+    def __init__(self, dataset_path="dataset_rover", port=5005, fuente=None, rafaga=RAFAGA_FRAMES,
+                 fps=CAPTURA_FPS, min_nitidez=MIN_NITIDEZ, min_distancia=MIN_DISTANCIA_HASH):
         self.port = port
+        self.fuente_uri = fuente or f"udp://:{port}"
         self.dataset_path = dataset_path
+        self.sesion = f"captura_{datetime.now():%Y%m%d_%H%M%S}"
         self.categorias = {
             '1': 'excavacion',
             '2': 'construccion',
@@ -46,6 +62,13 @@ class DatasetCapture:
             'otro': '📦'
         }
         
+        # Ráfaga / continuo con filtro de calidad
+        self.modo = 'individual'
+        self.rafaga = rafaga
+        self.fps = fps
+        self.filtro = FiltroCalidad(min_nitidez=min_nitidez, min_distancia=min_distancia)
+        self.grabacion = None
+        
         # Contadores
         self.contadores = {cat: 0 for cat in self.categorias.values()}
         
@@ -59,7 +82,7 @@ class DatasetCapture:
         print("  📸 CAPTURA DE DATASET DESDE EL ROVER")
         print("=" * 70)
         print(f"📁 Dataset guardado en: {os.path.abspath(self.dataset_path)}")
-        print(f"🎥 Puerto UDP: {self.port}")
+        print(f"🎥 Fuente de video: {self.fuente_uri}")
         print("=" * 70)
         print("\n📋 CATEGORÍAS DISPONIBLES:")
         for key, cat in self.categorias.items():
@@ -68,6 +91,7 @@ class DatasetCapture:
             print(f"  [{key}] {emoji} {cat.upper():15} ({count} imágenes)")
         print("\n⌨️  CONTROLES:")
         print("  1-7     → Capturar imagen en categoría")
+        print(f"  M       → Modo: individual / ráfaga ({self.rafaga} frames a {self.fps:g} fps) / continuo")
         print("  R       → Rotar cámara 90°")
         print("  S       → Ver estadísticas")
         print("  ESC     → Salir")
@@ -84,21 +108,29 @@ class DatasetCapture:
                 os.makedirs(cat_path)
     
     def _cargar_contadores(self):
-        """Cuenta imágenes existentes en cada categoría"""
-        for categoria in self.categorias.values():
-            cat_path = os.path.join(self.dataset_path, categoria)
-            if os.path.exists(cat_path):
-                archivos = [f for f in os.listdir(cat_path) if f.endswith(('.jpg', '.png'))]
-                self.contadores[categoria] = len(archivos)
+        """Conteos por categoría desde el manifiesto del dataset (sin listar carpetas)"""
+        self.manifiesto = ManifiestoDataset(self.dataset_path, self.categorias.values())
+        self.contadores.update(self.manifiesto.contadores())
+        
+        # Escritura en segundo plano; el manifiesto se actualiza al terminar cada archivo
+        self.escritor = EscritorImagenes(al_guardar=self._registrar_imagen)
     
-    def guardar_imagen(self, frame, categoria):
-        """Guarda imagen en la categoría especificada"""
+    def _registrar_imagen(self, ruta, datos, contexto):
+        categoria, filename = contexto
+        self.manifiesto.agregar(categoria, filename, datos, sesion=self.sesion)
+    
+    def guardar_imagen(self, fotograma, categoria, rotacion=0, silencioso=False):
+        """Encola el JPEG recibido para guardarlo en la categoría (sin bloquear el video)"""
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
         filename = f"{categoria}_{timestamp}.jpg"
         filepath = os.path.join(self.dataset_path, categoria, filename)
         
-        cv2.imwrite(filepath, frame)
+        if not self.escritor.guardar(filepath, fotograma, rotacion, (categoria, filename)):
+            print("⚠️ Cola de escritura llena, captura descartada")
+            return
         self.contadores[categoria] += 1
+        if silencioso:
+            return
         
         emoji = self.emojis[categoria]
         print(f"✅ {emoji} Guardada en '{categoria}': {filename} (Total: {self.contadores[categoria]})")
@@ -124,98 +156,114 @@ class DatasetCapture:
         
         print("\n" + "=" * 70 + "\n")
     
+    def _panel_informacion(self, w):
+        """Banda superior semitransparente con los textos fijos"""
+        panel = overlay.Panel(w, 120, (0, 0, 0), 0.6)
+        panel.texto("CAPTURA DE DATASET", (10, 25), (0, 255, 255), 0.7, 2)
+        panel.texto("Presiona 1-7 para capturar", (10, 50), (255, 255, 255))
+        panel.texto("M=Modo | R=Rotar | S=Stats | ESC=Salir", (10, 70), (255, 255, 255))
+        return panel
+    
+    def _iniciar_grabacion(self, categoria):
+        """Empieza una ráfaga o una grabación continua en la categoría"""
+        ahora = time.time()
+        self.filtro.reiniciar_conteos()
+        self.grabacion = {'categoria': categoria, 'siguiente': ahora, 'restantes': self.rafaga,
+                          'hasta': ahora + PRIMERA_REPETICION}
+        emoji = self.emojis[categoria]
+        if self.modo == 'rafaga':
+            print(f"📸 {emoji} Ráfaga en '{categoria}': {self.rafaga} frames a {self.fps:g} fps")
+        else:
+            print(f"⏺️  {emoji} Grabando en '{categoria}' mientras mantengas pulsada la tecla...")
+    
+    def _terminar_grabacion(self):
+        categoria = self.grabacion['categoria']
+        self.grabacion = None
+        print(f"✅ {self.emojis[categoria]} '{categoria}': {self.filtro.resumen()} "
+              f"(Total: {self.contadores[categoria]})")
+    
+    def _muestrear(self, fotograma, frame, rotacion):
+        """Durante una ráfaga o grabación, filtra y guarda frames al ritmo configurado"""
+        grabacion = self.grabacion
+        ahora = time.time()
+        if self.modo == 'continuo' and ahora > grabacion['hasta']:
+            self._terminar_grabacion()
+            return
+        if ahora < grabacion['siguiente']:
+            return
+        # Sin ponerse al día: si la fuente va lenta se toma el siguiente frame que llegue
+        grabacion['siguiente'] = max(grabacion['siguiente'] + 1.0 / self.fps, ahora)
+        
+        aceptado, _, _ = self.filtro.evaluar(frame)
+        if aceptado:
+            self.guardar_imagen(fotograma, grabacion['categoria'], rotacion, silencioso=True)
+        if self.modo == 'rafaga':
+            grabacion['restantes'] -= 1
+            if grabacion['restantes'] <= 0:
+                self._terminar_grabacion()
+    
     def recibir_video_udp(self):
-        """Recibe video UDP y permite capturar imágenes"""
-        sock = obtener_socket_udp(self.port)
+        """Recibe video de la fuente configurada y permite capturar imágenes"""
+        fuente = abrir_fuente(self.fuente_uri)
         
-        buffer = bytearray()
-        expected_size = None
         frame_actual = None
+        fotograma_actual = None  # JPEG recibido: es lo que se guarda al capturar
         rotacion = 0
         
         cv2.namedWindow("CAPTURA DE DATASET - Rover", cv2.WINDOW_AUTOSIZE)
         
-        # Texto de ayuda en pantalla
+        # Texto de ayuda en pantalla (panel fijo pre-renderizado por ancho)
+        paneles = overlay.CachePaneles()
         ultima_captura = ""
         tiempo_ultima_captura = 0
         
         while True:
-            try:
-                # Recibir datos UDP
-                data, _ = sock.recvfrom(65535)
-                
-                # Primer paquete: tamaño
-                if len(data) == 4 and expected_size is None:
-                    expected_size = struct.unpack("I", data)[0]
-                    if expected_size > 200000 or expected_size < 500:
-                        expected_size = None
-                        continue
-                    buffer = bytearray()
-                    continue
+            # Espera corta para que la ventana siga respondiendo sin video
+            fotograma = fuente.leer(timeout=0.03)
+            
+            if fotograma is not None:
+                frame = fotograma.imagen
                 
-                if expected_size:
-                    buffer.extend(data)
+                if frame is not None:
+                    # Aplicar rotación
+                    if rotacion == 90:
+                        frame = cv2.rotate(frame, cv2.ROTATE_90_CLOCKWISE)
+                    elif rotacion == 180:
+                        frame = cv2.rotate(frame, cv2.ROTATE_180)
+                    elif rotacion == 270:
+                        frame = cv2.rotate(frame, cv2.ROTATE_90_COUNTERCLOCKWISE)
                     
-                    if len(buffer) >= expected_size:
-                        frame = cv2.imdecode(
-                            np.frombuffer(buffer[:expected_size], np.uint8),
-                            cv2.IMREAD_COLOR
-                        )
-                        
-                        if frame is not None:
-                            # Aplicar rotación
-                            if rotacion == 90:
-                                frame = cv2.rotate(frame, cv2.ROTATE_90_CLOCKWISE)
-                            elif rotacion == 180:
-                                frame = cv2.rotate(frame, cv2.ROTATE_180)
-                            elif rotacion == 270:
-                                frame = cv2.rotate(frame, cv2.ROTATE_90_COUNTERCLOCKWISE)
-                            
-                            frame_actual = frame.copy()
-                        
-                        expected_size = None
-                        buffer = bytearray()
-            
-            except socket.timeout:
-                pass
-            except Exception as e:
-                pass
+                    frame_actual = frame.copy()
+                    fotograma_actual = fotograma
+                    
+                    if self.grabacion is not None:
+                        self._muestrear(fotograma, frame, rotacion)
             
             # Mostrar frame con overlay
             if frame_actual is not None:
                 display_frame = frame_actual.copy()
                 
-                # Panel de información
-                overlay = display_frame.copy()
+                # Panel de información: fondo, título e instrucciones
                 h, w = display_frame.shape[:2]
-                
-                # Fondo semitransparente para el texto
-                cv2.rectangle(overlay, (0, 0), (w, 120), (0, 0, 0), -1)
-                cv2.addWeighted(overlay, 0.6, display_frame, 0.4, 0, display_frame)
-                
-                # Título
-                cv2.putText(display_frame, "CAPTURA DE DATASET", (10, 25),
-                           cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 255), 2)
-                
-                # Instrucciones
-                cv2.putText(display_frame, "Presiona 1-7 para capturar", (10, 50),
-                           cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1)
-                cv2.putText(display_frame, "R=Rotar | S=Stats | ESC=Salir", (10, 70),
-                           cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1)
+                paneles.obtener(w, lambda: self._panel_informacion(w)).aplicar(display_frame)
                 
                 # Total de imágenes
                 total = sum(self.contadores.values())
-                cv2.putText(display_frame, f"Total: {total} imagenes", (10, 95),
-                           cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 1)
+                overlay.dibujar_texto(display_frame, f"Total: {total} imagenes", (10, 95), (0, 255, 0))
                 
                 # Rotación actual
-                cv2.putText(display_frame, f"Rotacion: {rotacion}", (10, 115),
-                           cv2.FONT_HERSHEY_SIMPLEX, 0.5, (200, 200, 200), 1)
+                overlay.dibujar_texto(display_frame, f"Rotacion: {rotacion}", (10, 115), (200, 200, 200))
+                
+                # Modo y grabación en curso
+                if self.grabacion is not None:
+                    texto = f"REC {self.grabacion['categoria']}: {self.filtro.aceptados} guardados"
+                    overlay.dibujar_texto(display_frame, texto, (10, 140), (0, 0, 255), 0.6, 2)
+                else:
+                    overlay.dibujar_texto(display_frame, f"Modo: {self.modo}", (10, 140), (0, 255, 255))
                 
                 # Mensaje de última captura (desaparece después de 2 segundos)
                 if ultima_captura and (time.time() - tiempo_ultima_captura < 2):
-                    cv2.putText(display_frame, ultima_captura, (w // 2 - 150, h // 2),
-                               cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 255, 0), 2)
+                    overlay.dibujar_texto(display_frame, ultima_captura, (w // 2 - 150, h // 2), (0, 255, 0), 0.8, 2)
                 
                 cv2.imshow("CAPTURA DE DATASET - Rover", display_frame)
             
@@ -223,9 +271,18 @@ class DatasetCapture:
             key = cv2.waitKey(1) & 0xFF
             
             if key == 27:  # ESC
+                if self.grabacion is not None:
+                    self._terminar_grabacion()
+                    continue
                 print("\n🛑 Saliendo...")
                 break
             
+            elif key == ord('m') or key == ord('M'):
+                if self.grabacion is not None:
+                    self._terminar_grabacion()
+                self.modo = MODOS[(MODOS.index(self.modo) + 1) % len(MODOS)]
+                print(f"🎛️  Modo: {self.modo}")
+            
             elif key == ord('r') or key == ord('R'):
                 rotacion = (rotacion + 90) % 360
                 print(f"🔄 Rotación: {rotacion}°")
@@ -233,18 +290,30 @@ class DatasetCapture:
             elif key == ord('s') or key == ord('S'):
                 self.mostrar_estadisticas()
             
+            elif chr(key) in self.categorias and self.modo != 'individual':
+                categoria = self.categorias[chr(key)]
+                if self.grabacion is None:
+                    self._iniciar_grabacion(categoria)
+                elif self.modo == 'continuo' and self.grabacion['categoria'] == categoria:
+                    # Repetición de la tecla mantenida: seguir grabando
+                    self.grabacion['hasta'] = time.time() + SOLTAR_TECLA
+            
             elif chr(key) in self.categorias:
-                if frame_actual is not None:
+                if fotograma_actual is not None:
                     categoria = self.categorias[chr(key)]
-                    self.guardar_imagen(frame_actual, categoria)
+                    self.guardar_imagen(fotograma_actual, categoria, rotacion)
                     emoji = self.emojis[categoria]
                     ultima_captura = f"{emoji} Capturada: {categoria.upper()}"
                     tiempo_ultima_captura = time.time()
                 else:
                     print("⚠️ No hay frame disponible")
         
-        sock.close()
+        if self.grabacion is not None:
+            self._terminar_grabacion()
+        fuente.cerrar()
         cv2.destroyAllWindows()
+        self.escritor.cerrar()
+        self.manifiesto.cerrar()
         
         # Mostrar estadísticas finales
         self.mostrar_estadisticas()
@@ -254,12 +323,24 @@ class DatasetCapture:
 
 def main():
     """Función principal"""
+    parser = argparse.ArgumentParser(description="Captura de dataset desde el rover")
+    parser.add_argument("--fuente", default=None,
+                        help="udp://:5005, camara://0, archivo://<grabación>, sintetica://320x240@30")
+    parser.add_argument("--rafaga", type=int, default=RAFAGA_FRAMES, help="Frames por ráfaga")
+    parser.add_argument("--fps", type=float, default=CAPTURA_FPS, help="Ritmo de muestreo en ráfaga y continuo")
+    parser.add_argument("--min-nitidez", type=float, default=MIN_NITIDEZ,
+                        help="Varianza del Laplaciano mínima (0 = no filtrar borrosos)")
+    parser.add_argument("--min-distancia", type=int, default=MIN_DISTANCIA_HASH,
+                        help="Bits de dHash distintos respecto al último guardado (0 = no filtrar duplicados)")
+    args = parser.parse_args()
+    
     # Configuración
     DATASET_PATH = os.path.join(os.path.dirname(__file__), "..", "..", "dataset_rover")
     PORT = 5005
     
     # Crear capturador
-    capturador = DatasetCapture(dataset_path=DATASET_PATH, port=PORT)
+    capturador = DatasetCapture(dataset_path=DATASET_PATH, port=PORT, fuente=args.fuente, rafaga=args.rafaga,
+                                fps=args.fps, min_nitidez=args.min_nitidez, min_distancia=args.min_distancia)
     
     # Iniciar captura
     capturador.recibir_video_udp()
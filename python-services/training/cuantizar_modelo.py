@@ -0,0 +1,276 @@
+"""
+🗜️ CUANTIZACIÓN INT8 DEL MODELO PERSONALIZADO
+Convierte el ONNX FP32 del modelo entrenado a INT8 con cuantización estática
+de ONNX Runtime (formato QDQ, pesos por canal), calibrando las activaciones
+con una muestra del split de entrenamiento de dataset_rover/ (la misma
+división que dataset_yolo/). Después valida ambos modelos sobre el split de
+validación de dataset_yolo/ (mAP) y mide su latencia en CPU; al no haber
+imágenes de calibración en validación, la comparación no está sesgada.
+
+El modelo INT8 sólo se promueve a la caché de modelos (donde lo encuentra el
+backend 'onnx_int8') si la caída de mAP50-95 no supera la tolerancia. El
+informe se guarda siempre junto al modelo candidato.
+
+La decodificación de cajas de la cabeza Detect (DFL, concatenaciones y
+sigmoides) se deja en FP32: cuantizarla degrada mucho las coordenadas y
+apenas aporta velocidad.
+
+Uso:
+  python cuantizar_modelo.py modelo_rover_custom.pt --imgsz 320
+  python cuantizar_modelo.py modelo_rover_custom.pt --calibracion 200 --tolerancia 0.02
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import sys
+import time
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from vision.dataset import split_estable, splits_guardados
+from vision.modelos import exportar_modelo, ruta_int8
+
+BASE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..")
+DATASET = os.path.join(BASE, "dataset_rover")
+DATA_YAML = os.path.join(BASE, "dataset_yolo", "data.yaml")
+EXTENSIONES = ('.jpg', '.jpeg', '.png')
+
+IMAGENES_CALIBRACION = 100
+IMAGENES_LATENCIA = 50
+TOLERANCIA_MAP = 0.01  # Caída máxima de mAP50-95 (absoluta) para promover el INT8
+
+
+def muestra_calibracion(dataset_path, cantidad, semilla=0, splits=None):
+    """
+    Muestra estratificada (el mismo número de imágenes de cada categoría)
+    sólo del split de entrenamiento: `splits` es {ruta relativa: split} del
+    dataset YOLO; sin él se usa split_estable. Las imágenes ilegibles se saltan.
+    """
+    def de_entrenamiento(rel):
+        return (splits.get(rel) if splits else split_estable(rel)) == 'train'
+
+    categorias = sorted(d for d in os.listdir(dataset_path)
+                        if os.path.isdir(os.path.join(dataset_path, d)) and not d.startswith('.'))
+    por_categoria = {}
+    for categoria in categorias:
+        carpeta = os.path.join(dataset_path, categoria)
+        por_categoria[categoria] = sorted(os.path.join(carpeta, f) for f in os.listdir(carpeta)
+                                          if f.lower().endswith(EXTENSIONES) and de_entrenamiento(f"{categoria}/{f}"))
+
+    azar = random.Random(semilla)
+    for rutas in por_categoria.values():
+        azar.shuffle(rutas)
+
+    # Reparto por turnos para que las categorías pequeñas también entren
+    muestra = []
+    while len(muestra) < cantidad and any(por_categoria.values()):
+        for rutas in por_categoria.values():
+            if rutas and len(muestra) < cantidad:
+                ruta = rutas.pop()
+                # Una captura corrupta o a medio escribir rompería la calibración ya exportado el FP32
+                if cv2.imread(ruta, cv2.IMREAD_COLOR) is not None:
+                    muestra.append(ruta)
+    return muestra
+
+
+def letterbox(imagen, imgsz):
+    """Redimensiona sin deformar y rellena a imgsz x imgsz como hace ultralytics"""
+    h, w = imagen.shape[:2]
+    escala = min(imgsz / h, imgsz / w)
+    nuevo_w, nuevo_h = round(w * escala), round(h * escala)
+    if (nuevo_w, nuevo_h) != (w, h):
+        imagen = cv2.resize(imagen, (nuevo_w, nuevo_h), interpolation=cv2.INTER_LINEAR)
+    lienzo = np.full((imgsz, imgsz, 3), 114, dtype=np.uint8)
+    x, y = (imgsz - nuevo_w) // 2, (imgsz - nuevo_h) // 2
+    lienzo[y:y + nuevo_h, x:x + nuevo_w] = imagen
+    return lienzo
+
+
+def tensor_entrada(ruta, imgsz):
+    """Imagen → tensor NCHW float32 RGB en [0, 1]"""
+    imagen = letterbox(cv2.imread(ruta, cv2.IMREAD_COLOR), imgsz)
+    return np.ascontiguousarray(imagen[:, :, ::-1].transpose(2, 0, 1)[None], dtype=np.float32) / 255.0
+
+
+def nodos_decodificacion(modelo_onnx):
+    """Nodos de la cabeza Detect que no son convoluciones (se quedan en FP32)"""
+    import onnx
+
+    grafo = onnx.load(modelo_onnx).graph
+    indices = [int(n.name.split('/')[1].split('.')[1]) for n in grafo.node
+               if n.name.startswith('/model.') and n.name.split('/')[1].split('.')[1].isdigit()]
+    if not indices:
+        return []
+    cabeza = f"/model.{max(indices)}/"
+    return [n.name for n in grafo.node if n.name.startswith(cabeza) and n.op_type != 'Conv']
+
+
+def cuantizar_onnx(fp32, int8, imagenes, imgsz):
+    """Cuantización estática QDQ calibrada con `imagenes`"""
+    import onnxruntime as ort
+    from onnxruntime.quantization import (CalibrationDataReader, CalibrationMethod, QuantFormat,
+                                          QuantType, quantize_static)
+
+    entrada = ort.InferenceSession(fp32, providers=['CPUExecutionProvider']).get_inputs()[0].name
+
+    class LectorCalibracion(CalibrationDataReader):
+        def __init__(self):
+            self._rutas = iter(imagenes)
+
+        def get_next(self):
+            ruta = next(self._rutas, None)
+            return None if ruta is None else {entrada: tensor_entrada(ruta, imgsz)}
+
+    # El pre-proceso (inferencia de formas y fusión) mejora la cuantización si está disponible
+    origen = fp32
+    try:
+        from onnxruntime.quantization.shape_inference import quant_pre_process
+        origen = int8 + ".pre.onnx"
+        quant_pre_process(fp32, origen)
+    except Exception as e:
+        print(f"⚠️ Sin pre-proceso de ONNX Runtime ({e}), se cuantiza el modelo tal cual")
+        origen = fp32
+
+    excluidos = nodos_decodificacion(origen)
+    print(f"🧮 Calibrando con {len(imagenes)} imágenes ({len(excluidos)} nodos de la cabeza en FP32)...")
+    inicio = time.time()
+    quantize_static(origen, int8, LectorCalibracion(),
+                    quant_format=QuantFormat.QDQ,
+                    activation_type=QuantType.QUInt8,
+                    weight_type=QuantType.QInt8,
+                    per_channel=True,
+                    calibrate_method=CalibrationMethod.MinMax,
+                    nodes_to_exclude=excluidos)
+    if origen != fp32:
+        os.remove(origen)
+    print(f"✅ Cuantizado en {time.time() - inicio:.1f} s → {int8}")
+
+
+def validar(ruta_modelo, data_yaml, imgsz):
+    """mAP del modelo sobre el split de validación"""
+    from ultralytics import YOLO
+
+    metricas = YOLO(ruta_modelo, task='detect').val(data=data_yaml, imgsz=imgsz, batch=1,
+                                                    plots=False, verbose=False)
+    return {'map50': round(float(metricas.box.map50), 4), 'map50_95': round(float(metricas.box.map), 4)}
+
+
+def medir_latencia(ruta_modelo, imagenes, imgsz):
+    """Latencia de predict por imagen (ms) tras calentar"""
+    from ultralytics import YOLO
+
+    modelo = YOLO(ruta_modelo, task='detect')
+    frames = [f for f in (cv2.imread(r, cv2.IMREAD_COLOR) for r in imagenes) if f is not None]
+    for frame in frames[:3]:
+        modelo.predict(frame, imgsz=imgsz, verbose=False)
+    latencias = []
+    for frame in frames:
+        t0 = time.perf_counter()
+        modelo.predict(frame, imgsz=imgsz, verbose=False)
+        latencias.append((time.perf_counter() - t0) * 1000)
+    return {'p50_ms': round(float(np.percentile(latencias, 50)), 2),
+            'p95_ms': round(float(np.percentile(latencias, 95)), 2)}
+
+
+def cuantizar_modelo(pesos, imgsz=320, dataset_path=DATASET, data_yaml=DATA_YAML,
+                     calibracion=IMAGENES_CALIBRACION, tolerancia=TOLERANCIA_MAP):
+    """
+    Cuantiza, valida y promueve si procede. Devuelve el informe (dict) o None
+    si faltan dependencias o datos.
+    """
+    print("=" * 70)
+    print("  🗜️ CUANTIZACIÓN INT8")
+    print("=" * 70 + "\n")
+
+    try:
+        import onnxruntime  # noqa: F401
+        from onnxruntime import quantization  # noqa: F401
+    except ImportError:
+        print("❌ Error: onnxruntime no está instalado")
+        print("   Instalar con: pip install onnxruntime onnx")
+        return None
+
+    if not os.path.exists(data_yaml):
+        print(f"❌ No se encontró {data_yaml}")
+        print("   Prepara el dataset primero con entrenar_modelo.py")
+        return None
+
+    splits = splits_guardados(os.path.dirname(data_yaml))
+    if not splits:
+        print(f"⚠️  Sin estado de {os.path.dirname(data_yaml)}: el split de calibración sale de split_estable")
+    imagenes = muestra_calibracion(dataset_path, calibracion, splits=splits)
+    if not imagenes:
+        print(f"❌ No hay imágenes de entrenamiento legibles para calibrar en {dataset_path}")
+        return None
+
+    fp32 = exportar_modelo(pesos, 'onnx', imgsz)
+    destino = ruta_int8(pesos, imgsz)
+    candidato = destino.replace('_int8.onnx', '_int8.candidato.onnx')
+    cuantizar_onnx(fp32, candidato, imagenes, imgsz)
+
+    print("\n📏 Validando FP32 e INT8...")
+    precision = {'fp32': validar(fp32, data_yaml, imgsz), 'int8': validar(candidato, data_yaml, imgsz)}
+    muestra = imagenes[:IMAGENES_LATENCIA]
+    latencia = {'fp32': medir_latencia(fp32, muestra, imgsz), 'int8': medir_latencia(candidato, muestra, imgsz)}
+
+    caida = precision['fp32']['map50_95'] - precision['int8']['map50_95']
+    promovido = caida <= tolerancia
+    informe = {
+        'pesos': os.path.abspath(pesos),
+        'imgsz': imgsz,
+        'imagenes_calibracion': len(imagenes),
+        'precision': precision,
+        'latencia': latencia,
+        'aceleracion': round(latencia['fp32']['p50_ms'] / latencia['int8']['p50_ms'], 2),
+        'tamano_mb': {'fp32': round(os.path.getsize(fp32) / 1e6, 2),
+                      'int8': round(os.path.getsize(candidato) / 1e6, 2)},
+        'caida_map50_95': round(caida, 4),
+        'tolerancia': tolerancia,
+        'promovido': promovido,
+    }
+
+    if promovido:
+        os.replace(candidato, destino)
+    informe['modelo'] = destino if promovido else candidato
+    ruta_informe = os.path.splitext(informe['modelo'])[0] + ".informe.json"
+    with open(ruta_informe, 'w') as f:
+        json.dump(informe, f, indent=2)
+
+    print("\n📊 INFORME")
+    print(f"   mAP50-95   FP32 {precision['fp32']['map50_95']:.4f} | INT8 {precision['int8']['map50_95']:.4f} "
+          f"(caída {caida:+.4f}, tolerancia {tolerancia})")
+    print(f"   Latencia   FP32 {latencia['fp32']['p50_ms']} ms | INT8 {latencia['int8']['p50_ms']} ms "
+          f"(x{informe['aceleracion']})")
+    print(f"   Tamaño     FP32 {informe['tamano_mb']['fp32']} MB | INT8 {informe['tamano_mb']['int8']} MB")
+    if promovido:
+        print(f"\n✅ INT8 promovido: úsalo con --backend onnx_int8")
+    else:
+        print(f"\n❌ INT8 fuera de tolerancia, no se promueve (candidato en {candidato})")
+    print(f"📝 Informe: {ruta_informe}")
+    return informe
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cuantización INT8 calibrada con el dataset del rover")
+    parser.add_argument("pesos", nargs="?", default="modelo_rover_custom.pt")
+    parser.add_argument("--imgsz", type=int, default=320)
+    parser.add_argument("--dataset", default=DATASET, help="Imágenes de calibración (por categorías)")
+    parser.add_argument("--datos", default=DATA_YAML, help="data.yaml para validar")
+    parser.add_argument("--calibracion", type=int, default=IMAGENES_CALIBRACION)
+    parser.add_argument("--tolerancia", type=float, default=TOLERANCIA_MAP,
+                        help="Caída máxima de mAP50-95 para promover el modelo")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.pesos):
+        print(f"❌ No existe {args.pesos}")
+        return
+    cuantizar_modelo(args.pesos, args.imgsz, args.dataset, args.datos, args.calibracion, args.tolerancia)
+
+
+if __name__ == "__main__":
+    main()
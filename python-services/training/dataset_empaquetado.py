@@ -0,0 +1,62 @@
+"""
+📦 CARGA DE IMÁGENES DESDE FRAGMENTOS EMPAQUETADOS
+Pega de ultralytics con vision/fragmentos.py: DatasetEmpaquetado sustituye
+load_image de YOLODataset para copiar la imagen ya redimensionada desde el
+mmap de los fragmentos en vez de abrir, decodificar y redimensionar el JPEG
+en cada epoch. Las imágenes que no estén empaquetadas (o las peticiones
+sin rect_mode) siguen el camino normal de ultralytics.
+
+Uso: model.train(..., trainer=EntrenadorEmpaquetado) con el dataset
+empaquetado en <dataset_yolo>/empaquetado/ (preparar_dataset_yolo con imgsz).
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from ultralytics.data.dataset import YOLODataset
+from ultralytics.models.yolo.detect import DetectionTrainer
+
+from vision.fragmentos import LectorFragmentos
+
+
+class DatasetEmpaquetado(YOLODataset):
+    """YOLODataset que lee las imágenes de un LectorFragmentos"""
+
+    lector = None
+
+    def load_image(self, i, rect_mode=True):
+        posicion = self.lector.posicion(self.im_files[i]) if self.lector is not None else None
+        if self.ims[i] is not None or posicion is None or not rect_mode:
+            return super().load_image(i, rect_mode)
+
+        imagen, hw0, hw = self.lector.leer(posicion)
+        if self.augment:
+            # El mosaico elige sus compañeras del buffer: se mantiene como en ultralytics
+            self.ims[i], self.im_hw0[i], self.im_hw[i] = imagen, hw0, hw
+            self.buffer.append(i)
+            if 1 < len(self.buffer) >= self.max_buffer_length:
+                j = self.buffer.pop(0)
+                if self.cache != "ram":
+                    self.ims[j], self.im_hw0[j], self.im_hw[j] = None, None, None
+        return imagen, hw0, hw
+
+
+class EntrenadorEmpaquetado(DetectionTrainer):
+    """DetectionTrainer cuyos datasets leen de dataset_yolo/empaquetado/ si existe"""
+
+    def build_dataset(self, img_path, mode="train", batch=None):
+        dataset = super().build_dataset(img_path, mode, batch)
+        # img_path es <dataset_yolo>/images/<split>
+        split = os.path.basename(os.path.normpath(img_path))
+        directorio = os.path.join(os.path.dirname(os.path.dirname(os.path.normpath(img_path))), 'empaquetado')
+        try:
+            lector = LectorFragmentos(directorio, split, dataset.imgsz)
+        except (OSError, ValueError):
+            print(f"⚠️  Sin fragmentos de '{split}' a {dataset.imgsz}px: se leen los JPEG")
+            return dataset
+        if type(dataset) is YOLODataset:
+            dataset.__class__ = DatasetEmpaquetado
+            dataset.lector = lector
+            print(f"📦 '{split}': {len(lector)} imágenes desde fragmentos ({lector.formato})")
+        return dataset
@@ -0,0 +1,92 @@
+"""
+🪞 DEDUPLICAR DATASET_ROVER
+Busca grupos de imágenes casi idénticas dentro de cada categoría (pHash con
+confirmación por dHash, ver vision/duplicados.py) y los muestra. Con
+--mover, las duplicadas se apartan a dataset_rover/.duplicados/<categoría>/
+(se pueden recuperar) y se quitan del manifiesto.
+
+preparar_dataset_yolo ya excluye los duplicados al preparar el
+entrenamiento aunque no se muevan; este comando sirve para revisarlos y
+liberar espacio.
+
+Uso:
+  python deduplicar_dataset.py
+  python deduplicar_dataset.py --max-phash 4 --mover
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from vision.duplicados import MAX_DISTANCIA_DHASH, MAX_DISTANCIA_PHASH, buscar_duplicados, rutas_duplicadas
+from vision.manifiesto import ManifiestoDataset
+
+DATASET = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "dataset_rover")
+CARPETA_DUPLICADOS = ".duplicados"
+
+
+def mover_duplicados(manifiesto, duplicadas):
+    """Aparta las duplicadas a .duplicados/<categoría>/ y las quita del manifiesto"""
+    for rel in sorted(duplicadas):
+        origen = os.path.join(manifiesto.dataset_path, *rel.split('/'))
+        destino = os.path.join(manifiesto.dataset_path, CARPETA_DUPLICADOS, *rel.split('/'))
+        os.makedirs(os.path.dirname(destino), exist_ok=True)
+        try:
+            os.replace(origen, destino)
+        except FileNotFoundError:
+            pass
+        manifiesto.quitar(rel)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Detecta y aparta imágenes casi duplicadas del dataset")
+    parser.add_argument("--dataset", default=DATASET)
+    parser.add_argument("--max-phash", type=int, default=MAX_DISTANCIA_PHASH,
+                        help="Distancia de Hamming máxima del pHash (de 64 bits)")
+    parser.add_argument("--max-dhash", type=int, default=MAX_DISTANCIA_DHASH,
+                        help="Distancia de Hamming máxima del dHash para confirmar")
+    parser.add_argument("--trabajadores", type=int, default=None)
+    parser.add_argument("--mover", action="store_true", help=f"Apartar las duplicadas a {CARPETA_DUPLICADOS}/")
+    parser.add_argument("--salida", default=None, help="Guardar los grupos en JSON")
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.dataset):
+        print(f"❌ Dataset no encontrado: {args.dataset}")
+        return
+
+    print("=" * 70)
+    print("  🪞 BUSCANDO CASI-DUPLICADOS")
+    print("=" * 70 + "\n")
+
+    inicio = time.time()
+    with ManifiestoDataset(args.dataset) as manifiesto:
+        total = manifiesto.total()
+        grupos = buscar_duplicados(manifiesto, args.max_phash, args.max_dhash, args.trabajadores)
+        duplicadas = rutas_duplicadas(grupos)
+        print(f"⏱️  {total} imágenes analizadas en {time.time() - inicio:.1f} s\n")
+
+        for categoria, lista in grupos.items():
+            n = sum(len(d) for _, d in lista)
+            print(f"📁 {categoria:15} : {len(lista):4} grupos, {n:5} duplicadas")
+            for conservada, dups in sorted(lista, key=lambda g: -len(g[1]))[:3]:
+                print(f"      {conservada} ← {len(dups)} parecidas")
+        print(f"\n📊 {len(duplicadas)} duplicadas de {total} ({len(duplicadas) / max(total, 1) * 100:.1f}%)")
+
+        if args.salida:
+            with open(args.salida, 'w') as f:
+                json.dump({c: [{'conservada': k, 'duplicadas': d} for k, d in lista]
+                           for c, lista in grupos.items()}, f, indent=2)
+            print(f"📝 Grupos guardados en {args.salida}")
+
+        if args.mover and duplicadas:
+            mover_duplicados(manifiesto, duplicadas)
+            print(f"✅ {len(duplicadas)} imágenes movidas a {os.path.join(args.dataset, CARPETA_DUPLICADOS)}")
+        elif duplicadas:
+            print("💡 Usa --mover para apartarlas (preparar_dataset_yolo ya las excluye)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,232 @@
+"""
+🧑‍🏫 DESTILACIÓN DEL MODELO MEDIANO EN UNO NANO PARA SEGUIMIENTO
+camera_ui_moderna.py usa yolo11m.pt porque sigue mejor los objetivos, pero en
+CPU es lo más lento del bucle. Este flujo usa el modelo mediano como profesor:
+
+  1. etiquetar  El profesor etiqueta frames de grabaciones del rover (sólo las
+                clases seguibles, CLASES_SEGUIBLES). Las imágenes se guardan
+                con los bytes JPEG originales, sin recodificar.
+  2. entrenar   Se afina un yolo11n sobre esas pseudo-etiquetas. Se mantienen
+                los índices y nombres COCO para que la cabeza parta de los
+                pesos preentrenados y las herramientas lo usen sin cambios.
+  3. evaluar    Recall / precisión / F1 frente al profesor en el split de
+                validación, para el nano original y el destilado, y la
+                latencia de los tres.
+
+El split de validación son los últimos frames de cada grabación (los frames
+vecinos son casi idénticos y mezclarlos inflaría la validación).
+
+Uso:
+  python destilar_modelo.py grabaciones/sesion1 grabaciones/sesion2 --cada 5
+  python destilar_modelo.py grabaciones/* --pasos evaluar
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import time
+
+import cv2
+import numpy as np
+import yaml
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from entrenar_modelo import guardar_metadatos
+from vision.detecciones import Detecciones
+from vision.evaluacion import acuerdo
+from vision.grabacion import LectorGrabacion
+from vision.modelos import BACKENDS, cargar_modelo
+from vision.roi import id_clase
+from vision.seguimiento import CLASES_SEGUIBLES
+
+BASE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..")
+DATASET = os.path.join(BASE, "dataset_destilacion")
+
+PROFESOR = 'yolo11m.pt'
+ESTUDIANTE = 'yolo11n.pt'
+SALIDA_MODELO = 'modelo_rover_destilado.pt'
+CONF_PSEUDO = 0.45          # La misma confianza con la que sigue camera_ui_moderna.py
+FRACCION_VAL = 0.2
+FRACCION_NEGATIVOS = 0.1    # Frames sin objetivos que se conservan (respecto a los positivos)
+
+
+def etiquetar(grabaciones, salida, profesor, backend, imgsz, cada, conf):
+    """Pseudo-etiquetas del profesor en formato YOLO; devuelve la ruta de data.yaml"""
+    print("=" * 70)
+    print("  🏷️ PSEUDO-ETIQUETADO CON EL PROFESOR")
+    print("=" * 70 + "\n")
+
+    modelo = cargar_modelo(profesor, backend, imgsz)
+    nombres = dict(modelo.names)
+    clases = [i for i in (id_clase(nombres, c) for c in CLASES_SEGUIBLES) if i is not None]
+
+    for split in ('train', 'val'):
+        os.makedirs(os.path.join(salida, 'images', split), exist_ok=True)
+        os.makedirs(os.path.join(salida, 'labels', split), exist_ok=True)
+
+    positivos = negativos = cajas = 0
+    inicio = time.time()
+    for grabacion in grabaciones:
+        sesion = os.path.basename(os.path.normpath(grabacion))
+        with LectorGrabacion(grabacion) as lector:
+            indices = list(range(0, len(lector), cada))
+            inicio_val = int(len(indices) * (1 - FRACCION_VAL))
+            print(f"🎞️  {sesion}: {len(indices)} frames")
+
+            for n, i in enumerate(indices):
+                _, jpeg = lector.leer(i)
+                frame = cv2.imdecode(np.frombuffer(jpeg, np.uint8), cv2.IMREAD_COLOR)
+                if frame is None:
+                    continue
+                resultado = modelo.predict(frame, verbose=False, conf=conf, iou=0.5, imgsz=imgsz, classes=clases)[0]
+                detecciones = Detecciones.desde_resultado(resultado)
+
+                if len(detecciones) == 0:
+                    if negativos >= FRACCION_NEGATIVOS * max(1, positivos):
+                        continue
+                    negativos += 1
+                else:
+                    positivos += 1
+                    cajas += len(detecciones)
+
+                split = 'val' if n >= inicio_val else 'train'
+                nombre = f"{sesion}_{i:06d}"
+                with open(os.path.join(salida, 'images', split, nombre + '.jpg'), 'wb') as f:
+                    f.write(jpeg)
+
+                # Formato YOLO: clase x_centro y_centro ancho alto (normalizados)
+                h, w = frame.shape[:2]
+                with open(os.path.join(salida, 'labels', split, nombre + '.txt'), 'w') as f:
+                    for (x1, y1, x2, y2), clase in zip(detecciones.cajas, detecciones.clases):
+                        f.write(f"{clase} {(x1 + x2) / 2 / w:.6f} {(y1 + y2) / 2 / h:.6f} "
+                                f"{(x2 - x1) / w:.6f} {(y2 - y1) / h:.6f}\n")
+
+    print(f"\n✅ {positivos} frames con objetivos ({cajas} cajas) y {negativos} sin objetivos "
+          f"en {time.time() - inicio:.0f} s")
+
+    data_yaml = os.path.join(salida, 'data.yaml')
+    with open(data_yaml, 'w') as f:
+        yaml.dump({'path': os.path.abspath(salida), 'train': 'images/train', 'val': 'images/val',
+                   'nc': len(nombres), 'names': nombres}, f, default_flow_style=False)
+    return data_yaml
+
+
+def entrenar(data_yaml, estudiante, epochs, imgsz):
+    """Afina el nano sobre las pseudo-etiquetas; devuelve la ruta del modelo"""
+    print("=" * 70)
+    print("  🚀 ENTRENANDO EL ESTUDIANTE")
+    print("=" * 70 + "\n")
+
+    from ultralytics import YOLO
+
+    inicio = time.time()
+    modelo = YOLO(estudiante)
+    modelo.train(data=data_yaml, epochs=epochs, imgsz=imgsz, batch=16, name='rover_destilado',
+                 patience=10, save=True, plots=True, verbose=True)
+    segundos = time.time() - inicio
+
+    shutil.copy(str(modelo.trainer.best), SALIDA_MODELO)
+    guardar_metadatos(SALIDA_MODELO, {'tipo': 'destilacion', 'base': estudiante, 'epochs': epochs,
+                                      'imgsz': imgsz, 'segundos_entrenamiento': round(segundos, 1)})
+    print(f"✅ Modelo guardado en: {os.path.abspath(SALIDA_MODELO)} ({segundos / 60:.1f} min)")
+    return SALIDA_MODELO
+
+
+def leer_referencia(salida, split='val'):
+    """[(imagen, detecciones (N, 6) en píxeles)] con las etiquetas del profesor como referencia"""
+    carpeta = os.path.join(salida, 'images', split)
+    muestras = []
+    for nombre in sorted(os.listdir(carpeta)):
+        imagen = cv2.imread(os.path.join(carpeta, nombre), cv2.IMREAD_COLOR)
+        h, w = imagen.shape[:2]
+        ruta = os.path.join(salida, 'labels', split, os.path.splitext(nombre)[0] + '.txt')
+        etiquetas = np.zeros((0, 5), dtype=np.float32)
+        if os.path.getsize(ruta):
+            etiquetas = np.loadtxt(ruta, ndmin=2, dtype=np.float32).reshape(-1, 5)
+        clase, cx, cy, bw, bh = etiquetas.T
+        referencia = np.column_stack([(cx - bw / 2) * w, (cy - bh / 2) * h, (cx + bw / 2) * w,
+                                      (cy + bh / 2) * h, np.ones_like(cx), clase]).astype(np.float32)
+        muestras.append((imagen, referencia))
+    return muestras
+
+
+def evaluar(salida, modelos, backend, imgsz, conf):
+    """Acuerdo con el profesor y latencia de cada modelo en el split de validación"""
+    print("=" * 70)
+    print("  📏 EVALUACIÓN FRENTE AL PROFESOR")
+    print("=" * 70 + "\n")
+
+    muestras = leer_referencia(salida)
+    referencias = [r for _, r in muestras]
+    print(f"🎞️  {len(muestras)} frames de validación, {sum(len(r) for r in referencias)} objetivos del profesor\n")
+
+    resultados = []
+    for nombre, pesos in modelos:
+        if nombre == 'destilado' and not os.path.exists(pesos):
+            print(f"⚠️ No existe {pesos}, se omite")
+            continue
+        modelo = cargar_modelo(pesos, backend, imgsz)
+        clases = [i for i in (id_clase(modelo.names, c) for c in CLASES_SEGUIBLES) if i is not None]
+
+        latencias = []
+        candidatas = []
+        for imagen, _ in muestras:
+            t0 = time.perf_counter()
+            resultado = modelo.predict(imagen, verbose=False, conf=conf, iou=0.5, imgsz=imgsz, classes=clases)[0]
+            latencias.append((time.perf_counter() - t0) * 1000)
+            det = Detecciones.desde_resultado(resultado)
+            candidatas.append(np.column_stack([det.cajas, det.confianzas, det.clases]).astype(np.float32))
+
+        r = {'modelo': nombre, 'pesos': pesos, 'latencia_p50_ms': round(float(np.percentile(latencias, 50)), 1)}
+        r.update(acuerdo(candidatas, referencias, conf))
+        resultados.append(r)
+        print(f"   {nombre:11} recall {r['recall']:.3f} | precisión {r['precision']:.3f} | F1 {r['f1']:.3f} | "
+              f"p50 {r['latencia_p50_ms']:6.1f} ms")
+
+    informe = os.path.splitext(SALIDA_MODELO)[0] + '.informe.json'
+    with open(informe, 'w') as f:
+        json.dump({'imgsz': imgsz, 'conf': conf, 'frames_val': len(muestras), 'resultados': resultados}, f, indent=2)
+    print(f"\n📝 Informe: {informe}")
+    return resultados
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Destilación del modelo mediano en un nano para seguimiento")
+    parser.add_argument("grabaciones", nargs="+", help="Directorios de grabar_video.py")
+    parser.add_argument("--pasos", nargs="+", default=['etiquetar', 'entrenar', 'evaluar'],
+                        choices=['etiquetar', 'entrenar', 'evaluar'])
+    parser.add_argument("--profesor", default=PROFESOR)
+    parser.add_argument("--estudiante", default=ESTUDIANTE)
+    parser.add_argument("--backend", default="onnx", choices=BACKENDS, help="Backend para etiquetar y evaluar")
+    parser.add_argument("--imgsz", type=int, default=640)
+    parser.add_argument("--cada", type=int, default=5, help="Etiquetar uno de cada N frames")
+    parser.add_argument("--conf", type=float, default=CONF_PSEUDO)
+    parser.add_argument("--epochs", type=int, default=50)
+    parser.add_argument("--salida", default=DATASET, help="Dataset de pseudo-etiquetas")
+    args = parser.parse_args()
+
+    data_yaml = os.path.join(args.salida, 'data.yaml')
+    if 'etiquetar' in args.pasos:
+        if os.path.exists(args.salida):
+            shutil.rmtree(args.salida)
+        data_yaml = etiquetar(args.grabaciones, args.salida, args.profesor, args.backend,
+                              args.imgsz, args.cada, args.conf)
+
+    if 'entrenar' in args.pasos:
+        try:
+            entrenar(data_yaml, args.estudiante, args.epochs, args.imgsz)
+        except ImportError:
+            print("❌ Error: ultralytics no está instalado")
+            print("   Instalar con: pip install ultralytics")
+            return
+
+    if 'evaluar' in args.pasos:
+        evaluar(args.salida, [('profesor', args.profesor), ('nano', args.estudiante),
+                              ('destilado', SALIDA_MODELO)], args.backend, args.imgsz, args.conf)
+        print(f"\n💡 Para usarlo: python camera_ui_moderna.py --modelo {SALIDA_MODELO}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,86 +1,77 @@
 """
 🎓 ENTRENAR MODELO YOLO PERSONALIZADO
-Entrena un modelo YOLO con tu dataset capturado
+Entrena un modelo YOLO con tu dataset capturado: un clasificador de escena
+(yolo11n-cls, las categorías describen el frame completo) o un detector con
+cajas de imagen completa.
 """
+import json
 import os
 import shutil
+import sys
+import time
 import yaml
 from datetime import datetime
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
 
-def preparar_dataset_yolo(dataset_path, output_path):
+from vision.dataset import CATEGORIAS, sincronizar
+from vision.duplicados import buscar_duplicados, rutas_duplicadas
+from vision.fragmentos import empaquetar_dataset
+from vision.manifiesto import ManifiestoDataset
+
+
+def preparar_dataset_yolo(dataset_path, output_path, deduplicar=True, imgsz=None, formato='raw'):
     """
-    Convierte dataset capturado a formato YOLO
+    Convierte dataset capturado a formato YOLO de forma incremental: sólo
+    enlaza las imágenes nuevas o modificadas y quita las borradas, y cada
+    imagen conserva su split entre ejecuciones. Con `deduplicar`, los
+    casi-duplicados de cada categoría no llegan al entrenamiento. Con
+    `imgsz`, además empaqueta los splits ya redimensionados (vision/fragmentos.py).
     """
     print("=" * 70)
     print("  📦 PREPARANDO DATASET PARA YOLO")
     print("=" * 70 + "\n")
     
-    # Crear estructura YOLO
     yolo_path = output_path
-    train_images = os.path.join(yolo_path, "images", "train")
-    val_images = os.path.join(yolo_path, "images", "val")
-    train_labels = os.path.join(yolo_path, "labels", "train")
-    val_labels = os.path.join(yolo_path, "labels", "val")
-    
-    for path in [train_images, val_images, train_labels, val_labels]:
-        os.makedirs(path, exist_ok=True)
+    categorias = CATEGORIAS
     
-    # Categorías
-    categorias = ['excavacion', 'construccion', 'peligro', 'zona_libre', 
-                  'objetivo', 'obstaculo', 'otro']
-    
-    # Contar imágenes
-    total_imagenes = 0
-    imagenes_por_categoria = {}
-    
-    for idx, categoria in enumerate(categorias):
+    for categoria in categorias:
         cat_path = os.path.join(dataset_path, categoria)
         if not os.path.exists(cat_path):
             print(f"⚠️  Categoría '{categoria}' no encontrada, creando...")
             os.makedirs(cat_path, exist_ok=True)
-            imagenes_por_categoria[categoria] = 0
-            continue
-        
-        imagenes = [f for f in os.listdir(cat_path) if f.endswith(('.jpg', '.png'))]
-        imagenes_por_categoria[categoria] = len(imagenes)
-        total_imagenes += len(imagenes)
-        
-        # Split 80% train, 20% val
-        split_idx = int(len(imagenes) * 0.8)
-        
-        for i, img_name in enumerate(imagenes):
-            img_path = os.path.join(cat_path, img_name)
-            
-            # Determinar si va a train o val
-            if i < split_idx:
-                dest_images = train_images
-                dest_labels = train_labels
-            else:
-                dest_images = val_images
-                dest_labels = val_labels
-            
-            # Copiar imagen
-            new_img_name = f"{categoria}_{i:04d}.jpg"
-            shutil.copy(img_path, os.path.join(dest_images, new_img_name))
-            
-            # Crear label (toda la imagen es de esta clase)
-            # Formato YOLO: class_id x_center y_center width height (normalized)
-            label_name = new_img_name.replace('.jpg', '.txt').replace('.png', '.txt')
-            label_path = os.path.join(dest_labels, label_name)
-            
-            with open(label_path, 'w') as f:
-                # Clase completa de la imagen (toda la imagen)
-                f.write(f"{idx} 0.5 0.5 1.0 1.0\n")
     
-    print(f"✅ Dataset preparado:")
+    # Crear label (toda la imagen es de esta clase)
+    # Formato YOLO: class_id x_center y_center width height (normalized)
+    indices = {categoria: idx for idx, categoria in enumerate(categorias)}
+    
+    def etiqueta(rel, categoria):
+        return f"{indices[categoria]} 0.5 0.5 1.0 1.0\n"
+    
+    # Las imágenes salen del manifiesto, sin listar las carpetas
+    with ManifiestoDataset(dataset_path, categorias) as manifiesto:
+        archivos = manifiesto.archivos()
+        if deduplicar:
+            duplicadas = rutas_duplicadas(buscar_duplicados(manifiesto))
+            archivos = {rel: datos for rel, datos in archivos.items() if rel not in duplicadas}
+            print(f"🪞 {len(duplicadas)} casi-duplicados excluidos (deduplicar_dataset.py para revisarlos)")
+    resumen = sincronizar(archivos, yolo_path, etiqueta)
+    total_imagenes = resumen['total']
+    
+    metodos = ", ".join(f"{n} {m}" for m, n in resumen['metodos'].items()) or "nada que enlazar"
+    print(f"✅ Dataset preparado en {resumen['segundos']} s:")
     print(f"   📁 {total_imagenes} imágenes totales")
-    print(f"   📁 {int(total_imagenes * 0.8)} para entrenamiento")
-    print(f"   📁 {int(total_imagenes * 0.2)} para validación\n")
+    print(f"   📁 {resumen['train']} para entrenamiento")
+    print(f"   📁 {resumen['val']} para validación")
+    print(f"   🔄 {resumen['actualizadas']} nuevas o modificadas ({metodos}), "
+          f"{resumen['borradas']} borradas, {resumen['sin_cambios']} sin cambios\n")
+    if resumen['faltan']:
+        print(f"⚠️  {resumen['faltan']} imágenes del manifiesto ya no existen: "
+              f"ejecuta reconciliar_dataset.py tras editar las carpetas a mano\n")
     
     print("📊 Imágenes por categoría:")
-    for cat, count in imagenes_por_categoria.items():
-        print(f"   {cat:15} : {count:4} imágenes")
+    for cat in categorias:
+        print(f"   {cat:15} : {resumen['por_categoria'].get(cat, 0):4} imágenes")
     
     # Crear archivo data.yaml
     data_yaml = {
@@ -97,9 +88,125 @@ def preparar_dataset_yolo(dataset_path, output_path):
     
     print(f"\n✅ Archivo data.yaml creado: {yaml_path}\n")
     
+    if imgsz and total_imagenes:
+        for r in empaquetar_dataset(yolo_path, imgsz, formato):
+            if r['rehecho']:
+                print(f"📦 {r['split']}: {r['imagenes']} imágenes a {imgsz}px en {r['fragmentos']} fragmentos "
+                      f"({r['mb']} MB, {r['segundos']} s)")
+            else:
+                print(f"📦 {r['split']}: fragmentos al día ({r['imagenes']} imágenes)")
+        print()
+    
     return yaml_path, total_imagenes
 
 
+def preparar_dataset_clasificacion(dataset_path, output_path, deduplicar=True):
+    """
+    Estructura de clasificación de ultralytics (train/<categoría>, val/<categoría>)
+    con la misma sincronización incremental que preparar_dataset_yolo: el
+    split de cada imagen sale del hash de su ruta (el mismo que en el
+    dataset YOLO), las imágenes se enlazan y las borradas desaparecen de
+    la salida. Con `deduplicar`, los casi-duplicados se excluyen.
+    """
+    print("=" * 70)
+    print("  📦 PREPARANDO DATASET DE CLASIFICACIÓN")
+    print("=" * 70 + "\n")
+    
+    categorias = CATEGORIAS
+    
+    with ManifiestoDataset(dataset_path, categorias) as manifiesto:
+        archivos = manifiesto.archivos()
+        if deduplicar:
+            duplicadas = rutas_duplicadas(buscar_duplicados(manifiesto))
+            archivos = {rel: datos for rel, datos in archivos.items() if rel not in duplicadas}
+            print(f"🪞 {len(duplicadas)} casi-duplicados excluidos (deduplicar_dataset.py para revisarlos)")
+    resumen = sincronizar(archivos, output_path, estructura='clasificacion')
+    total_imagenes = resumen['total']
+    
+    metodos = ", ".join(f"{n} {m}" for m, n in resumen['metodos'].items()) or "nada que enlazar"
+    print(f"✅ Dataset preparado en {resumen['segundos']} s: {total_imagenes} imágenes en {output_path}")
+    print(f"   📁 {resumen['train']} para entrenamiento, {resumen['val']} para validación")
+    print(f"   🔄 {resumen['actualizadas']} nuevas o modificadas ({metodos}), "
+          f"{resumen['borradas']} borradas, {resumen['sin_cambios']} sin cambios")
+    if resumen['faltan']:
+        print(f"⚠️  {resumen['faltan']} imágenes del manifiesto ya no existen: "
+              f"ejecuta reconciliar_dataset.py tras editar las carpetas a mano")
+    if resumen['categorias_excluidas']:
+        print(f"⚠️  Categorías con menos de 2 imágenes, fuera del entrenamiento y la validación: "
+              f"{', '.join(resumen['categorias_excluidas'])}")
+    print("📊 Imágenes por categoría:")
+    for cat in categorias:
+        print(f"   {cat:15} : {resumen['por_categoria'].get(cat, 0):4} imágenes")
+    print()
+    
+    return output_path, total_imagenes
+
+
+def guardar_metadatos(model_path, datos):
+    """Guarda junto al modelo cómo se entrenó (lo usa la comparación clasificación/detección)"""
+    with open(os.path.splitext(model_path)[0] + '.json', 'w') as f:
+        json.dump(datos, f, indent=2)
+
+
+def entrenar_clasificador(dataset_dir, epochs=50, imgsz=224):
+    """
+    Entrena un clasificador de escena yolo11n-cls
+    """
+    print("=" * 70)
+    print("  🚀 ENTRENANDO CLASIFICADOR DE ESCENA")
+    print("=" * 70 + "\n")
+    
+    try:
+        from ultralytics import YOLO
+        
+        print("📥 Cargando modelo base YOLOv11n-cls...")
+        model = YOLO('yolo11n-cls.pt')
+        
+        print(f"🎯 Configuración:")
+        print(f"   Epochs: {epochs}")
+        print(f"   Tamaño de imagen: {imgsz}x{imgsz}")
+        print(f"   Dataset: {dataset_dir}\n")
+        
+        inicio = time.time()
+        model.train(
+            data=dataset_dir,
+            epochs=epochs,
+            imgsz=imgsz,
+            batch=16,
+            name='rover_clasificador',
+            patience=10,
+            save=True,
+            plots=True,
+            verbose=True
+        )
+        segundos = time.time() - inicio
+        
+        print("\n" + "=" * 70)
+        print(f"  ✅ ENTRENAMIENTO COMPLETADO ({segundos / 60:.1f} min)")
+        print("=" * 70 + "\n")
+        
+        model_path = str(model.trainer.best)
+        if os.path.exists(model_path):
+            dest_path = 'modelo_rover_clasificador.pt'
+            shutil.copy(model_path, dest_path)
+            guardar_metadatos(dest_path, {'tipo': 'clasificacion', 'base': 'yolo11n-cls.pt',
+                                          'epochs': epochs, 'imgsz': imgsz, 'segundos_entrenamiento': round(segundos, 1)})
+            print(f"✅ Modelo guardado en: {os.path.abspath(dest_path)}")
+            print(f"📁 Resultados de entrenamiento: {model.trainer.save_dir}")
+            return dest_path
+        else:
+            print(f"⚠️  No se encontró el modelo en {model_path}")
+            return None
+    
+    except ImportError:
+        print("❌ Error: ultralytics no está instalado")
+        print("   Instalar con: pip install ultralytics")
+        return None
+    except Exception as e:
+        print(f"❌ Error durante el entrenamiento: {e}")
+        return None
+
+
 def entrenar_modelo(data_yaml, epochs=50, imgsz=320):
     """
     Entrena modelo YOLO personalizado
@@ -122,8 +229,16 @@ def entrenar_modelo(data_yaml, epochs=50, imgsz=320):
         
         print("⏳ Entrenando... (esto puede tardar 5-30 minutos)\n")
         
+        # Con el dataset empaquetado, las imágenes salen ya redimensionadas de los fragmentos
+        entrenador = {}
+        if os.path.isdir(os.path.join(os.path.dirname(data_yaml), 'empaquetado')):
+            from dataset_empaquetado import EntrenadorEmpaquetado
+            entrenador = {'trainer': EntrenadorEmpaquetado}
+        
         # Entrenar
+        inicio = time.time()
         results = model.train(
+            **entrenador,
             data=data_yaml,
             epochs=epochs,
             imgsz=imgsz,
@@ -134,6 +249,7 @@ def entrenar_modelo(data_yaml, epochs=50, imgsz=320):
             plots=True,
             verbose=True
         )
+        segundos = time.time() - inicio
         
         print("\n" + "=" * 70)
         print("  ✅ ENTRENAMIENTO COMPLETADO")
@@ -146,6 +262,8 @@ def entrenar_modelo(data_yaml, epochs=50, imgsz=320):
             # Copiar a raíz del proyecto
             dest_path = 'modelo_rover_custom.pt'
             shutil.copy(model_path, dest_path)
+            guardar_metadatos(dest_path, {'tipo': 'deteccion', 'base': 'yolo11n.pt',
+                                          'epochs': epochs, 'imgsz': imgsz, 'segundos_entrenamiento': round(segundos, 1)})
             print(f"✅ Modelo guardado en: {os.path.abspath(dest_path)}")
             print(f"📁 Resultados de entrenamiento: runs/detect/rover_custom/")
             
@@ -173,6 +291,7 @@ def main():
     base_path = os.path.dirname(__file__)
     dataset_path = os.path.join(base_path, "..", "..", "dataset_rover")
     yolo_path = os.path.join(base_path, "..", "..", "dataset_yolo")
+    clasificacion_path = os.path.join(base_path, "..", "..", "dataset_clasificacion")
     
     # Verificar que existe el dataset
     if not os.path.exists(dataset_path):
@@ -180,14 +299,9 @@ def main():
         print("   Primero captura imágenes con capturar_dataset.py")
         return
     
-    # Contar imágenes totales
-    total = 0
-    for categoria in ['excavacion', 'construccion', 'peligro', 'zona_libre', 
-                      'objetivo', 'obstaculo', 'otro']:
-        cat_path = os.path.join(dataset_path, categoria)
-        if os.path.exists(cat_path):
-            imagenes = [f for f in os.listdir(cat_path) if f.endswith(('.jpg', '.png'))]
-            total += len(imagenes)
+    # Contar imágenes totales (conteo del manifiesto, sin listar carpetas)
+    with ManifiestoDataset(dataset_path) as manifiesto:
+        total = manifiesto.total()
     
     print(f"📦 Dataset encontrado: {total} imágenes")
     
@@ -199,6 +313,13 @@ def main():
             print("❌ Entrenamiento cancelado")
             return
     
+    # Tipo de modelo
+    print("\n🧠 TIPO DE MODELO:")
+    print("   [1] Clasificación de escena (yolo11n-cls) - recomendado: las categorías son del frame completo")
+    print("   [2] Detección (yolo11n) con cajas de imagen completa")
+    clasificacion = input("   Opción [1]: ").strip() != '2'
+    imgsz_defecto = 224 if clasificacion else 320
+    
     # Configuración
     print("\n⚙️  CONFIGURACIÓN:")
     
@@ -209,20 +330,25 @@ def main():
         epochs = 50
     
     try:
-        imgsz_input = input("   Tamaño de imagen [320]: ").strip()
-        imgsz = int(imgsz_input) if imgsz_input else 320
+        imgsz_input = input(f"   Tamaño de imagen [{imgsz_defecto}]: ").strip()
+        imgsz = int(imgsz_input) if imgsz_input else imgsz_defecto
     except ValueError:
-        imgsz = 320
+        imgsz = imgsz_defecto
     
     print(f"\n✅ Configuración final:")
+    print(f"   🧠 Tipo: {'clasificación' if clasificacion else 'detección'}")
     print(f"   📊 Imágenes: {total}")
     print(f"   🔄 Epochs: {epochs}")
     print(f"   📐 Tamaño: {imgsz}x{imgsz}")
     
     input("\nPresiona ENTER para comenzar el entrenamiento...")
     
+    if clasificacion:
+        entrenar_escena(dataset_path, clasificacion_path, epochs, imgsz)
+        return
+    
     # Preparar dataset
-    data_yaml, num_imgs = preparar_dataset_yolo(dataset_path, yolo_path)
+    data_yaml, num_imgs = preparar_dataset_yolo(dataset_path, yolo_path, imgsz=imgsz)
     
     if num_imgs == 0:
         print("\n❌ No hay imágenes para entrenar")
@@ -232,20 +358,70 @@ def main():
     model_path = entrenar_modelo(data_yaml, epochs=epochs, imgsz=imgsz)
     
     if model_path:
+        # Pre-exportar para CPU: las cámaras lo encontrarán ya en caché
+        respuesta = input("\n¿Exportar a ONNX para inferencia rápida en CPU? (s/n): ")
+        if respuesta.lower() == 's':
+            try:
+                from vision.modelos import exportar_modelo
+                exportar_modelo(model_path, 'onnx', imgsz=imgsz)
+            except Exception as e:
+                print(f"⚠️  No se pudo exportar: {e}")
+        
+        # INT8 calibrado con el propio dataset; sólo se promueve si no pierde precisión
+        respuesta = input("\n¿Cuantizar a INT8 (calibrado con dataset_rover)? (s/n): ")
+        if respuesta.lower() == 's':
+            from cuantizar_modelo import cuantizar_modelo
+            cuantizar_modelo(model_path, imgsz, dataset_path, data_yaml)
+        
         print("\n" + "=" * 70)
         print("  🎉 ¡LISTO PARA USAR!")
         print("=" * 70)
         print(f"\n📝 Para usar tu modelo personalizado:")
         print(f"\n1. Edita: python-services/camera/camera_client.py")
-        print(f"2. Cambia la línea 32:")
-        print(f"   self.model = YOLO('yolo11n.pt')")
+        print(f"2. Cambia la configuración del modelo:")
+        print(f"   YOLO_PESOS = 'yolo11n.pt'")
+        print(f"   YOLO_IMGSZ = 640")
         print(f"   Por:")
-        print(f"   self.model = YOLO('modelo_rover_custom.pt')")
+        print(f"   YOLO_PESOS = 'modelo_rover_custom.pt'")
+        print(f"   YOLO_IMGSZ = {imgsz}")
+        print(f"   (o ejecuta: python camera_client.py --modelo modelo_rover_custom.pt)")
+        print(f"   Con el INT8 promovido añade: --backend onnx_int8")
         print(f"\n3. Reinicia el sistema con: iniciar_rover.bat")
         print("\n" + "=" * 70 + "\n")
     else:
         print("\n❌ Entrenamiento fallido")
 
 
+def entrenar_escena(dataset_path, clasificacion_path, epochs, imgsz):
+    """Flujo completo del clasificador de escena: dataset, entrenamiento y exportación"""
+    dataset_dir, num_imgs = preparar_dataset_clasificacion(dataset_path, clasificacion_path)
+    if num_imgs == 0:
+        print("\n❌ No hay imágenes para entrenar")
+        return
+    
+    model_path = entrenar_clasificador(dataset_dir, epochs=epochs, imgsz=imgsz)
+    if not model_path:
+        print("\n❌ Entrenamiento fallido")
+        return
+    
+    respuesta = input("\n¿Exportar a ONNX para inferencia rápida en CPU? (s/n): ")
+    if respuesta.lower() == 's':
+        try:
+            from vision.modelos import exportar_modelo
+            exportar_modelo(model_path, 'onnx', imgsz=imgsz)
+        except Exception as e:
+            print(f"⚠️  No se pudo exportar: {e}")
+    
+    print("\n" + "=" * 70)
+    print("  🎉 ¡LISTO PARA USAR!")
+    print("=" * 70)
+    print(f"\n📝 Clasificación de escena en las cámaras (tecla E):")
+    print(f"   python camera_client.py --clasificador {model_path}")
+    print(f"   python camera_ui_moderna.py --clasificador {model_path}")
+    print(f"\n📊 Comparar con el detector:")
+    print(f"   python ../benchmarks/comparar_clasificacion.py")
+    print("\n" + "=" * 70 + "\n")
+
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,54 @@
+"""
+📒 RECONCILIAR EL MANIFIESTO DEL DATASET
+Las herramientas de captura mantienen dataset_rover/.manifiesto.sqlite al
+día, pero si se añaden, mueven o borran imágenes a mano el índice queda
+desfasado. Este comando lo compara con las carpetas y lo repara (sólo
+calcula el hash de lo nuevo o modificado), y muestra los conteos.
+
+Uso:
+  python reconciliar_dataset.py
+  python reconciliar_dataset.py --dataset ../../dataset_rover --sesiones
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from vision.manifiesto import ManifiestoDataset
+
+DATASET = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "dataset_rover")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Repara el manifiesto del dataset tras ediciones manuales")
+    parser.add_argument("--dataset", default=DATASET)
+    parser.add_argument("--sesiones", action="store_true", help="Mostrar también imágenes por sesión de captura")
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.dataset):
+        print(f"❌ Dataset no encontrado: {args.dataset}")
+        return
+
+    inicio = time.time()
+    with ManifiestoDataset(args.dataset) as manifiesto:
+        cambios = manifiesto.reconciliar()
+        print(f"✅ Manifiesto reconciliado en {time.time() - inicio:.2f} s: {cambios['nuevas']} nuevas, "
+              f"{cambios['modificadas']} modificadas, {cambios['borradas']} borradas")
+
+        print(f"\n📦 TOTAL: {manifiesto.total()} imágenes")
+        for categoria, total in manifiesto.contadores().items():
+            print(f"   {categoria:15} : {total:4} imágenes")
+
+        if args.sesiones:
+            sesiones = {}
+            for *_, sesion in manifiesto.imagenes():
+                sesiones[sesion or '(sin sesión)'] = sesiones.get(sesion or '(sin sesión)', 0) + 1
+            print("\n🎞️  Por sesión:")
+            for sesion, total in sorted(sesiones.items()):
+                print(f"   {sesion:28} : {total:4} imágenes")
+
+
+if __name__ == "__main__":
+    main()
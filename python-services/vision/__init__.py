@@ -0,0 +1,4 @@
+"""
+👁️ UTILIDADES DE VISIÓN COMPARTIDAS
+Módulos comunes para las herramientas de cámara, entrenamiento y web
+"""
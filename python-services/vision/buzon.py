@@ -0,0 +1,45 @@
+"""
+📬 BUZÓN DE UNA SOLA PLAZA ("EL ÚLTIMO FRAME GANA")
+Comunica un productor rápido (recepción de video) con un consumidor lento
+(inferencia) sin colas que crezcan: si el consumidor no ha recogido el frame
+anterior, el nuevo lo reemplaza y el viejo se cuenta como descartado.
+"""
+import threading
+
+
+class BuzonUltimo:
+    """Buzón de una plaza donde cada nuevo elemento reemplaza al pendiente"""
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._item = None
+        self._pendiente = False
+        self.puestos = 0
+        self.reemplazados = 0
+
+    def poner(self, item):
+        """Deja un elemento sin bloquear nunca al productor"""
+        with self._cond:
+            if self._pendiente:
+                self.reemplazados += 1
+            self._item = item
+            self._pendiente = True
+            self.puestos += 1
+            self._cond.notify()
+
+    def tomar(self, timeout=None):
+        """Espera y devuelve el elemento más reciente, o None si vence el timeout"""
+        with self._cond:
+            if not self._pendiente:
+                self._cond.wait(timeout)
+            if not self._pendiente:
+                return None
+            item = self._item
+            self._item = None
+            self._pendiente = False
+            return item
+
+    def vaciar(self):
+        with self._cond:
+            self._item = None
+            self._pendiente = False
@@ -0,0 +1,103 @@
+"""
+🔎 FILTRO DE CALIDAD PARA CAPTURAS EN RÁFAGA
+Al capturar muchos frames seguidos (ráfaga o grabación continua) la mayoría
+son borrosos por el movimiento del rover o casi idénticos al anterior.
+FiltroCalidad descarta en tiempo real, con métricas baratas sobre una
+versión gris y reducida del frame:
+
+  - nitidez: varianza del Laplaciano (baja = borroso)
+  - exposición: brillo medio y fracción de píxeles saturados
+  - duplicados: distancia de Hamming entre el dHash del frame y el del
+    último frame guardado
+"""
+import cv2
+import numpy as np
+
+ANCHO_ANALISIS = 320       # La nitidez depende de la resolución: se mide siempre a este ancho
+MIN_NITIDEZ = 50.0         # Varianza del Laplaciano mínima
+BRILLO_MIN = 35
+BRILLO_MAX = 220
+MAX_SATURADOS = 0.35       # Fracción máxima de píxeles negros o quemados
+MIN_DISTANCIA_HASH = 6     # Bits distintos (de 64) para no considerarlo duplicado
+
+
+def gris_reducido(frame, ancho=ANCHO_ANALISIS):
+    if frame.ndim == 3:
+        frame = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    h, w = frame.shape[:2]
+    if w != ancho:
+        frame = cv2.resize(frame, (ancho, max(1, round(h * ancho / w))), interpolation=cv2.INTER_AREA)
+    return frame
+
+
+def nitidez(gris):
+    """Varianza del Laplaciano"""
+    return float(cv2.Laplacian(gris, cv2.CV_32F).var())
+
+
+def exposicion(gris):
+    """(brillo medio, fracción de píxeles saturados)"""
+    saturados = np.count_nonzero((gris < 8) | (gris > 247)) / gris.size
+    return float(gris.mean()), saturados
+
+
+def dhash(gris, bits=8):
+    """Hash de diferencias de `bits`x`bits` como entero"""
+    reducido = cv2.resize(gris, (bits + 1, bits), interpolation=cv2.INTER_AREA)
+    diferencias = reducido[:, 1:] > reducido[:, :-1]
+    return int.from_bytes(np.packbits(diferencias).tobytes(), 'big')
+
+
+def distancia_hamming(a, b):
+    return bin(a ^ b).count('1')
+
+
+class FiltroCalidad:
+    """Decide qué frames de una ráfaga merece la pena guardar"""
+
+    def __init__(self, min_nitidez=MIN_NITIDEZ, brillo=(BRILLO_MIN, BRILLO_MAX),
+                 max_saturados=MAX_SATURADOS, min_distancia=MIN_DISTANCIA_HASH):
+        self.min_nitidez = min_nitidez
+        self.brillo = brillo
+        self.max_saturados = max_saturados
+        self.min_distancia = min_distancia
+        self.ultimo_hash = None
+        self.rechazos = {}
+        self.aceptados = 0
+
+    def evaluar(self, frame):
+        """
+        (aceptado, motivo, métricas). Si se acepta, el frame pasa a ser la
+        referencia de duplicados (se asume que se guarda).
+        """
+        gris = gris_reducido(frame)
+        brillo, saturados = exposicion(gris)
+        metricas = {'nitidez': nitidez(gris), 'brillo': brillo, 'saturados': saturados}
+
+        motivo = None
+        if metricas['nitidez'] < self.min_nitidez:
+            motivo = 'borroso'
+        elif not self.brillo[0] <= brillo <= self.brillo[1] or saturados > self.max_saturados:
+            motivo = 'exposicion'
+        else:
+            hash_ = dhash(gris)
+            if self.ultimo_hash is not None:
+                metricas['distancia'] = distancia_hamming(hash_, self.ultimo_hash)
+                if metricas['distancia'] < self.min_distancia:
+                    motivo = 'duplicado'
+            if motivo is None:
+                self.ultimo_hash = hash_
+
+        if motivo:
+            self.rechazos[motivo] = self.rechazos.get(motivo, 0) + 1
+            return False, motivo, metricas
+        self.aceptados += 1
+        return True, None, metricas
+
+    def reiniciar_conteos(self):
+        self.rechazos = {}
+        self.aceptados = 0
+
+    def resumen(self):
+        rechazos = ", ".join(f"{n} {m}" for m, n in sorted(self.rechazos.items())) or "ninguno"
+        return f"{self.aceptados} guardados, descartados: {rechazos}"
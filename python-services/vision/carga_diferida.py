@@ -0,0 +1,84 @@
+"""
+⏳ CARGA DIFERIDA DE MODELOS
+Importar torch/ultralytics y construir el modelo cuesta varios segundos. Para
+que el video y la web arranquen al instante, la carga se hace en un hilo en
+segundo plano (al arrancar o la primera vez que se pide) y mientras tanto el
+resto del programa sigue sin modelo:
+
+  cargador = CargaDiferida(cargar_modelo, 'yolo11n.pt', 'onnx', 640)
+  cargador.iniciar()          # precarga en segundo plano (opcional)
+  modelo = cargador.obtener() # None hasta que esté listo, nunca bloquea
+"""
+import threading
+import time
+
+PENDIENTE, CARGANDO, LISTO, ERROR = 'pendiente', 'cargando', 'listo', 'error'
+
+
+class CargaDiferida:
+    """Construye un objeto pesado una sola vez en un hilo aparte"""
+
+    def __init__(self, construir, *args, nombre='modelo', **kwargs):
+        self._construir = construir
+        self._args = args
+        self._kwargs = kwargs
+        self.nombre = nombre
+
+        self._lock = threading.Lock()
+        self._terminado = threading.Event()
+        self._objeto = None
+        self.estado_actual = PENDIENTE
+        self.error = None
+        self._inicio = None
+        self.segundos = None
+
+    def iniciar(self):
+        """Lanza la carga en segundo plano si no se ha lanzado ya"""
+        with self._lock:
+            if self.estado_actual != PENDIENTE:
+                return self
+            self.estado_actual = CARGANDO
+            self._inicio = time.perf_counter()
+        threading.Thread(target=self._cargar, daemon=True, name=f"carga-{self.nombre}").start()
+        return self
+
+    def _cargar(self):
+        try:
+            objeto = self._construir(*self._args, **self._kwargs)
+            with self._lock:
+                self._objeto = objeto
+                self.estado_actual = LISTO
+        except Exception as e:
+            print(f"⚠️ Error cargando {self.nombre}: {e}")
+            with self._lock:
+                self.error = str(e)
+                self.estado_actual = ERROR
+        self.segundos = time.perf_counter() - self._inicio
+        self._terminado.set()
+
+    @property
+    def listo(self):
+        return self.estado_actual == LISTO
+
+    def obtener(self):
+        """El objeto si ya está cargado; si no, lanza la carga y devuelve None"""
+        if self.estado_actual == PENDIENTE:
+            self.iniciar()
+        return self._objeto
+
+    def esperar(self, timeout=None):
+        """Bloquea hasta que la carga termine; devuelve el objeto o None"""
+        self.iniciar()
+        self._terminado.wait(timeout)
+        return self._objeto
+
+    def estado(self):
+        segundos = self.segundos
+        if segundos is None and self._inicio is not None:
+            segundos = time.perf_counter() - self._inicio
+        return {
+            'estado': self.estado_actual,
+            'listo': self.listo,
+            'segundos': round(segundos, 2) if segundos is not None else None,
+            'error': self.error,
+        }
@@ -0,0 +1,67 @@
+"""
+🏞️ CLASIFICACIÓN DE ESCENA
+Las categorías del dataset (excavacion, peligro, zona_libre...) describen el
+frame completo, así que un clasificador (yolo11n-cls entrenado con
+entrenar_modelo.py) las resuelve en una pasada a 224 px, mucho más barata
+que un detector a 640 que sólo aprende cajas de imagen completa.
+
+ClasificadorEscena suaviza las probabilidades entre frames con una media
+exponencial para que la etiqueta no parpadee entre dos categorías.
+"""
+import json
+import os
+
+import numpy as np
+
+from vision.modelos import cargar_modelo
+
+CLASIFICADOR_PESOS = 'modelo_rover_clasificador.pt'
+IMGSZ_CLASIFICACION = 224
+
+
+def imgsz_entrenamiento(pesos, defecto=IMGSZ_CLASIFICACION):
+    """imgsz con el que se entrenó (entrenar_modelo.py lo guarda en <pesos>.json)"""
+    try:
+        with open(os.path.splitext(pesos)[0] + '.json') as f:
+            return int(json.load(f)['imgsz'])
+    except (OSError, KeyError, ValueError):
+        return defecto
+
+
+def cargar_clasificador(pesos=CLASIFICADOR_PESOS, backend='onnx', imgsz=None):
+    """Modelo de clasificación con el mismo sistema de backends y caché que los detectores"""
+    imgsz = imgsz or imgsz_entrenamiento(pesos)
+    return ClasificadorEscena(cargar_modelo(pesos, backend, imgsz, task='classify'), imgsz)
+
+
+class ClasificadorEscena:
+    """Categoría del frame completo con probabilidades suavizadas"""
+
+    def __init__(self, modelo, imgsz=IMGSZ_CLASIFICACION, suavizado=0.6):
+        self.modelo = modelo
+        self.imgsz = imgsz
+        self.suavizado = suavizado
+        self.nombres = dict(modelo.names)
+        self._probs = None
+
+    def reiniciar(self):
+        self._probs = None
+
+    def clasificar(self, frame):
+        """{'clase', 'confianza' (0-100), 'indice'} con las probabilidades suavizadas"""
+        probs = self.modelo.predict(frame, verbose=False, imgsz=self.imgsz)[0].probs.data
+        if hasattr(probs, 'cpu'):
+            probs = probs.cpu().numpy()
+        probs = np.asarray(probs, dtype=np.float32)
+
+        if self._probs is None or self._probs.shape != probs.shape:
+            self._probs = probs
+        else:
+            self._probs = self.suavizado * self._probs + (1 - self.suavizado) * probs
+
+        indice = int(np.argmax(self._probs))
+        return {
+            'clase': self.nombres.get(indice, str(indice)),
+            'confianza': round(float(self._probs[indice]) * 100, 1),
+            'indice': indice,
+        }
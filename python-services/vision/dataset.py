@@ -0,0 +1,259 @@
+"""
+🗂️ PREPARACIÓN INCREMENTAL DE DATASETS
+Las herramientas de captura guardan las imágenes en dataset_rover/<categoría>/
+y el entrenamiento necesita otra estructura (images/{train,val}, labels/...
+para detección, {train,val}/<categoría> para clasificación).
+En vez de copiar todo en cada entrenamiento, `sincronizar` mantiene la
+estructura de salida al día haciendo sólo el trabajo necesario:
+
+  - un estado (.estado.json en la salida) guarda tamaño y mtime de cada
+    origen: sólo se procesan archivos nuevos, modificados o borrados
+  - las imágenes se enlazan (enlace duro, reflink o, en último caso, copia)
+  - el split sale del hash de la ruta relativa y se conserva en el estado,
+    así que una imagen nunca cambia de split al crecer su categoría
+  - el trabajo pendiente se reparte entre hilos (es casi todo E/S)
+"""
+import hashlib
+import json
+import os
+import shutil
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+CATEGORIAS = ['excavacion', 'construccion', 'peligro', 'zona_libre',
+              'objetivo', 'obstaculo', 'otro']
+EXTENSIONES = ('.jpg', '.jpeg', '.png')
+FRACCION_VAL = 0.2
+ARCHIVO_ESTADO = '.estado.json'
+VERSION_ESTADO = 2  # Cambia cuando cambian los nombres de salida: fuerza a rehacerla
+
+FICLONE = 0x40049409  # ioctl de Linux para reflink (btrfs, xfs)
+
+
+def _reflink(origen, destino):
+    import fcntl
+
+    with open(origen, 'rb') as src, open(destino, 'wb') as dst:
+        try:
+            fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+        except OSError:
+            dst.close()
+            os.remove(destino)
+            raise
+
+
+def enlazar(origen, destino):
+    """Enlace duro, reflink o copia (lo primero que funcione); devuelve el método usado"""
+    try:
+        os.link(origen, destino)
+        return 'enlace'
+    except OSError:
+        pass
+    try:
+        _reflink(origen, destino)
+        return 'reflink'
+    except (ImportError, OSError):
+        shutil.copy2(origen, destino)
+        return 'copia'
+
+
+def split_estable(clave, fraccion_val=FRACCION_VAL):
+    """'train' o 'val' según el hash de `clave` (no depende del resto del dataset)"""
+    valor = int.from_bytes(hashlib.sha1(clave.encode('utf-8')).digest()[:4], 'big')
+    return 'val' if valor < fraccion_val * 2 ** 32 else 'train'
+
+
+def escanear(dataset_path, categorias=CATEGORIAS, extensiones=EXTENSIONES):
+    """{'categoría/archivo': (ruta, categoría, tamaño, mtime_ns)} de las carpetas de categorías"""
+    def _categoria(categoria):
+        carpeta = os.path.join(dataset_path, categoria)
+        if not os.path.isdir(carpeta):
+            return []
+        encontrados = []
+        with os.scandir(carpeta) as entradas:
+            for e in entradas:
+                if e.is_file() and e.name.lower().endswith(extensiones):
+                    info = e.stat()
+                    encontrados.append((f"{categoria}/{e.name}", (e.path, categoria, info.st_size, info.st_mtime_ns)))
+        return encontrados
+
+    with ThreadPoolExecutor(max_workers=max(1, len(categorias))) as pool:
+        return {rel: datos for lista in pool.map(_categoria, categorias) for rel, datos in lista}
+
+
+def _cargar_estado(ruta):
+    try:
+        with open(ruta) as f:
+            estado = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if not isinstance(estado, dict) or estado.get('version') != VERSION_ESTADO:
+        return None
+    return estado['archivos']
+
+
+def _guardar_estado(ruta, estado):
+    temporal = ruta + ".tmp"
+    with open(temporal, 'w') as f:
+        json.dump({'version': VERSION_ESTADO, 'archivos': estado}, f, separators=(',', ':'))
+    os.replace(temporal, ruta)
+
+
+def _nombre_destino(rel):
+    """
+    'zona_libre/img_001.jpg' → ('zona_libre_img_001_jpg', '.jpg'). La
+    extensión va también en el nombre: img_001.jpg e img_001.png no pueden
+    compartir el .txt de etiquetas.
+    """
+    categoria, archivo = rel.split('/', 1)
+    nombre, extension = os.path.splitext(archivo)
+    return f"{categoria}_{nombre}_{extension[1:].lower()}", extension.lower()
+
+
+def _borrar(ruta):
+    try:
+        os.remove(ruta)
+    except FileNotFoundError:
+        pass
+
+
+def splits_guardados(output_path):
+    """{ruta relativa: split} de la última sincronización de output_path ({} si no hay)"""
+    estado = _cargar_estado(os.path.join(output_path, ARCHIVO_ESTADO)) or {}
+    return {rel: datos['split'] for rel, datos in estado.items()}
+
+
+def sincronizar(archivos, output_path, etiqueta=None, fraccion_val=FRACCION_VAL, trabajadores=None,
+                estructura='yolo'):
+    """
+    Lleva la salida al estado de `archivos` (el resultado de `escanear`):
+
+      - estructura 'yolo': images/{train,val}/ y labels/{train,val}/, con
+        `etiqueta(rel, categoría)` como contenido del .txt de cada imagen
+      - estructura 'clasificacion': {train,val}/<categoría>/<archivo>, sin
+        etiquetas (las carpetas de categoría vacías se quitan y las
+        categorías con menos de 2 imágenes se dejan fuera de los dos splits)
+
+    El split es el mismo en las dos estructuras para una misma imagen.
+    Devuelve un resumen con los conteos por split y por categoría y el
+    trabajo realizado.
+    """
+    inicio = time.time()
+    clasificacion = estructura == 'clasificacion'
+    ruta_estado = os.path.join(output_path, ARCHIVO_ESTADO)
+    estado = _cargar_estado(ruta_estado)
+    if estado is None:
+        # Sin estado no se sabe qué hay en la salida: se parte de cero
+        for subcarpeta in (('train', 'val') if clasificacion else ('images', 'labels')):
+            shutil.rmtree(os.path.join(output_path, subcarpeta), ignore_errors=True)
+        estado = {}
+    for split in ('train', 'val'):
+        if clasificacion:
+            os.makedirs(os.path.join(output_path, split), exist_ok=True)
+        else:
+            os.makedirs(os.path.join(output_path, 'images', split), exist_ok=True)
+            os.makedirs(os.path.join(output_path, 'labels', split), exist_ok=True)
+
+    def rutas(rel, split):
+        if clasificacion:
+            return (os.path.join(output_path, split, *rel.split('/')),)
+        nombre, extension = _nombre_destino(rel)
+        return (os.path.join(output_path, 'images', split, nombre + extension),
+                os.path.join(output_path, 'labels', split, nombre + '.txt'))
+
+    # En clasificación cada split saca sus índices de clase de sus carpetas:
+    # una categoría tiene que estar en train y en val o en ninguno
+    excluidas = []
+    if clasificacion:
+        conteos = {}
+        for _, categoria, _, _ in archivos.values():
+            conteos[categoria] = conteos.get(categoria, 0) + 1
+        excluidas = sorted(c for c, n in conteos.items() if n < 2)
+        archivos = {rel: datos for rel, datos in archivos.items() if datos[1] not in excluidas}
+
+    # Qué hay que hacer
+    borrar = [rel for rel in estado if rel not in archivos]
+    nuevo_estado = {}
+    pendientes = []
+    for rel, (ruta, categoria, tamano, mtime) in archivos.items():
+        texto = etiqueta(rel, categoria) if etiqueta else None
+        anterior = estado.get(rel)
+        split = anterior['split'] if anterior else split_estable(rel, fraccion_val)
+        nuevo_estado[rel] = {'tamano': tamano, 'mtime': mtime, 'split': split, 'etiqueta': texto}
+        if anterior != nuevo_estado[rel]:
+            pendientes.append(rel)
+
+    # Estratificado: toda categoría tiene al menos una imagen de entrenamiento
+    # (ultralytics saca la lista de clases de train/; una clase sólo en val
+    # descuadra los índices) y, con 2+ imágenes, al menos una de validación
+    por_categoria = {}
+    for rel, (_, categoria, _, _) in archivos.items():
+        por_categoria.setdefault(categoria, []).append(rel)
+
+    def forzar(rel, split):
+        nuevo_estado[rel]['split'] = split
+        if rel not in pendientes:
+            pendientes.append(rel)
+
+    for categoria, rels in por_categoria.items():
+        orden = sorted(rels, key=lambda r: hashlib.sha1(r.encode('utf-8')).digest())
+        if not any(nuevo_estado[r]['split'] == 'train' for r in rels):
+            forzar(orden[-1], 'train')
+        if len(rels) >= 2 and not any(nuevo_estado[r]['split'] == 'val' for r in rels):
+            forzar(orden[0], 'val')
+
+    def eliminar(rel):
+        for ruta in rutas(rel, estado[rel]['split']):
+            _borrar(ruta)
+
+    def actualizar(rel):
+        if rel in estado:
+            eliminar(rel)
+        datos = nuevo_estado[rel]
+        imagen, *etiqueta_txt = rutas(rel, datos['split'])
+        if clasificacion:
+            os.makedirs(os.path.dirname(imagen), exist_ok=True)
+        _borrar(imagen)  # Restos de una ejecución interrumpida (no escribir a través de un enlace)
+        try:
+            metodo = enlazar(archivos[rel][0], imagen)
+        except FileNotFoundError:
+            return 'falta'  # El índice la lista pero ya no existe
+        if etiqueta_txt:
+            with open(etiqueta_txt[0], 'w') as f:
+                f.write(datos['etiqueta'])
+        return metodo
+
+    metodos = {}
+    faltan = []
+    with ThreadPoolExecutor(max_workers=trabajadores or min(32, (os.cpu_count() or 1) * 4)) as pool:
+        list(pool.map(eliminar, borrar))
+        for rel, metodo in zip(pendientes, pool.map(actualizar, pendientes)):
+            if metodo == 'falta':
+                faltan.append(rel)
+                del nuevo_estado[rel]
+            else:
+                metodos[metodo] = metodos.get(metodo, 0) + 1
+
+    if clasificacion:
+        # Una carpeta de clase vacía hace fallar al cargador de ultralytics
+        for split in ('train', 'val'):
+            with os.scandir(os.path.join(output_path, split)) as entradas:
+                for e in entradas:
+                    if e.is_dir():
+                        try:
+                            os.rmdir(e.path)
+                        except OSError:
+                            pass  # No está vacía
+
+    _guardar_estado(ruta_estado, nuevo_estado)
+
+    resumen = {'total': len(nuevo_estado), 'train': 0, 'val': 0, 'por_categoria': {},
+               'actualizadas': len(pendientes) - len(faltan), 'borradas': len(borrar), 'faltan': len(faltan),
+               'sin_cambios': len(archivos) - len(pendientes), 'metodos': metodos,
+               'categorias_excluidas': excluidas,
+               'segundos': round(time.time() - inicio, 2)}
+    for rel, datos in nuevo_estado.items():
+        resumen[datos['split']] += 1
+        categoria = archivos[rel][1]
+        resumen['por_categoria'][categoria] = resumen['por_categoria'].get(categoria, 0) + 1
+    return resumen
@@ -0,0 +1,114 @@
+"""
+📦 DETECCIONES VECTORIZADAS
+Las cajas, confianzas y clases de un frame se guardan en arrays contiguos de
+NumPy que se copian del resultado de ultralytics con una sola transferencia
+(`boxes.data`), en lugar de leer caja a caja `box.xyxy[0].cpu().numpy()`.
+Filtrar por clase, elegir el objetivo y serializar a JSON son operaciones
+sobre los arrays completos, así el coste no crece con un bucle Python por
+detección.
+"""
+import numpy as np
+
+from vision.roi import id_clase
+
+
+def redondear(valores, decimales):
+    """Lista de floats redondeados; en float64 para que el JSON no arrastre el ruido de float32"""
+    return np.round(np.asarray(valores, dtype=np.float64), decimales).tolist()
+
+
+class Detecciones:
+    """Detecciones de un frame: cajas (N, 4) xyxy, confianzas (N,) 0-1, clases (N,)"""
+
+    __slots__ = ('cajas', 'confianzas', 'clases', 'nombres')
+
+    def __init__(self, cajas, confianzas, clases, nombres):
+        self.cajas = np.ascontiguousarray(cajas, dtype=np.float32).reshape(-1, 4)
+        self.confianzas = np.ascontiguousarray(confianzas, dtype=np.float32).reshape(-1)
+        self.clases = np.ascontiguousarray(clases, dtype=np.int32).reshape(-1)
+        self.nombres = nombres
+
+    @classmethod
+    def vacia(cls, nombres=None):
+        return cls(np.empty((0, 4)), np.empty(0), np.empty(0), nombres or {})
+
+    @classmethod
+    def desde_resultado(cls, resultado, desplazamiento=(0, 0)):
+        """Construye las detecciones de un `Results` de ultralytics (una copia al host)"""
+        datos = resultado.boxes.data
+        if hasattr(datos, 'cpu'):
+            datos = datos.cpu().numpy()
+        datos = np.asarray(datos, dtype=np.float32)
+
+        cajas = datos[:, :4]
+        dx, dy = desplazamiento
+        if dx or dy:
+            cajas = cajas + np.array([dx, dy, dx, dy], dtype=np.float32)
+        # Con tracking, boxes.data lleva una columna de id antes de conf y clase
+        return cls(cajas, datos[:, -2], datos[:, -1], resultado.names)
+
+    @classmethod
+    def unica(cls, caja, confianza, nombre):
+        """Una sola detección (p.ej. la caja propagada por el tracker)"""
+        return cls(np.asarray([caja]), [confianza], [0], {0: nombre})
+
+    def __len__(self):
+        return len(self.confianzas)
+
+    def __getitem__(self, indice):
+        """Subconjunto por máscara booleana, slice o array de índices"""
+        if isinstance(indice, (int, np.integer)):
+            indice = [indice]
+        return Detecciones(self.cajas[indice], self.confianzas[indice], self.clases[indice], self.nombres)
+
+    def de_clase(self, nombre):
+        """Sólo las detecciones de la clase indicada"""
+        clase = id_clase(self.nombres, nombre)
+        if clase is None:
+            return self[np.zeros(len(self), dtype=bool)]
+        return self[self.clases == clase]
+
+    def con_confianza(self, minima):
+        return self[self.confianzas >= minima]
+
+    def centros(self):
+        return (self.cajas[:, :2] + self.cajas[:, 2:]) / 2
+
+    def areas(self):
+        return (self.cajas[:, 2] - self.cajas[:, 0]) * (self.cajas[:, 3] - self.cajas[:, 1])
+
+    def indice_mas_grande(self):
+        return int(np.argmax(self.areas()))
+
+    def indice_mas_cercano(self, caja):
+        """Índice de la detección cuyo centro está más cerca del de `caja`"""
+        x1, y1, x2, y2 = caja
+        distancias = np.sum((self.centros() - ((x1 + x2) / 2, (y1 + y2) / 2)) ** 2, axis=1)
+        return int(np.argmin(distancias))
+
+    def etiquetas(self):
+        """Nombres de clase de cada detección"""
+        return [self.nombres.get(c, str(c)) for c in self.clases.tolist()]
+
+    def objetivo(self, i):
+        """La detección i como dict {'bbox', 'conf' (0-100), 'clase'}"""
+        return {
+            'bbox': tuple(int(v) for v in self.cajas[i]),
+            'conf': float(self.confianzas[i]) * 100,
+            'clase': self.nombres.get(int(self.clases[i]), str(self.clases[i])),
+        }
+
+    def filas(self):
+        """Itera (caja entera, confianza 0-100, clase) con una sola conversión a listas"""
+        cajas = self.cajas.astype(np.int32).tolist()
+        confianzas = (self.confianzas * 100).tolist()
+        return zip(cajas, confianzas, self.etiquetas())
+
+    def a_json(self, con_cajas=False):
+        """Lista serializable: [{'name', 'confidence'(, 'bbox')}]"""
+        nombres = self.etiquetas()
+        confianzas = redondear(self.confianzas * 100.0, 1)
+        if not con_cajas:
+            return [{'name': n, 'confidence': c} for n, c in zip(nombres, confianzas)]
+        cajas = np.round(self.cajas).astype(np.int32).tolist()
+        return [{'name': n, 'confidence': c, 'bbox': b} for n, c, b in zip(nombres, confianzas, cajas)]
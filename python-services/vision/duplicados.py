@@ -0,0 +1,213 @@
+"""
+🪞 DETECCIÓN DE CASI-DUPLICADOS EN EL DATASET
+Con el rover parado se acumulan cientos de frames prácticamente iguales que
+alargan el entrenamiento sin aportar nada. Aquí:
+
+  - hashes perceptuales (pHash por DCT y dHash) calculados por lotes con
+    NumPy; la decodificación JPEG usa la reducción por DCT de OpenCV y se
+    reparte entre procesos. Se guardan en el manifiesto por hash de
+    contenido, así que sólo se calculan para imágenes nuevas
+  - búsqueda de vecinos por distancia de Hamming con multi-index hashing:
+    con el hash partido en d+1 trozos, dos hashes a distancia ≤ d coinciden
+    al menos en un trozo, así que sólo se comparan (vectorizado) los que
+    comparten cubeta
+  - agrupación voraz sin encadenamiento: cada imagen descartada está a
+    distancia ≤ d de una conservada (se conservan primero las de mayor
+    tamaño de archivo, que en JPEG suelen ser las de más detalle)
+"""
+import multiprocessing as mp
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import cv2
+import numpy as np
+
+MAX_DISTANCIA_PHASH = 6
+MAX_DISTANCIA_DHASH = 10
+LOTE = 256
+BLOQUE_COMPARACION = 1024
+
+_DCT = None
+
+if hasattr(np, 'bitwise_count'):
+    _popcount = np.bitwise_count
+else:
+    _BITS_BYTE = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+
+    def _popcount(x):
+        x = np.ascontiguousarray(x, dtype=np.uint64)
+        return _BITS_BYTE[x.view(np.uint8)].reshape(*x.shape, 8).sum(axis=-1, dtype=np.uint8)
+
+
+def _matriz_dct(n=32):
+    """Matriz de la DCT-II ortonormal n x n"""
+    k = np.arange(n)[:, None]
+    i = np.arange(n)[None, :]
+    matriz = np.sqrt(2.0 / n) * np.cos(np.pi * (2 * i + 1) * k / (2 * n))
+    matriz[0] /= np.sqrt(2.0)
+    return matriz.astype(np.float32)
+
+
+def _empaquetar(bits):
+    """(N, 64) booleanos → (N,) uint64"""
+    return np.packbits(bits, axis=1).view('>u8').ravel().astype(np.uint64)
+
+
+def hashes_vectorizados(reducidas32, reducidas9x8):
+    """
+    pHash y dHash de un lote: `reducidas32` (N, 32, 32) y `reducidas9x8`
+    (N, 8, 9) en gris. Devuelve (dhash, phash) como arrays uint64.
+    """
+    global _DCT
+    if _DCT is None:
+        _DCT = _matriz_dct(32)
+    coeficientes = np.einsum('ij,njk,lk->nil', _DCT, reducidas32.astype(np.float32), _DCT)[:, :8, :8]
+    coeficientes = coeficientes.reshape(len(coeficientes), 64)
+    phash = _empaquetar(coeficientes > np.median(coeficientes[:, 1:], axis=1, keepdims=True))
+    dhash = _empaquetar((reducidas9x8[:, :, 1:] > reducidas9x8[:, :, :-1]).reshape(len(reducidas9x8), 64))
+    return dhash, phash
+
+
+def hashes_lote(rutas):
+    """Lee un lote de imágenes: (dhash, phash) de las legibles y la máscara de cuáles lo son"""
+    reducidas32, reducidas9x8, validas = [], [], []
+    for ruta in rutas:
+        # La reducción por DCT del decodificador JPEG evita decodificar a resolución completa
+        gris = cv2.imread(ruta, cv2.IMREAD_REDUCED_GRAYSCALE_4)
+        if gris is None:
+            gris = cv2.imread(ruta, cv2.IMREAD_GRAYSCALE)
+        if gris is None:
+            validas.append(False)
+            continue
+        reducidas32.append(cv2.resize(gris, (32, 32), interpolation=cv2.INTER_AREA))
+        reducidas9x8.append(cv2.resize(gris, (9, 8), interpolation=cv2.INTER_AREA))
+        validas.append(True)
+    if not reducidas32:
+        return np.zeros(0, np.uint64), np.zeros(0, np.uint64), validas
+    dhash, phash = hashes_vectorizados(np.stack(reducidas32), np.stack(reducidas9x8))
+    return dhash, phash, validas
+
+
+def calcular_hashes(rutas, trabajadores=None, lote=LOTE):
+    """(dhash, phash, válidas) de todas las rutas, repartiendo los lotes entre procesos"""
+    dhash = np.zeros(len(rutas), np.uint64)
+    phash = np.zeros(len(rutas), np.uint64)
+    validas = np.zeros(len(rutas), bool)
+    if not rutas:
+        return dhash, phash, validas
+
+    lotes = [rutas[i:i + lote] for i in range(0, len(rutas), lote)]
+    trabajadores = trabajadores or os.cpu_count() or 1
+    if trabajadores == 1 or len(lotes) == 1:
+        resultados = list(map(hashes_lote, lotes))
+    else:
+        with ProcessPoolExecutor(min(trabajadores, len(lotes)), mp_context=mp.get_context("spawn")) as pool:
+            resultados = list(pool.map(hashes_lote, lotes))
+
+    inicio = 0
+    for d, p, v in resultados:
+        v = np.array(v, bool)
+        indices = inicio + np.flatnonzero(v)
+        dhash[indices], phash[indices], validas[inicio:inicio + len(v)] = d, p, v
+        inicio += len(v)
+    return dhash, phash, validas
+
+
+def pares_cercanos(hashes, max_distancia):
+    """Pares (i, j), i < j, con distancia de Hamming ≤ max_distancia (multi-index hashing)"""
+    hashes = np.ascontiguousarray(hashes, dtype=np.uint64)
+    n = len(hashes)
+    limites = np.linspace(0, 64, max_distancia + 2).astype(int)
+    encontrados = [np.zeros((0, 2), np.int64)]
+
+    for ini, fin in zip(limites[:-1], limites[1:]):
+        claves = (hashes >> np.uint64(ini)) & np.uint64((1 << int(fin - ini)) - 1)
+        orden = np.argsort(claves, kind='stable')
+        cortes = np.flatnonzero(np.diff(claves[orden])) + 1
+        inicios = np.r_[0, cortes]
+        tamanos = np.diff(np.r_[inicios, n])
+
+        for inicio, tamano in zip(inicios[tamanos > 1], tamanos[tamanos > 1]):
+            grupo = np.sort(orden[inicio:inicio + tamano])
+            # Por bloques: una cubeta enorme (muchos frames iguales) no agota la memoria
+            for a in range(0, tamano, BLOQUE_COMPARACION):
+                filas = grupo[a:a + BLOQUE_COMPARACION]
+                columnas = grupo[a:]
+                distancias = _popcount(hashes[filas][:, None] ^ hashes[columnas][None, :])
+                r, c = np.nonzero(distancias <= max_distancia)
+                validos = c > r
+                encontrados.append(np.column_stack([filas[r[validos]], columnas[c[validos]]]))
+
+    pares = np.concatenate(encontrados)
+    return np.unique(pares, axis=0) if len(pares) else pares
+
+
+def agrupar(n, pares, orden):
+    """
+    Representante de cada elemento recorriendo `orden`: un elemento se une
+    al primer vecino ya conservado; si no tiene ninguno, se conserva.
+    """
+    if len(pares) == 0:
+        return np.arange(n)
+    ambos = np.concatenate([pares, pares[:, ::-1]])
+    ambos = ambos[np.argsort(ambos[:, 0], kind='stable')]
+    desde = np.searchsorted(ambos[:, 0], np.arange(n + 1))
+    vecinos = ambos[:, 1]
+
+    representante = np.full(n, -1)
+    for i in orden:
+        for v in vecinos[desde[i]:desde[i + 1]]:
+            if representante[v] == v:
+                representante[i] = v
+                break
+        else:
+            representante[i] = i
+    return representante
+
+
+def buscar_duplicados(manifiesto, max_phash=MAX_DISTANCIA_PHASH, max_dhash=MAX_DISTANCIA_DHASH,
+                      trabajadores=None):
+    """
+    Grupos de casi-duplicados por categoría a partir del manifiesto:
+    {categoría: [(conservada, [duplicadas...]), ...]} con rutas relativas.
+    Calcula y guarda en el manifiesto los hashes que falten.
+    """
+    filas = manifiesto.imagenes()
+    en_cache = manifiesto.hashes_perceptuales()
+
+    faltan = sorted({fila[4] for fila in filas} - set(en_cache))
+    if faltan:
+        ruta_por_hash = {fila[4]: os.path.join(manifiesto.dataset_path, *fila[0].split('/')) for fila in filas}
+        dhash, phash, validas = calcular_hashes([ruta_por_hash[h] for h in faltan], trabajadores)
+        nuevas = [(h, int(d), int(p)) for h, d, p, v in
+                  zip(faltan, dhash.view(np.int64), phash.view(np.int64), validas) if v]
+        manifiesto.guardar_hashes_perceptuales(nuevas)
+        en_cache.update({h: (d, p) for h, d, p in nuevas})
+
+    grupos = {}
+    for categoria in manifiesto.categorias:
+        imagenes = [f for f in filas if f[1] == categoria and f[4] in en_cache]
+        if len(imagenes) < 2:
+            continue
+        hashes = np.array([en_cache[f[4]] for f in imagenes], dtype=np.int64).view(np.uint64)
+        dhash, phash = hashes[:, 0].copy(), hashes[:, 1].copy()
+
+        pares = pares_cercanos(phash, max_phash)
+        if len(pares):
+            # Confirmación con el dHash: más sensible a desplazamientos del encuadre
+            pares = pares[_popcount(dhash[pares[:, 0]] ^ dhash[pares[:, 1]]) <= max_dhash]
+
+        orden = np.argsort([-f[2] for f in imagenes], kind='stable')
+        representante = agrupar(len(imagenes), pares, orden)
+        por_representante = {}
+        for i, r in enumerate(representante):
+            if i != r:
+                por_representante.setdefault(r, []).append(imagenes[i][0])
+        if por_representante:
+            grupos[categoria] = [(imagenes[r][0], sorted(d)) for r, d in sorted(por_representante.items())]
+    return grupos
+
+
+def rutas_duplicadas(grupos):
+    """Conjunto de rutas relativas a descartar"""
+    return {rel for lista in grupos.values() for _, duplicadas in lista for rel in duplicadas}
@@ -0,0 +1,57 @@
+"""
+📏 ACUERDO ENTRE DETECTORES
+Compara las detecciones de un modelo con las de otro tomado como referencia
+(un modelo mayor, el profesor de una destilación o el FP32 de un INT8):
+precisión, recall y F1 emparejando cajas de la misma clase con IoU ≥ 0.5.
+
+Las detecciones de cada frame son arrays (N, 6): x1 y1 x2 y2 confianza clase.
+"""
+import numpy as np
+
+IOU_ACUERDO = 0.5
+
+
+def matriz_iou(a, b):
+    """IoU de todas las cajas de `a` (N, 4) contra las de `b` (M, 4)"""
+    ix1 = np.maximum(a[:, None, 0], b[None, :, 0])
+    iy1 = np.maximum(a[:, None, 1], b[None, :, 1])
+    ix2 = np.minimum(a[:, None, 2], b[None, :, 2])
+    iy2 = np.minimum(a[:, None, 3], b[None, :, 3])
+    inter = np.clip(ix2 - ix1, 0, None) * np.clip(iy2 - iy1, 0, None)
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    union = area_a[:, None] + area_b[None, :] - inter
+    return np.divide(inter, union, out=np.zeros_like(inter), where=union > 0)
+
+
+def acuerdo(candidatas, referencias, conf):
+    """
+    Precisión / recall / F1 de las detecciones con confianza ≥ `conf` frente
+    a las de referencia. Emparejamiento voraz por confianza, misma clase.
+    """
+    tp = fp = fn = 0
+    for cand, ref in zip(candidatas, referencias):
+        cand = cand[cand[:, 4] >= conf]
+        cand = cand[np.argsort(-cand[:, 4])]
+        if len(cand) == 0 or len(ref) == 0:
+            fp += len(cand)
+            fn += len(ref)
+            continue
+
+        ious = matriz_iou(cand[:, :4], ref[:, :4])
+        ious[cand[:, 5][:, None] != ref[:, 5][None, :]] = 0.0
+        libres = np.ones(len(ref), dtype=bool)
+        for fila in ious:
+            fila = np.where(libres, fila, 0.0)
+            j = int(np.argmax(fila))
+            if fila[j] >= IOU_ACUERDO:
+                libres[j] = False
+                tp += 1
+            else:
+                fp += 1
+        fn += int(libres.sum())
+
+    precision = tp / (tp + fp) if tp + fp else 1.0
+    recall = tp / (tp + fn) if tp + fn else 1.0
+    f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+    return {'conf': conf, 'precision': round(precision, 3), 'recall': round(recall, 3), 'f1': round(f1, 3)}
@@ -0,0 +1,199 @@
+"""
+📦 FRAGMENTOS EMPAQUETADOS PARA ENTRENAR
+En cada epoch, ultralytics abre, decodifica y redimensiona a imgsz miles de
+JPEG pequeños. Aquí las imágenes de cada split se redimensionan una sola vez
+(igual que lo haría ultralytics: lado largo = imgsz) y se empaquetan en
+fragmentos grandes con un índice, como las grabaciones:
+
+  <split>_<imgsz>_000.bin  → imágenes seguidas
+  <split>_<imgsz>.idx      → un registro por imagen: fragmento, offset,
+                             tamaño y dimensiones (redimensionada y original)
+  <split>_<imgsz>.json     → formato, nombres de las imágenes y firma
+
+Formato 'raw' guarda los píxeles uint8 (leer = copiar desde el mmap, sin
+decodificar); 'jpeg' guarda JPEG ya reducidos (menos disco, decodificación
+barata). El empaquetado sólo se rehace si cambian las imágenes del split.
+"""
+import hashlib
+import json
+import math
+import mmap
+import multiprocessing as mp
+import os
+import time
+
+import cv2
+import numpy as np
+
+DTYPE_INDICE = np.dtype([
+    ('fragmento', '<u2'),
+    ('offset', '<u8'),
+    ('tamano', '<u4'),
+    ('alto', '<u2'),
+    ('ancho', '<u2'),
+    ('alto0', '<u2'),
+    ('ancho0', '<u2'),
+])
+
+FORMATOS = ('raw', 'jpeg')
+MAX_BYTES_FRAGMENTO = 1024 * 1024 * 1024
+CALIDAD_JPEG = 95
+EXTENSIONES = ('.jpg', '.jpeg', '.png')
+
+
+def tamano_reducido(alto0, ancho0, imgsz):
+    """(alto, ancho) con el lado largo a imgsz, con el mismo redondeo que ultralytics"""
+    r = imgsz / max(alto0, ancho0)
+    if r == 1:
+        return alto0, ancho0
+    return min(math.ceil(alto0 * r), imgsz), min(math.ceil(ancho0 * r), imgsz)
+
+
+def _reducir(tarea):
+    """Lee y redimensiona una imagen: (bytes, alto, ancho, alto0, ancho0) o None"""
+    ruta, imgsz, formato = tarea
+    imagen = cv2.imread(ruta, cv2.IMREAD_COLOR)
+    if imagen is None:
+        return None
+    alto0, ancho0 = imagen.shape[:2]
+    alto, ancho = tamano_reducido(alto0, ancho0, imgsz)
+    if (alto, ancho) != (alto0, ancho0):
+        imagen = cv2.resize(imagen, (ancho, alto), interpolation=cv2.INTER_LINEAR)
+    if formato == 'jpeg':
+        ok, buffer = cv2.imencode('.jpg', imagen, [cv2.IMWRITE_JPEG_QUALITY, CALIDAD_JPEG])
+        datos = buffer.tobytes()
+    else:
+        datos = np.ascontiguousarray(imagen).tobytes()
+    return datos, alto, ancho, alto0, ancho0
+
+
+def _base(directorio, split, imgsz):
+    return os.path.join(directorio, f"{split}_{imgsz}")
+
+
+def _firma(carpeta, nombres, imgsz, formato):
+    h = hashlib.sha1(f"{imgsz}:{formato}".encode())
+    for nombre in nombres:
+        info = os.stat(os.path.join(carpeta, nombre))
+        h.update(f"{nombre}:{info.st_size}:{info.st_mtime_ns};".encode())
+    return h.hexdigest()
+
+
+def empaquetar_split(carpeta_imagenes, directorio, split, imgsz, formato='raw', trabajadores=None,
+                     max_bytes_fragmento=MAX_BYTES_FRAGMENTO):
+    """
+    Empaqueta las imágenes de `carpeta_imagenes` en `directorio`. Devuelve
+    un resumen; si el split no cambió desde el último empaquetado no hace nada.
+    """
+    os.makedirs(directorio, exist_ok=True)
+    nombres = sorted(f for f in os.listdir(carpeta_imagenes) if f.lower().endswith(EXTENSIONES))
+    base = _base(directorio, split, imgsz)
+    firma = _firma(carpeta_imagenes, nombres, imgsz, formato)
+    try:
+        with open(base + '.json') as f:
+            meta = json.load(f)
+        if meta.get('firma') == firma:
+            return {'split': split, 'imagenes': len(meta['imagenes']), 'rehecho': False}
+    except (OSError, ValueError):
+        pass
+
+    inicio = time.time()
+    # Se borra primero el JSON: un empaquetado a medias nunca se da por válido
+    for ruta in [base + '.json', base + '.idx'] + [os.path.join(directorio, f) for f in os.listdir(directorio)
+                                                     if f.startswith(f"{split}_{imgsz}_") and f.endswith('.bin')]:
+        if os.path.exists(ruta):
+            os.remove(ruta)
+
+    tareas = [(os.path.join(carpeta_imagenes, n), imgsz, formato) for n in nombres]
+    indice = np.zeros(len(tareas), dtype=DTYPE_INDICE)
+    fragmentos, incluidas = [], []
+    archivo = None
+    offset = 0
+
+    ctx = mp.get_context("spawn")
+    with ctx.Pool(trabajadores or os.cpu_count() or 1) as pool:
+        for nombre, resultado in zip(nombres, pool.imap(_reducir, tareas, chunksize=16)):
+            if resultado is None:
+                continue
+            datos, alto, ancho, alto0, ancho0 = resultado
+            if archivo is None or offset + len(datos) > max_bytes_fragmento:
+                if archivo is not None:
+                    archivo.close()
+                fragmentos.append(f"{split}_{imgsz}_{len(fragmentos):03d}.bin")
+                archivo = open(os.path.join(directorio, fragmentos[-1]), 'wb')
+                offset = 0
+            archivo.write(datos)
+            indice[len(incluidas)] = (len(fragmentos) - 1, offset, len(datos), alto, ancho, alto0, ancho0)
+            incluidas.append(nombre)
+            offset += len(datos)
+    if archivo is not None:
+        archivo.close()
+
+    indice[:len(incluidas)].tofile(base + '.idx')
+    with open(base + '.json', 'w') as f:
+        json.dump({'formato': formato, 'imgsz': imgsz, 'firma': firma, 'fragmentos': fragmentos,
+                   'imagenes': incluidas}, f)
+    bytes_totales = sum(os.path.getsize(os.path.join(directorio, n)) for n in fragmentos)
+    return {'split': split, 'imagenes': len(incluidas), 'rehecho': True, 'fragmentos': len(fragmentos),
+            'mb': round(bytes_totales / 1e6, 1), 'segundos': round(time.time() - inicio, 1)}
+
+
+def empaquetar_dataset(yolo_path, imgsz, formato='raw', trabajadores=None):
+    """Empaqueta images/train e images/val de un dataset YOLO en <yolo_path>/empaquetado/"""
+    directorio = os.path.join(yolo_path, 'empaquetado')
+    return [empaquetar_split(os.path.join(yolo_path, 'images', split), directorio, split, imgsz, formato,
+                             trabajadores)
+            for split in ('train', 'val')]
+
+
+class LectorFragmentos:
+    """Acceso aleatorio a las imágenes empaquetadas de un split"""
+
+    def __init__(self, directorio, split, imgsz):
+        base = _base(directorio, split, imgsz)
+        with open(base + '.json') as f:
+            meta = json.load(f)
+        self.formato = meta['formato']
+        self.imgsz = meta['imgsz']
+        self.rutas = [os.path.join(directorio, n) for n in meta['fragmentos']]
+        self.indice = np.fromfile(base + '.idx', dtype=DTYPE_INDICE)
+        self.posiciones = {nombre: i for i, nombre in enumerate(meta['imagenes'])}
+        self._mapas = None
+
+    def __len__(self):
+        return len(self.indice)
+
+    def __getstate__(self):
+        # Los mmap no se pueden enviar a otros procesos: cada uno abre los suyos
+        estado = dict(self.__dict__)
+        estado['_mapas'] = None
+        return estado
+
+    def _abrir(self):
+        self._mapas = []
+        for ruta in self.rutas:
+            with open(ruta, 'rb') as f:
+                self._mapas.append(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+
+    def posicion(self, ruta):
+        """Posición en el índice de la imagen (por nombre de archivo) o None"""
+        return self.posiciones.get(os.path.basename(ruta))
+
+    def leer(self, i):
+        """(imagen BGR redimensionada, (alto0, ancho0), (alto, ancho)) como load_image de ultralytics"""
+        if self._mapas is None:
+            self._abrir()
+        registro = self.indice[i]
+        inicio = int(registro['offset'])
+        datos = self._mapas[registro['fragmento']][inicio:inicio + int(registro['tamano'])]
+        alto, ancho = int(registro['alto']), int(registro['ancho'])
+        if self.formato == 'raw':
+            imagen = np.frombuffer(datos, np.uint8).reshape(alto, ancho, 3).copy()
+        else:
+            imagen = cv2.imdecode(np.frombuffer(datos, np.uint8), cv2.IMREAD_COLOR)
+        return imagen, (int(registro['alto0']), int(registro['ancho0'])), (alto, ancho)
+
+    def cerrar(self):
+        for mapa in self._mapas or []:
+            mapa.close()
+        self._mapas = None
@@ -0,0 +1,379 @@
+"""
+🎥 FUENTES DE VIDEO INTERCAMBIABLES
+Todas las herramientas leen frames a través de un FrameSource, elegido con una URI:
+
+  udp://:5005                          → ESP32-CAM por UDP (por defecto)
+  camara://0                           → cámara local (cv2.VideoCapture)
+  archivo://grabaciones/sesion?velocidad=2&bucle=1
+                                       → grabación de grabar_video.py
+  sintetica://640x480@60?complejidad=0.5
+                                       → generador de JPEG para pruebas de carga
+
+Cada fuente se encarga de su propio ritmo y de sus estadísticas.
+"""
+import socket
+import time
+from urllib.parse import parse_qs
+
+import cv2
+import numpy as np
+
+from vision.grabacion import LectorGrabacion, ReproductorGrabacion
+from vision.protocolo_udp import ReensambladorJPEG, obtener_socket_udp
+
+FUENTE_POR_DEFECTO = "udp://:5005"
+CALIDAD_JPEG = 85
+
+
+class Fotograma:
+    """Frame entregado por una fuente: JPEG original y/o imagen decodificada"""
+
+    __slots__ = ('seq', 'timestamp', '_jpeg', '_imagen')
+
+    def __init__(self, seq, timestamp, jpeg=None, imagen=None):
+        self.seq = seq
+        self.timestamp = timestamp
+        self._jpeg = jpeg
+        self._imagen = imagen
+
+    @property
+    def imagen(self):
+        """Imagen BGR, decodificada la primera vez que se pide (None si el JPEG está corrupto)"""
+        if self._imagen is None and self._jpeg is not None:
+            self._imagen = cv2.imdecode(np.frombuffer(self._jpeg, np.uint8), cv2.IMREAD_COLOR)
+        return self._imagen
+
+    @property
+    def jpeg(self):
+        """Bytes JPEG; sólo se codifica si la fuente no los entregó ya"""
+        if self._jpeg is None and self._imagen is not None:
+            ok, buffer = cv2.imencode('.jpg', self._imagen, [cv2.IMWRITE_JPEG_QUALITY, CALIDAD_JPEG])
+            if ok:
+                self._jpeg = buffer.tobytes()
+        return self._jpeg
+
+
+class FrameSource:
+    """Interfaz común de las fuentes de video"""
+
+    nombre = "fuente"
+
+    def __init__(self):
+        self.seq = 0
+        self.frames = 0
+        self.bytes = 0
+        self.perdidos = 0
+        self.fps = 0.0
+        self._frames_fps = 0
+        self._tiempo_fps = time.time()
+
+    def abrir(self):
+        return self
+
+    def cerrar(self):
+        pass
+
+    def _leer(self, timeout):
+        """Implementado por cada fuente: devuelve (jpeg, imagen) o None"""
+        raise NotImplementedError
+
+    def leer(self, timeout=1.0):
+        """Devuelve el siguiente Fotograma o None si no llegó nada en `timeout`"""
+        resultado = self._leer(timeout)
+        if resultado is None:
+            return None
+
+        jpeg, imagen = resultado
+        self.seq += 1
+        self.frames += 1
+        if jpeg is not None:
+            self.bytes += len(jpeg)
+
+        self._frames_fps += 1
+        ahora = time.time()
+        if ahora - self._tiempo_fps >= 1.0:
+            self.fps = self._frames_fps / (ahora - self._tiempo_fps)
+            self._frames_fps = 0
+            self._tiempo_fps = ahora
+
+        return Fotograma(self.seq, ahora, jpeg, imagen)
+
+    def estadisticas(self):
+        total = self.frames + self.perdidos
+        return {
+            'fuente': self.nombre,
+            'frames': self.frames,
+            'perdidos': self.perdidos,
+            'tasa_perdida': round(self.perdidos / total, 4) if total else 0.0,
+            'fps': round(self.fps, 1),
+            'bytes_por_frame': self.bytes // self.frames if self.frames else 0,
+        }
+
+    def __enter__(self):
+        return self.abrir()
+
+    def __exit__(self, *args):
+        self.cerrar()
+
+
+class FuenteUDP(FrameSource):
+    """JPEG fragmentados enviados por la ESP32-CAM"""
+
+    nombre = "udp"
+
+    def __init__(self, port=5005, rcvbuf=8388608):
+        super().__init__()
+        self.port = port
+        self.rcvbuf = rcvbuf
+        self.sock = None
+        self.reensamblador = ReensambladorJPEG()
+        self._ultimo_dato = time.time()
+
+    def abrir(self):
+        self.sock = obtener_socket_udp(self.port, self.rcvbuf)
+        return self
+
+    def cerrar(self):
+        if self.sock is not None:
+            self.sock.close()
+            self.sock = None
+
+    def _leer(self, timeout):
+        limite = time.time() + timeout
+
+        while True:
+            ahora = time.time()
+            restante = limite - ahora
+            if restante <= 0:
+                # Un frame a medias sólo se da por perdido tras 1 s sin datos
+                if ahora - self._ultimo_dato >= 1.0:
+                    self.reensamblador.descartar()
+                    self.perdidos = self.reensamblador.frames_perdidos
+                return None
+
+            self.sock.settimeout(restante)
+            try:
+                data, _ = self.sock.recvfrom(65535)
+            except socket.timeout:
+                continue
+
+            self._ultimo_dato = time.time()
+            jpeg = self.reensamblador.agregar(data)
+            self.perdidos = self.reensamblador.frames_perdidos
+            if jpeg is not None:
+                return jpeg, None
+
+
+class FuenteCamara(FrameSource):
+    """Cámara local con OpenCV; el ritmo lo marca la propia cámara"""
+
+    nombre = "camara"
+
+    def __init__(self, indice=0, ancho=None, alto=None, fps=None):
+        super().__init__()
+        self.indice = indice
+        self.ancho = ancho
+        self.alto = alto
+        self.fps_objetivo = fps
+        self.cap = None
+
+    def abrir(self):
+        self.cap = cv2.VideoCapture(self.indice)
+        if self.ancho and self.alto:
+            self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, self.ancho)
+            self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, self.alto)
+        if self.fps_objetivo:
+            self.cap.set(cv2.CAP_PROP_FPS, self.fps_objetivo)
+        return self
+
+    def cerrar(self):
+        if self.cap is not None:
+            self.cap.release()
+            self.cap = None
+
+    def _leer(self, timeout):
+        ret, frame = self.cap.read()
+        if not ret:
+            self.perdidos += 1
+            # Evitar un bucle ocupado si la cámara no responde
+            time.sleep(min(timeout, 0.1))
+            return None
+        return None, frame
+
+
+class FuenteArchivo(FrameSource):
+    """Grabación de grabar_video.py reproducida con sus tiempos originales"""
+
+    nombre = "archivo"
+
+    def __init__(self, directorio, velocidad=1.0, bucle=False, inicio=0.0):
+        super().__init__()
+        self.directorio = directorio
+        self.velocidad = velocidad
+        self.bucle = bucle
+        self.inicio = inicio
+        self.lector = None
+        self._frames = None
+
+    def abrir(self):
+        self.lector = LectorGrabacion(self.directorio)
+        reproductor = ReproductorGrabacion(self.lector, velocidad=self.velocidad,
+                                           inicio=self.inicio, bucle=self.bucle)
+        self._frames = reproductor.frames()
+        return self
+
+    def cerrar(self):
+        if self.lector is not None:
+            self._frames = None
+            self.lector.cerrar()
+            self.lector = None
+
+    def terminada(self):
+        return self._frames is None
+
+    def _leer(self, timeout):
+        if self._frames is None:
+            time.sleep(timeout)
+            return None
+        try:
+            _, jpeg = next(self._frames)
+        except StopIteration:
+            self._frames = None
+            return None
+        return jpeg, None
+
+
+class FuenteSintetica(FrameSource):
+    """
+    Genera JPEG con objetos en movimiento para pruebas de carga sin hardware.
+    complejidad (0-1) controla el ruido de la escena y por tanto el tamaño del JPEG
+    """
+
+    nombre = "sintetica"
+
+    def __init__(self, ancho=320, alto=240, fps=30, complejidad=0.5, calidad=CALIDAD_JPEG, semilla=0):
+        super().__init__()
+        self.ancho = ancho
+        self.alto = alto
+        self.fps_objetivo = fps
+        self.complejidad = complejidad
+        self.calidad = calidad
+        self.semilla = semilla
+        self.retrasados = 0
+        self._fondo = None
+        self._ruido = None
+        self._siguiente = None
+        self._n = 0
+
+    def abrir(self):
+        rng = np.random.default_rng(self.semilla)
+
+        # Fondo con degradado (simula suelo/cielo) calculado una sola vez
+        gradiente = np.linspace(40, 200, self.alto, dtype=np.float32)[:, None]
+        self._fondo = np.empty((self.alto, self.ancho, 3), dtype=np.uint8)
+        self._fondo[:] = np.repeat(gradiente, self.ancho, axis=1)[:, :, None].astype(np.uint8)
+
+        # Textura de ruido que se desplaza en cada frame
+        amplitud = int(80 * self.complejidad)
+        if amplitud > 0:
+            self._ruido = rng.integers(-amplitud, amplitud + 1,
+                                       size=(self.alto, self.ancho * 2, 3), dtype=np.int16)
+        self._siguiente = time.perf_counter()
+        return self
+
+    def _generar(self):
+        n = self._n
+        self._n += 1
+
+        if self._ruido is not None:
+            desplazamiento = (n * 3) % self.ancho
+            ruido = self._ruido[:, desplazamiento:desplazamiento + self.ancho]
+            frame = np.clip(self._fondo.astype(np.int16) + ruido, 0, 255).astype(np.uint8)
+        else:
+            frame = self._fondo.copy()
+
+        # Objetos en movimiento (para que detectores y trackers tengan algo que seguir)
+        t = n / max(self.fps_objetivo, 1)
+        cx = int((0.5 + 0.35 * np.sin(t)) * self.ancho)
+        cy = int((0.5 + 0.25 * np.cos(t * 0.7)) * self.alto)
+        radio = max(4, self.alto // 8)
+        cv2.circle(frame, (cx, cy), radio, (0, 0, 255), -1)
+
+        rx = int((0.5 + 0.4 * np.cos(t * 0.5)) * self.ancho)
+        lado = max(6, self.alto // 5)
+        cv2.rectangle(frame, (rx - lado // 2, self.alto - lado - 5), (rx + lado // 2, self.alto - 5),
+                      (255, 200, 0), -1)
+
+        ok, buffer = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, self.calidad])
+        return buffer.tobytes() if ok else None
+
+    def _leer(self, timeout):
+        if self.fps_objetivo:
+            espera = self._siguiente - time.perf_counter()
+            if espera > timeout:
+                time.sleep(timeout)
+                return None
+            if espera > 0:
+                time.sleep(espera)
+            self._siguiente += 1.0 / self.fps_objetivo
+            # Si vamos más de un frame tarde, no intentar recuperar a ráfagas
+            ahora = time.perf_counter()
+            if self._siguiente < ahora:
+                self.retrasados += 1
+                self._siguiente = ahora
+
+        jpeg = self._generar()
+        if jpeg is None:
+            self.perdidos += 1
+            return None
+        return jpeg, None
+
+    def estadisticas(self):
+        stats = super().estadisticas()
+        stats['retrasados'] = self.retrasados
+        return stats
+
+
+def _parametros(query):
+    return {k: v[-1] for k, v in parse_qs(query).items()}
+
+
+def abrir_fuente(uri=None):
+    """Crea y abre la fuente descrita por la URI (ver docstring del módulo)"""
+    uri = uri or FUENTE_POR_DEFECTO
+    if "://" not in uri:
+        raise ValueError(f"URI de fuente inválida: {uri}")
+
+    esquema, resto = uri.split("://", 1)
+    esquema = esquema.lower()
+    ruta, _, query = resto.partition("?")
+    params = _parametros(query)
+
+    if esquema == "udp":
+        puerto = ruta.rsplit(":", 1)[-1] or "5005"
+        fuente = FuenteUDP(int(puerto), int(params.get('rcvbuf', 8388608)))
+
+    elif esquema in ("camara", "cam"):
+        ancho = int(params['ancho']) if 'ancho' in params else None
+        alto = int(params['alto']) if 'alto' in params else None
+        fps = float(params['fps']) if 'fps' in params else None
+        fuente = FuenteCamara(int(ruta or 0), ancho, alto, fps)
+
+    elif esquema == "archivo":
+        fuente = FuenteArchivo(ruta,
+                               velocidad=float(params.get('velocidad', 1.0)),
+                               bucle=params.get('bucle', '0') in ('1', 'true', 'si'),
+                               inicio=float(params.get('inicio', 0.0)))
+
+    elif esquema == "sintetica":
+        resolucion, _, fps = ruta.partition("@")
+        ancho, _, alto = (resolucion or "320x240").partition("x")
+        fuente = FuenteSintetica(int(ancho), int(alto), float(fps or 30),
+                                 complejidad=float(params.get('complejidad', 0.5)),
+                                 calidad=int(params.get('calidad', CALIDAD_JPEG)),
+                                 semilla=int(params.get('semilla', 0)))
+
+    else:
+        raise ValueError(f"Esquema de fuente desconocido: {esquema}")
+
+    return fuente.abrir()
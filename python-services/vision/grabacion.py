@@ -0,0 +1,243 @@
+"""
+🎞️ GRABACIÓN Y REPRODUCCIÓN DEL STREAM DE LA CÁMARA
+Guarda los JPEG tal como llegan (sin re-codificar) en segmentos con índice:
+
+  seg_00000.rvr  → bytes JPEG concatenados
+  seg_00000.idx  → un registro de 20 bytes por frame: offset, tamaño, timestamp
+
+El índice permite saltar a cualquier frame o instante sin leer el segmento
+completo, y la reproducción respeta los tiempos originales de llegada.
+"""
+import glob
+import json
+import mmap
+import os
+import socket
+import time
+
+import numpy as np
+
+from vision.protocolo_udp import enviar_jpeg_udp
+
+DTYPE_INDICE = np.dtype([
+    ('offset', '<u8'),
+    ('tamano', '<u4'),
+    ('timestamp', '<f8'),
+])
+
+MAX_BYTES_SEGMENTO = 256 * 1024 * 1024
+MAX_SEGUNDOS_SEGMENTO = 60.0
+
+
+def _nombre_segmento(directorio, numero, extension):
+    return os.path.join(directorio, f"seg_{numero:05d}.{extension}")
+
+
+class GrabadorFrames:
+    """Añade frames JPEG con su timestamp a segmentos indexados"""
+
+    def __init__(self, directorio, max_bytes_segmento=MAX_BYTES_SEGMENTO,
+                 max_segundos_segmento=MAX_SEGUNDOS_SEGMENTO, metadatos=None):
+        self.directorio = directorio
+        self.max_bytes_segmento = max_bytes_segmento
+        self.max_segundos_segmento = max_segundos_segmento
+        os.makedirs(directorio, exist_ok=True)
+
+        # Continuar después del último segmento existente
+        # (por número, no por cantidad: si se borró alguno no se reescribe uno existente)
+        numeros = []
+        for ruta in glob.glob(os.path.join(directorio, "seg_*.rvr")) + glob.glob(os.path.join(directorio, "seg_*.idx")):
+            try:
+                numeros.append(int(os.path.splitext(os.path.basename(ruta))[0][4:]))
+            except ValueError:
+                pass
+        self.numero_segmento = max(numeros) + 1 if numeros else 0
+
+        self.archivo_datos = None
+        self.archivo_indice = None
+        self.offset = 0
+        self.inicio_segmento = None
+        self.frames_grabados = 0
+        self.bytes_grabados = 0
+
+        meta_path = os.path.join(directorio, "meta.json")
+        if not os.path.exists(meta_path):
+            meta = {'creado': time.time(), 'formato': 1}
+            meta.update(metadatos or {})
+            with open(meta_path, 'w') as f:
+                json.dump(meta, f, indent=2)
+
+    def _abrir_segmento(self, timestamp):
+        self._cerrar_segmento()
+        self.archivo_datos = open(_nombre_segmento(self.directorio, self.numero_segmento, "rvr"), 'ab')
+        self.archivo_indice = open(_nombre_segmento(self.directorio, self.numero_segmento, "idx"), 'ab')
+        self.offset = 0
+        self.inicio_segmento = timestamp
+        self.numero_segmento += 1
+
+    def _cerrar_segmento(self):
+        if self.archivo_datos is not None:
+            self.archivo_datos.close()
+            self.archivo_indice.close()
+            self.archivo_datos = None
+            self.archivo_indice = None
+
+    def agregar(self, jpeg, timestamp=None):
+        """Añade un frame JPEG; rota de segmento por tamaño o duración"""
+        if timestamp is None:
+            timestamp = time.time()
+
+        if (self.archivo_datos is None
+                or self.offset + len(jpeg) > self.max_bytes_segmento
+                or timestamp - self.inicio_segmento > self.max_segundos_segmento):
+            self._abrir_segmento(timestamp)
+
+        registro = np.array([(self.offset, len(jpeg), timestamp)], dtype=DTYPE_INDICE)
+        self.archivo_datos.write(jpeg)
+        # El índice se escribe después de los datos: un corte nunca deja
+        # registros apuntando a bytes que no existen
+        self.archivo_indice.write(registro.tobytes())
+
+        self.offset += len(jpeg)
+        self.frames_grabados += 1
+        self.bytes_grabados += len(jpeg)
+
+    def cerrar(self):
+        self._cerrar_segmento()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.cerrar()
+
+
+class LectorGrabacion:
+    """Acceso aleatorio a los frames de una grabación"""
+
+    def __init__(self, directorio):
+        self.directorio = directorio
+        self._mapas = []
+        indices = []
+
+        for idx_path in sorted(glob.glob(os.path.join(directorio, "seg_*.idx"))):
+            datos_path = idx_path[:-4] + ".rvr"
+            if not os.path.exists(datos_path) or os.path.getsize(datos_path) == 0:
+                continue
+
+            crudo = np.fromfile(idx_path, dtype=np.uint8)
+            completos = len(crudo) // DTYPE_INDICE.itemsize
+            indice = crudo[:completos * DTYPE_INDICE.itemsize].view(DTYPE_INDICE)
+
+            # Ignorar registros de un frame que no llegó a escribirse entero
+            tamano_datos = os.path.getsize(datos_path)
+            indice = indice[indice['offset'] + indice['tamano'] <= tamano_datos]
+            if len(indice) == 0:
+                continue
+
+            with open(datos_path, 'rb') as f:
+                self._mapas.append(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+            indices.append((len(self._mapas) - 1, indice))
+
+        total = sum(len(indice) for _, indice in indices)
+        self.segmento = np.empty(total, dtype=np.int32)
+        self.offset = np.empty(total, dtype=np.uint64)
+        self.tamano = np.empty(total, dtype=np.uint32)
+        self.timestamp = np.empty(total, dtype=np.float64)
+
+        pos = 0
+        for numero, indice in indices:
+            n = len(indice)
+            self.segmento[pos:pos + n] = numero
+            self.offset[pos:pos + n] = indice['offset']
+            self.tamano[pos:pos + n] = indice['tamano']
+            self.timestamp[pos:pos + n] = indice['timestamp']
+            pos += n
+
+    def __len__(self):
+        return len(self.timestamp)
+
+    def duracion(self):
+        if len(self) < 2:
+            return 0.0
+        return float(self.timestamp[-1] - self.timestamp[0])
+
+    def leer(self, i):
+        """Devuelve (timestamp, bytes JPEG) del frame i"""
+        inicio = int(self.offset[i])
+        fin = inicio + int(self.tamano[i])
+        return float(self.timestamp[i]), self._mapas[self.segmento[i]][inicio:fin]
+
+    def buscar(self, segundos):
+        """Índice del primer frame a partir de `segundos` desde el inicio"""
+        if len(self) == 0:
+            return 0
+        objetivo = self.timestamp[0] + segundos
+        return int(np.searchsorted(self.timestamp, objetivo, side='left'))
+
+    def cerrar(self):
+        for mapa in self._mapas:
+            mapa.close()
+        self._mapas = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.cerrar()
+
+
+class ReproductorGrabacion:
+    """
+    Reproduce una grabación respetando los tiempos originales.
+    velocidad=1.0 → tiempo real, 2.0 → el doble de rápido, 0 → sin pausas
+    """
+
+    def __init__(self, lector, velocidad=1.0, inicio=0.0, bucle=False):
+        self.lector = lector
+        self.velocidad = velocidad
+        self.inicio = inicio
+        self.bucle = bucle
+
+    def frames(self):
+        """Genera (timestamp_original, bytes JPEG) con el ritmo configurado"""
+        while True:
+            primero = self.lector.buscar(self.inicio)
+            if primero >= len(self.lector):
+                return
+
+            ts_base = float(self.lector.timestamp[primero])
+            reloj_base = time.perf_counter()
+
+            for i in range(primero, len(self.lector)):
+                timestamp, jpeg = self.lector.leer(i)
+
+                if self.velocidad:
+                    # Programar respecto al inicio para no acumular deriva
+                    objetivo = reloj_base + (timestamp - ts_base) / self.velocidad
+                    espera = objetivo - time.perf_counter()
+                    if espera > 0:
+                        time.sleep(espera)
+
+                yield timestamp, jpeg
+
+            if not self.bucle:
+                return
+
+
+def reenviar_udp(reproductor, host="127.0.0.1", port=5005, control_event=None):
+    """Reenvía una grabación por UDP como si fuera la ESP32-CAM"""
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, 8388608)
+    enviados = 0
+
+    try:
+        for _, jpeg in reproductor.frames():
+            if control_event is not None and not control_event.is_set():
+                break
+            enviar_jpeg_udp(sock, (host, port), jpeg)
+            enviados += 1
+    finally:
+        sock.close()
+
+    return enviados
@@ -0,0 +1,221 @@
+"""
+💾 GUARDADO ASÍNCRONO DE CAPTURAS
+Las herramientas de captura reciben JPEG del ESP32; volver a codificar el
+frame con cv2.imwrite en el hilo de la interfaz congelaba el video y perdía
+calidad. Aquí:
+
+  - se guardan los bytes JPEG tal como llegaron
+  - si hay rotación, se rota sin pérdidas con jpegtran o, si no está
+    instalado, se marca la orientación en EXIF (cv2.imread y ultralytics la
+    aplican al leer); sólo como último recurso se recodifica
+  - la escritura la hacen hilos de fondo con una cola acotada: si se llena
+    se descarta la captura en vez de bloquear el bucle de video
+  - el fsync se hace por lotes (cada N archivos o cada pocos segundos)
+"""
+import os
+import queue
+import shutil
+import struct
+import subprocess
+import threading
+
+import cv2
+import numpy as np
+
+# Rotación horaria → valor de la etiqueta EXIF Orientation
+ORIENTACION_EXIF = {90: 6, 180: 3, 270: 8}
+ROTACION_CV2 = {90: cv2.ROTATE_90_CLOCKWISE, 180: cv2.ROTATE_180, 270: cv2.ROTATE_90_COUNTERCLOCKWISE}
+CALIDAD_RECODIFICACION = 95
+
+_JPEGTRAN = shutil.which('jpegtran')
+
+
+def _segmentos(jpeg):
+    """[(marcador, inicio, fin)] de los segmentos de cabecera hasta SOS"""
+    segmentos = []
+    i = 2
+    while i + 4 <= len(jpeg) and jpeg[i] == 0xFF:
+        marcador = jpeg[i + 1]
+        if marcador == 0xDA:  # SOS: empiezan los datos comprimidos
+            break
+        longitud = struct.unpack('>H', jpeg[i + 2:i + 4])[0]
+        segmentos.append((marcador, i, i + 2 + longitud))
+        i += 2 + longitud
+    return segmentos
+
+
+def _con_orientacion_exif(jpeg, orientacion):
+    """JPEG con un segmento EXIF que sólo contiene Orientation (None si ya trae EXIF)"""
+    if jpeg[:2] != b'\xff\xd8':
+        return None
+    segmentos = _segmentos(jpeg)
+    if any(m == 0xE1 and jpeg[ini + 4:ini + 10] == b'Exif\x00\x00' for m, ini, _ in segmentos):
+        return None
+
+    # TIFF big-endian con un único IFD de una entrada (0x0112 SHORT)
+    tiff = b'MM\x00\x2a' + struct.pack('>I', 8) + struct.pack('>H', 1)
+    tiff += struct.pack('>HHIHH', 0x0112, 3, 1, orientacion, 0) + struct.pack('>I', 0)
+    datos = b'Exif\x00\x00' + tiff
+    app1 = b'\xff\xe1' + struct.pack('>H', len(datos) + 2) + datos
+
+    # Después de APP0 (JFIF) si lo hay, que debe ir primero
+    posicion = segmentos[0][2] if segmentos and segmentos[0][0] == 0xE0 else 2
+    return jpeg[:posicion] + app1 + jpeg[posicion:]
+
+
+def rotar_jpeg(jpeg, grados):
+    """
+    Rota un JPEG sin recodificar si es posible. Devuelve (bytes, método) con
+    método 'original', 'jpegtran', 'exif' o 'recodificado'.
+    """
+    grados %= 360
+    if grados == 0:
+        return jpeg, 'original'
+
+    if _JPEGTRAN:
+        try:
+            proceso = subprocess.run([_JPEGTRAN, '-rotate', str(grados), '-perfect', '-copy', 'all'],
+                                     input=jpeg, capture_output=True, timeout=5)
+            if proceso.returncode == 0 and proceso.stdout:
+                return proceso.stdout, 'jpegtran'
+        except (OSError, subprocess.TimeoutExpired):
+            pass
+
+    marcado = _con_orientacion_exif(jpeg, ORIENTACION_EXIF[grados])
+    if marcado is not None:
+        return marcado, 'exif'
+
+    imagen = cv2.imdecode(np.frombuffer(jpeg, np.uint8), cv2.IMREAD_COLOR | cv2.IMREAD_IGNORE_ORIENTATION)
+    ok, buffer = cv2.imencode('.jpg', cv2.rotate(imagen, ROTACION_CV2[grados]),
+                              [cv2.IMWRITE_JPEG_QUALITY, CALIDAD_RECODIFICACION])
+    return buffer.tobytes(), 'recodificado'
+
+
+class EscritorImagenes:
+    """
+    Hilos de fondo que guardan capturas JPEG. `guardar` nunca bloquea:
+    devuelve False si la cola está llena. `al_guardar(ruta, datos)` se llama
+    desde el hilo escritor tras escribir cada archivo.
+    """
+
+    def __init__(self, hilos=2, max_pendientes=32, fsync_cada=16, fsync_intervalo=2.0, al_guardar=None):
+        self.fsync_cada = fsync_cada
+        self.fsync_intervalo = fsync_intervalo
+        self.al_guardar = al_guardar
+        self.cola = queue.Queue(maxsize=max_pendientes)
+        self.guardadas = 0
+        self.descartadas = 0
+        self.errores = 0
+        self.metodos = {}
+        self._lock = threading.Lock()
+        self._hilos = [threading.Thread(target=self._trabajar, daemon=True, name=f"escritor-{i}")
+                       for i in range(hilos)]
+        for hilo in self._hilos:
+            hilo.start()
+
+    def guardar(self, ruta, fotograma, rotacion=0, contexto=None):
+        """
+        Encola `fotograma` (cualquier objeto con .jpeg, o bytes) para escribirlo
+        en `ruta` rotado `rotacion` grados. `contexto` se pasa a al_guardar.
+        """
+        try:
+            self.cola.put_nowait((ruta, fotograma, rotacion, contexto))
+            return True
+        except queue.Full:
+            with self._lock:
+                self.descartadas += 1
+            return False
+
+    def pendientes(self):
+        return self.cola.qsize()
+
+    def cerrar(self, timeout=10.0):
+        """Termina lo encolado, hace el último fsync y para los hilos"""
+        for _ in self._hilos:
+            self.cola.put(None)
+        for hilo in self._hilos:
+            hilo.join(timeout)
+
+    def _trabajar(self):
+        abiertos = []  # Descriptores escritos a la espera del fsync del lote
+        while True:
+            try:
+                tarea = self.cola.get(timeout=self.fsync_intervalo)
+            except queue.Empty:
+                self._sincronizar(abiertos)
+                continue
+            if tarea is None:
+                self._sincronizar(abiertos)
+                return
+
+            ruta, fotograma, rotacion, contexto = tarea
+            try:
+                jpeg = fotograma if isinstance(fotograma, (bytes, bytearray)) else fotograma.jpeg
+                datos, metodo = rotar_jpeg(bytes(jpeg), rotacion)
+                abiertos.append((self._escribir(ruta, datos), os.path.dirname(ruta)))
+                if self.al_guardar:
+                    self.al_guardar(ruta, datos, contexto)
+                with self._lock:
+                    self.guardadas += 1
+                    self.metodos[metodo] = self.metodos.get(metodo, 0) + 1
+            except Exception as e:
+                print(f"❌ Error guardando {os.path.basename(ruta)}: {e}")
+                with self._lock:
+                    self.errores += 1
+
+            if len(abiertos) >= self.fsync_cada:
+                self._sincronizar(abiertos)
+
+    @staticmethod
+    def _escribir(ruta, datos):
+        """
+        Escribe todos los bytes y devuelve el descriptor abierto (para el
+        fsync del lote). Si falla, no deja ni el descriptor ni el archivo a medias.
+        """
+        descriptor = os.open(ruta, os.O_WRONLY | os.O_CREAT | os.O_TRUNC | getattr(os, 'O_BINARY', 0))
+        try:
+            vista = memoryview(datos)
+            while vista:
+                # os.write puede escribir menos de lo pedido
+                vista = vista[os.write(descriptor, vista):]
+        except BaseException:
+            os.close(descriptor)
+            try:
+                os.remove(ruta)
+            except OSError:
+                pass
+            raise
+        return descriptor
+
+    def _sincronizar(self, abiertos):
+        """
+        fsync de los archivos del lote y de sus directorios (donde el SO lo
+        permite). Un fallo de disco cuenta como error pero no para el hilo y
+        no deja descriptores abiertos.
+        """
+        directorios = set()
+        for descriptor, directorio in abiertos:
+            try:
+                os.fsync(descriptor)
+            except OSError as e:
+                print(f"❌ Error sincronizando una captura en {directorio}: {e}")
+                with self._lock:
+                    self.errores += 1
+            finally:
+                try:
+                    os.close(descriptor)
+                except OSError:
+                    pass
+            directorios.add(directorio)
+        abiertos.clear()
+        for directorio in directorios:
+            try:
+                descriptor = os.open(directorio, os.O_RDONLY)
+            except OSError:
+                continue  # Windows no permite abrir directorios
+            try:
+                os.fsync(descriptor)
+            except OSError:
+                pass
+            finally:
+                os.close(descriptor)
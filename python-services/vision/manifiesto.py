@@ -0,0 +1,175 @@
+"""
+📒 MANIFIESTO DEL DATASET
+Índice SQLite (dataset_rover/.manifiesto.sqlite) con una fila por imagen:
+ruta relativa, categoría, tamaño, mtime, hash, instante de captura y sesión.
+
+Las herramientas de captura añaden cada imagen al guardarla y las de
+entrenamiento y estadísticas consultan el índice en vez de listar todas
+las carpetas. Los conteos por categoría se mantienen con triggers en su
+propia tabla, así que consultarlos no depende del tamaño del dataset.
+
+Si se editan las carpetas a mano, `reconciliar` repara el índice
+(reconciliar_dataset.py desde la línea de comandos). También guarda los
+hashes perceptuales de deduplicar_dataset.py, indexados por el hash del
+contenido.
+"""
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from vision.dataset import CATEGORIAS, EXTENSIONES, escanear
+
+ARCHIVO_MANIFIESTO = '.manifiesto.sqlite'
+
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS imagenes (
+    ruta      TEXT PRIMARY KEY,
+    categoria TEXT NOT NULL,
+    tamano    INTEGER NOT NULL,
+    mtime_ns  INTEGER NOT NULL,
+    hash      TEXT NOT NULL,
+    capturada REAL NOT NULL,
+    sesion    TEXT
+);
+CREATE INDEX IF NOT EXISTS imagenes_categoria ON imagenes (categoria);
+CREATE TABLE IF NOT EXISTS conteos (
+    categoria TEXT PRIMARY KEY,
+    total     INTEGER NOT NULL
+);
+CREATE TRIGGER IF NOT EXISTS conteo_alta AFTER INSERT ON imagenes BEGIN
+    INSERT INTO conteos (categoria, total) VALUES (NEW.categoria, 1)
+    ON CONFLICT (categoria) DO UPDATE SET total = total + 1;
+END;
+CREATE TRIGGER IF NOT EXISTS conteo_baja AFTER DELETE ON imagenes BEGIN
+    UPDATE conteos SET total = total - 1 WHERE categoria = OLD.categoria;
+END;
+CREATE TABLE IF NOT EXISTS hashes_perceptuales (
+    hash  TEXT PRIMARY KEY,
+    dhash INTEGER NOT NULL,
+    phash INTEGER NOT NULL
+);
+"""
+
+
+def hash_archivo(ruta=None, datos=None):
+    """SHA-1 (abreviado) de los bytes de la imagen"""
+    if datos is None:
+        with open(ruta, 'rb') as f:
+            datos = f.read()
+    return hashlib.sha1(datos).hexdigest()[:20]
+
+
+class ManifiestoDataset:
+    """Índice de las imágenes de un dataset por categorías"""
+
+    def __init__(self, dataset_path, categorias=CATEGORIAS):
+        self.dataset_path = dataset_path
+        self.categorias = list(categorias)
+        self.ruta = os.path.join(dataset_path, ARCHIVO_MANIFIESTO)
+        nuevo = not os.path.exists(self.ruta)
+
+        os.makedirs(dataset_path, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self.ruta, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(ESQUEMA)
+
+        if nuevo:
+            # Dataset anterior al manifiesto: indexar lo que ya hay
+            self.reconciliar()
+
+    def cerrar(self):
+        with self._lock:
+            self._db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.cerrar()
+
+    def agregar(self, categoria, nombre, datos=None, sesion=None, capturada=None):
+        """Registra una imagen ya guardada en <categoría>/<nombre> (`datos`: sus bytes, evita releerla)"""
+        ruta = os.path.join(self.dataset_path, categoria, nombre)
+        info = os.stat(ruta)
+        fila = (f"{categoria}/{nombre}", categoria, info.st_size, info.st_mtime_ns,
+                hash_archivo(ruta, datos), capturada or time.time(), sesion)
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT INTO imagenes VALUES (?, ?, ?, ?, ?, ?, ?) ON CONFLICT (ruta) DO UPDATE SET "
+                "tamano = excluded.tamano, mtime_ns = excluded.mtime_ns, hash = excluded.hash, "
+                "capturada = excluded.capturada, sesion = excluded.sesion", fila)
+
+    def quitar(self, rel):
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM imagenes WHERE ruta = ?", (rel,))
+
+    def contadores(self):
+        """{categoría: imágenes} de todas las categorías conocidas"""
+        with self._lock:
+            filas = dict(self._db.execute("SELECT categoria, total FROM conteos").fetchall())
+        return {categoria: filas.get(categoria, 0) for categoria in self.categorias}
+
+    def total(self):
+        with self._lock:
+            return self._db.execute("SELECT COALESCE(SUM(total), 0) FROM conteos").fetchone()[0]
+
+    def imagenes(self, categoria=None):
+        """[(ruta relativa, categoría, tamaño, mtime_ns, hash, capturada, sesión)] ordenadas por ruta"""
+        consulta = "SELECT * FROM imagenes"
+        parametros = ()
+        if categoria is not None:
+            consulta += " WHERE categoria = ?"
+            parametros = (categoria,)
+        with self._lock:
+            return self._db.execute(consulta + " ORDER BY ruta", parametros).fetchall()
+
+    def hashes_perceptuales(self):
+        """{hash de contenido: (dhash, phash)} ya calculados (enteros con signo de 64 bits)"""
+        with self._lock:
+            return {h: (d, p) for h, d, p in self._db.execute("SELECT * FROM hashes_perceptuales")}
+
+    def guardar_hashes_perceptuales(self, filas):
+        """filas: [(hash de contenido, dhash, phash)]; al ir por contenido sobreviven a renombrados"""
+        with self._lock, self._db:
+            self._db.executemany("INSERT OR REPLACE INTO hashes_perceptuales VALUES (?, ?, ?)", filas)
+
+    def archivos(self):
+        """Imágenes en el formato de vision.dataset.escanear (para sincronizar)"""
+        return {rel: (os.path.join(self.dataset_path, *rel.split('/')), categoria, tamano, mtime)
+                for rel, categoria, tamano, mtime, *_ in self.imagenes()
+                if categoria in self.categorias}
+
+    def reconciliar(self, trabajadores=None):
+        """
+        Repara el índice comparándolo con las carpetas: añade lo nuevo,
+        rehace el hash de lo modificado y quita lo borrado. Devuelve los conteos.
+        """
+        en_disco = escanear(self.dataset_path, self.categorias, EXTENSIONES)
+        with self._lock:
+            indice = {rel: (tamano, mtime) for rel, tamano, mtime in
+                      self._db.execute("SELECT ruta, tamano, mtime_ns FROM imagenes")}
+
+        borradas = [rel for rel in indice if rel not in en_disco]
+        cambiadas = [rel for rel, (_, _, tamano, mtime) in en_disco.items() if indice.get(rel) != (tamano, mtime)]
+
+        def fila(rel):
+            ruta, categoria, tamano, mtime = en_disco[rel]
+            return (rel, categoria, tamano, mtime, hash_archivo(ruta), mtime / 1e9, None)
+
+        with ThreadPoolExecutor(max_workers=trabajadores or min(32, (os.cpu_count() or 1) * 2)) as pool:
+            filas = list(pool.map(fila, cambiadas))
+
+        with self._lock, self._db:
+            self._db.executemany("DELETE FROM imagenes WHERE ruta = ?", [(rel,) for rel in borradas])
+            # Las modificadas conservan su instante de captura y su sesión
+            self._db.executemany(
+                "INSERT INTO imagenes VALUES (?, ?, ?, ?, ?, ?, ?) ON CONFLICT (ruta) DO UPDATE SET "
+                "tamano = excluded.tamano, mtime_ns = excluded.mtime_ns, hash = excluded.hash", filas)
+        return {'nuevas': sum(rel not in indice for rel in cambiadas),
+                'modificadas': sum(rel in indice for rel in cambiadas),
+                'borradas': len(borradas), 'total': len(en_disco)}
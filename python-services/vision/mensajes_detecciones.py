@@ -0,0 +1,138 @@
+"""
+📡 DETECCIONES PUBLICADAS POR MQTT
+El proceso que ejecuta YOLO publica sus detecciones en `rover/vision/detections`
+para que el resto de servicios (dashboard, puente WebSocket, herramientas de
+dataset) las usen sin cargar otro modelo.
+
+Formato binario v1 (little-endian), 20 bytes de cabecera + 12 por detección:
+
+  cabecera  B version | B flags | H n | I seq | d timestamp | H ancho | H alto
+  detección H clase | H confianza (0-65535) | 4H caja x1 y1 x2 y2 normalizada (0-65535)
+
+Formato JSON compacto (mismo contenido):
+  {"v":1,"seq":..,"t":..,"w":..,"h":..,"c":[..],"s":[..],"b":[[x1,y1,x2,y2],..]}
+
+Los nombres de clase se publican aparte y retenidos en `rover/vision/classes`
+({id: nombre}) para no repetirlos en cada mensaje.
+"""
+import json
+import struct
+import time
+
+import numpy as np
+
+from vision.detecciones import Detecciones, redondear
+
+TOPIC_DETECCIONES = "rover/vision/detections"
+TOPIC_CLASES = "rover/vision/classes"
+VERSION = 1
+FORMATOS = ('binario', 'json')
+TASA_MAXIMA = 10.0         # Mensajes por segundo como máximo
+INTERVALO_SIN_CAMBIOS = 1.0  # Con escena vacía, un mensaje por segundo basta
+
+CABECERA = struct.Struct('<BBHIdHH')
+DTYPE_DETECCION = np.dtype([('clase', '<u2'), ('confianza', '<u2'), ('caja', '<u2', (4,))])
+ESCALA = 65535
+
+
+def codificar(detecciones, seq, ancho, alto, timestamp=None, formato='binario'):
+    """Mensaje con las detecciones de un frame de `ancho` x `alto`"""
+    timestamp = time.time() if timestamp is None else timestamp
+    n = len(detecciones)
+    normalizadas = detecciones.cajas / np.array([ancho, alto, ancho, alto], dtype=np.float32)
+
+    if formato == 'json':
+        return json.dumps({
+            'v': VERSION, 'seq': seq, 't': round(timestamp, 3), 'w': ancho, 'h': alto,
+            'c': detecciones.clases.tolist(),
+            's': redondear(detecciones.confianzas, 3),
+            'b': np.round(detecciones.cajas).astype(np.int32).tolist(),
+        }, separators=(',', ':')).encode()
+
+    registros = np.empty(n, dtype=DTYPE_DETECCION)
+    registros['clase'] = detecciones.clases
+    registros['confianza'] = np.rint(np.clip(detecciones.confianzas, 0, 1) * ESCALA)
+    registros['caja'] = np.rint(np.clip(normalizadas, 0, 1) * ESCALA)
+    return CABECERA.pack(VERSION, 0, n, seq & 0xFFFFFFFF, timestamp, ancho, alto) + registros.tobytes()
+
+
+def decodificar(payload, nombres=None):
+    """
+    Devuelve {'seq', 'timestamp', 'ancho', 'alto', 'detecciones'} con las
+    cajas en píxeles. Acepta los dos formatos.
+    """
+    nombres = nombres or {}
+    if payload[:1] == b'{':
+        datos = json.loads(payload)
+        detecciones = Detecciones(np.asarray(datos['b'], dtype=np.float32).reshape(-1, 4),
+                                  datos['s'], datos['c'], nombres)
+        return {'seq': datos['seq'], 'timestamp': datos['t'], 'ancho': datos['w'],
+                'alto': datos['h'], 'detecciones': detecciones}
+
+    version, _, n, seq, timestamp, ancho, alto = CABECERA.unpack_from(payload)
+    if version != VERSION:
+        raise ValueError(f"Versión de mensaje de detecciones no soportada: {version}")
+    registros = np.frombuffer(payload, dtype=DTYPE_DETECCION, count=n, offset=CABECERA.size)
+    escala = np.array([ancho, alto, ancho, alto], dtype=np.float32) / ESCALA
+    detecciones = Detecciones(registros['caja'] * escala, registros['confianza'] / ESCALA,
+                              registros['clase'], nombres)
+    return {'seq': seq, 'timestamp': timestamp, 'ancho': ancho, 'alto': alto, 'detecciones': detecciones}
+
+
+def a_json_navegador(mensaje):
+    """Versión para el navegador: nombres de clase y cajas en píxeles"""
+    detecciones = mensaje['detecciones']
+    return {
+        'seq': mensaje['seq'],
+        'timestamp': mensaje['timestamp'],
+        'width': mensaje['ancho'],
+        'height': mensaje['alto'],
+        'detections': detecciones.a_json(con_cajas=True),
+    }
+
+
+class PublicadorDetecciones:
+    """
+    Publica detecciones con control de tasa: como mucho `tasa_maxima` mensajes
+    por segundo (los frames intermedios no se publican, el siguiente lleva
+    datos más nuevos) y, mientras no se detecta nada, sólo un mensaje cada
+    INTERVALO_SIN_CAMBIOS segundos.
+    """
+
+    def __init__(self, cliente_mqtt, tasa_maxima=TASA_MAXIMA, formato='binario', topic=TOPIC_DETECCIONES):
+        if formato not in FORMATOS:
+            raise ValueError(f"Formato no válido: {formato} (opciones: {FORMATOS})")
+        self.cliente = cliente_mqtt
+        self.intervalo = 1.0 / tasa_maxima if tasa_maxima else 0.0
+        self.formato = formato
+        self.topic = topic
+
+        self._ultimo_envio = 0.0
+        self._ultimo_vacio = False
+        self._nombres_publicados = None
+        self.publicados = 0
+        self.omitidos = 0
+
+    def publicar(self, detecciones, seq, ancho, alto, timestamp=None):
+        """True si el mensaje se envió"""
+        ahora = time.time()
+        vacio = len(detecciones) == 0
+        espera = INTERVALO_SIN_CAMBIOS if vacio and self._ultimo_vacio else self.intervalo
+        if ahora - self._ultimo_envio < espera:
+            self.omitidos += 1
+            return False
+
+        try:
+            if detecciones.nombres and detecciones.nombres is not self._nombres_publicados:
+                nombres = {int(k): v for k, v in detecciones.nombres.items()}
+                self.cliente.publish(TOPIC_CLASES, json.dumps(nombres), qos=1, retain=True)
+                self._nombres_publicados = detecciones.nombres
+            payload = codificar(detecciones, seq, ancho, alto, timestamp or ahora, self.formato)
+            self.cliente.publish(self.topic, payload, qos=0)
+        except Exception:
+            return False
+
+        self._ultimo_envio = ahora
+        self._ultimo_vacio = vacio
+        self.publicados += 1
+        return True
@@ -0,0 +1,147 @@
+"""
+🧠 CARGA DE MODELOS YOLO CON BACKENDS OPTIMIZADOS PARA CPU
+Exporta los pesos .pt a ONNX u OpenVINO una sola vez, guarda el resultado en
+una caché indexada por el hash de los pesos y calienta la sesión al arrancar.
+
+  backend = 'pytorch'   → YOLO('pesos.pt') tal cual
+  backend = 'onnx'      → ONNX Runtime
+  backend = 'openvino'  → OpenVINO (normalmente el más rápido en CPU Intel)
+  backend = 'onnx_int8' → ONNX Runtime con el modelo INT8 que promovió
+                          training/cuantizar_modelo.py (si no hay, ONNX FP32)
+"""
+import hashlib
+import os
+import shutil
+import time
+
+import numpy as np
+
+BACKENDS = ('pytorch', 'onnx', 'openvino', 'onnx_int8')
+DIRECTORIO_CACHE = os.path.join(os.path.expanduser("~"), ".cache", "rover_modelos")
+
+
+def hash_pesos(ruta, bloque=1024 * 1024):
+    """SHA-256 (abreviado) del archivo de pesos"""
+    h = hashlib.sha256()
+    with open(ruta, 'rb') as f:
+        for trozo in iter(lambda: f.read(bloque), b''):
+            h.update(trozo)
+    return h.hexdigest()[:16]
+
+
+def _ruta_pesos(pesos):
+    """Ruta local de los pesos; ultralytics descarga los oficiales si faltan"""
+    if os.path.exists(pesos):
+        return pesos
+    from ultralytics import YOLO
+    modelo = YOLO(pesos)
+    return modelo.ckpt_path or pesos
+
+
+def _ruta_cache(pesos, backend, imgsz, cache_dir, opciones=None):
+    nombre = os.path.splitext(os.path.basename(pesos))[0]
+    clave = f"{nombre}_{hash_pesos(pesos)}_{imgsz}"
+    # Las opciones de exportación (p.ej. dynamic=True) cambian el artefacto
+    for opcion, valor in sorted((opciones or {}).items()):
+        clave += f"_{opcion}{valor}"
+    if backend == 'onnx':
+        return os.path.join(cache_dir, f"{clave}.onnx")
+    if backend == 'onnx_int8':
+        return os.path.join(cache_dir, f"{clave}_int8.onnx")
+    # ultralytics reconoce los modelos OpenVINO por el sufijo del directorio
+    return os.path.join(cache_dir, f"{clave}_openvino_model")
+
+
+def exportar_modelo(pesos, backend, imgsz=640, cache_dir=DIRECTORIO_CACHE, **opciones):
+    """
+    Exporta los pesos al backend indicado si no está ya en caché.
+    Devuelve la ruta del artefacto exportado.
+    """
+    if backend not in ('onnx', 'openvino'):
+        raise ValueError(f"Backend de exportación no válido: {backend}")
+
+    pesos = _ruta_pesos(pesos)
+    destino = _ruta_cache(pesos, backend, imgsz, cache_dir, opciones)
+    if os.path.exists(destino):
+        return destino
+
+    from ultralytics import YOLO
+
+    print(f"📦 Exportando {os.path.basename(pesos)} a {backend.upper()} (imgsz={imgsz}, sólo la primera vez)...")
+    os.makedirs(cache_dir, exist_ok=True)
+    inicio = time.time()
+    exportado = YOLO(pesos).export(format=backend, imgsz=imgsz, verbose=False, **opciones)
+
+    # Mover a la caché de forma atómica para no dejar exportaciones a medias
+    temporal = destino + ".tmp"
+    if os.path.isdir(temporal):
+        shutil.rmtree(temporal)
+    elif os.path.exists(temporal):
+        os.remove(temporal)
+    shutil.move(str(exportado), temporal)
+    os.replace(temporal, destino)
+
+    print(f"✅ Exportado en {time.time() - inicio:.1f} s → {destino}")
+    return destino
+
+
+def ruta_int8(pesos, imgsz=640, cache_dir=DIRECTORIO_CACHE, **opciones):
+    """Ruta donde vive (o viviría) el modelo INT8 promovido para estos pesos"""
+    return _ruta_cache(_ruta_pesos(pesos), 'onnx_int8', imgsz, cache_dir, opciones)
+
+
+def limitar_hilos(hilos):
+    """
+    Hilos de cálculo de este proceso (para repartir núcleos entre procesos).
+    Llamar antes de cargar el modelo: torch y ONNX Runtime leen las variables al iniciarse.
+    """
+    for variable in ('OMP_NUM_THREADS', 'OPENBLAS_NUM_THREADS', 'MKL_NUM_THREADS'):
+        os.environ[variable] = str(hilos)
+    try:
+        import torch
+        torch.set_num_threads(hilos)
+    except ImportError:
+        pass
+
+
+def calentar_modelo(modelo, imgsz=640, iteraciones=2):
+    """Ejecuta inferencias de prueba para que la primera real no pague la inicialización"""
+    dummy = np.zeros((imgsz, imgsz, 3), dtype=np.uint8)
+    inicio = time.time()
+    for _ in range(iteraciones):
+        modelo.predict(dummy, imgsz=imgsz, verbose=False)
+    return time.time() - inicio
+
+
+def cargar_modelo(pesos='yolo11n.pt', backend='pytorch', imgsz=640, calentar=True, task='detect',
+                  **exportacion):
+    """
+    Carga un modelo YOLO con el backend pedido. Si la exportación falla
+    (p.ej. falta onnxruntime u openvino) se usa PyTorch como respaldo.
+    `exportacion` se pasa a la exportación (p.ej. dynamic=True para lotes).
+    """
+    from ultralytics import YOLO
+
+    if backend == 'onnx_int8':
+        ruta = ruta_int8(pesos, imgsz, **exportacion)
+        if os.path.exists(ruta):
+            modelo = YOLO(ruta, task=task)
+        else:
+            print(f"⚠️ No hay modelo INT8 promovido para {os.path.basename(pesos)} (imgsz={imgsz}), usando ONNX FP32")
+            backend = 'onnx'
+
+    if backend not in ('pytorch', 'onnx_int8'):
+        try:
+            modelo = YOLO(exportar_modelo(pesos, backend, imgsz, **exportacion), task=task)
+        except Exception as e:
+            print(f"⚠️ Backend {backend} no disponible ({e}), usando PyTorch")
+            backend = 'pytorch'
+
+    if backend == 'pytorch':
+        modelo = YOLO(pesos)
+
+    if calentar:
+        segundos = calentar_modelo(modelo, imgsz)
+        print(f"🔥 Modelo {os.path.basename(pesos)} [{backend}] listo (calentamiento {segundos:.1f} s)")
+
+    return modelo
@@ -0,0 +1,85 @@
+"""
+🏞️ DETECTOR DE CAMBIOS PARA SALTAR INFERENCIAS EN ESCENAS ESTÁTICAS
+Compara una versión gris y reducida del frame con la del último frame que
+pasó por YOLO. Si la fracción de píxeles que cambiaron no supera el umbral,
+se reutilizan las detecciones anteriores. La histéresis evita oscilar entre
+estados con cambios pequeños, y cada `intervalo_max` segundos se fuerza una
+inferencia aunque la escena parezca quieta.
+"""
+import time
+
+import cv2
+import numpy as np
+
+TAMANO_REDUCIDO = (64, 48)
+UMBRAL_PIXEL = 18          # Diferencia de gris (0-255) para contar un píxel como cambiado
+UMBRAL_ACTIVAR = 0.02      # Fracción de píxeles cambiados para pasar a "movimiento"
+UMBRAL_DESACTIVAR = 0.008  # Fracción por debajo de la cual se vuelve a "estático"
+INTERVALO_MAX = 2.0        # Segundos máximos sin refrescar detecciones
+
+
+class DetectorMovimiento:
+    """Decide si la escena cambió lo suficiente como para volver a inferir"""
+
+    def __init__(self, tamano=TAMANO_REDUCIDO, umbral_pixel=UMBRAL_PIXEL,
+                 umbral_activar=UMBRAL_ACTIVAR, umbral_desactivar=UMBRAL_DESACTIVAR,
+                 intervalo_max=INTERVALO_MAX):
+        self.tamano = tamano
+        self.umbral_pixel = umbral_pixel
+        self.umbral_activar = umbral_activar
+        self.umbral_desactivar = umbral_desactivar
+        self.intervalo_max = intervalo_max
+
+        self.referencia = None
+        self.en_movimiento = True
+        self.ultimo_refresco = 0.0
+        self.cambio = 0.0
+        self.evaluados = 0
+        self.saltados = 0
+
+    def _reducir(self, frame):
+        if frame.ndim == 3:
+            frame = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        return cv2.resize(frame, self.tamano, interpolation=cv2.INTER_AREA).astype(np.int16)
+
+    def debe_inferir(self, frame):
+        """True si hay que ejecutar el detector sobre este frame"""
+        reducido = self._reducir(frame)
+        ahora = time.time()
+        self.evaluados += 1
+
+        if self.referencia is None or reducido.shape != self.referencia.shape:
+            self._refrescar(reducido, ahora)
+            return True
+
+        self.cambio = np.count_nonzero(np.abs(reducido - self.referencia) > self.umbral_pixel) / reducido.size
+
+        # Histéresis: umbral distinto para entrar y salir del estado "movimiento"
+        if self.en_movimiento:
+            self.en_movimiento = self.cambio >= self.umbral_desactivar
+        else:
+            self.en_movimiento = self.cambio >= self.umbral_activar
+
+        if self.en_movimiento or ahora - self.ultimo_refresco >= self.intervalo_max:
+            self._refrescar(reducido, ahora)
+            return True
+
+        self.saltados += 1
+        return False
+
+    def _refrescar(self, reducido, ahora):
+        # La referencia es el último frame inferido: los cambios lentos se acumulan
+        self.referencia = reducido
+        self.ultimo_refresco = ahora
+
+    def reiniciar(self):
+        self.referencia = None
+        self.en_movimiento = True
+
+    def estadisticas(self):
+        return {
+            'estatica': not self.en_movimiento,
+            'cambio': round(float(self.cambio), 4),
+            'evaluados': self.evaluados,
+            'saltados': self.saltados,
+        }
@@ -0,0 +1,231 @@
+"""
+🖌️ OVERLAY LIGERO PARA LAS VENTANAS DE VIDEO
+Sustituye a `results[0].plot()` (que copia el frame y redibuja todo) y a los
+`cv2.addWeighted` de frame completo:
+
+- El texto se compone con sprites de glifos cacheados: cada carácter se
+  rasteriza una vez como máscara alfa y las cadenas repetidas se cachean.
+- Los paneles estáticos (fondo semitransparente, borde y textos fijos) se
+  pre-renderizan una vez por tamaño y se mezclan sólo sobre su región.
+- La mezcla alfa se hace con NumPy únicamente en los píxeles afectados.
+- Las cajas se dibujan directamente desde los arrays de `Detecciones`.
+
+Todas las funciones dibujan sobre el frame recibido (in-place).
+"""
+from functools import lru_cache
+
+import cv2
+import numpy as np
+
+FUENTE = cv2.FONT_HERSHEY_SIMPLEX
+
+# Colores por clase (BGR), indexados por id de clase
+PALETA = np.array([
+    (56, 56, 255), (151, 157, 255), (31, 112, 255), (29, 178, 255), (49, 210, 207),
+    (10, 249, 72), (23, 204, 146), (134, 219, 61), (52, 147, 26), (187, 212, 0),
+    (168, 153, 44), (255, 194, 0), (147, 69, 52), (255, 115, 100), (236, 24, 0),
+    (255, 56, 132), (133, 0, 82), (255, 56, 203), (200, 149, 255), (199, 55, 255),
+], dtype=np.uint8)
+
+
+@lru_cache(maxsize=64)
+def _metricas(escala, grosor):
+    """Altura sobre la línea base y descenso máximo de la fuente"""
+    alto = cv2.getTextSize("A", FUENTE, escala, grosor)[0][1]
+    descenso = max(cv2.getTextSize(c, FUENTE, escala, grosor)[1] for c in "gjpqy|()[]")
+    return alto + grosor, descenso + grosor
+
+
+@lru_cache(maxsize=1024)
+def _glifo(caracter, escala, grosor):
+    """Máscara alfa de un carácter y su avance horizontal"""
+    ascenso, descenso = _metricas(escala, grosor)
+    ancho = cv2.getTextSize(caracter, FUENTE, escala, grosor)[0][0]
+    mascara = np.zeros((ascenso + descenso, ancho + grosor), dtype=np.uint8)
+    cv2.putText(mascara, caracter, (0, ascenso), FUENTE, escala, 255, grosor, cv2.LINE_AA)
+    return mascara, ancho - grosor
+
+
+@lru_cache(maxsize=512)
+def mascara_texto(texto, escala=0.5, grosor=1):
+    """
+    Máscara alfa (alto, ancho) de una cadena compuesta con los glifos
+    cacheados y la altura desde su borde superior hasta la línea base.
+    """
+    ascenso, descenso = _metricas(escala, grosor)
+    glifos = [_glifo(c, escala, grosor) for c in texto]
+    if not glifos:
+        return np.zeros((ascenso + descenso, 1), dtype=np.uint8), ascenso
+
+    alto = ascenso + descenso
+    ancho = sum(avance for _, avance in glifos) + max(g.shape[1] for g, _ in glifos)
+    mascara = np.zeros((alto, ancho), dtype=np.uint8)
+    x = 0
+    for glifo, avance in glifos:
+        zona = mascara[:, x:x + glifo.shape[1]]
+        np.maximum(zona, glifo, out=zona)
+        x += avance
+
+    mascara.setflags(write=False)
+    return mascara, ascenso
+
+
+@lru_cache(maxsize=1024)
+def _sprite(texto, color, escala, grosor):
+    """Texto listo para mezclar: imagen del color, pesos alfa y 1 - alfa"""
+    mascara, ascenso = mascara_texto(texto, escala, grosor)
+    imagen = np.empty(mascara.shape + (3,), dtype=np.uint8)
+    imagen[:] = color
+    alfa = mascara.astype(np.float32) / 255
+    return imagen, alfa, 1 - alfa, ascenso
+
+
+def _recortar(frame, x, y, alto, ancho):
+    """Intersección de un rectángulo con el frame: (y1, y2, x1, x2, dy, dx) o None"""
+    h, w = frame.shape[:2]
+    x1, y1 = max(x, 0), max(y, 0)
+    x2, y2 = min(x + ancho, w), min(y + alto, h)
+    if x1 >= x2 or y1 >= y2:
+        return None
+    return y1, y2, x1, x2, y1 - y, x1 - x
+
+
+def mezclar(frame, x, y, imagen, alfa, inverso=None):
+    """
+    Mezcla `imagen` sobre el frame en (x, y) con pesos `alfa` (float32 0-1,
+    misma forma que la imagen sin canales). Sólo toca la región afectada.
+    """
+    zona = _recortar(frame, x, y, *alfa.shape[:2])
+    if zona is None:
+        return
+    if inverso is None:
+        inverso = 1 - alfa
+    y1, y2, x1, x2, dy, dx = zona
+    alto, ancho = y2 - y1, x2 - x1
+    if (alto, ancho) != alfa.shape[:2]:
+        imagen = imagen[dy:dy + alto, dx:dx + ancho]
+        alfa = alfa[dy:dy + alto, dx:dx + ancho]
+        inverso = inverso[dy:dy + alto, dx:dx + ancho]
+    region = frame[y1:y2, x1:x2]
+    region[:] = cv2.blendLinear(np.ascontiguousarray(imagen), np.ascontiguousarray(region),
+                                np.ascontiguousarray(alfa), np.ascontiguousarray(inverso))
+
+
+def dibujar_texto(frame, texto, origen, color, escala=0.5, grosor=1):
+    """Como cv2.putText (origen en la línea base izquierda) pero con sprites cacheados"""
+    imagen, alfa, inverso, ascenso = _sprite(texto, tuple(color), escala, grosor)
+    mezclar(frame, origen[0], origen[1] - ascenso, imagen, alfa, inverso)
+
+
+def tamano_texto(texto, escala=0.5, grosor=1):
+    return cv2.getTextSize(texto, FUENTE, escala, grosor)[0]
+
+
+def rellenar(frame, x1, y1, x2, y2, color, opacidad=1.0):
+    """Rectángulo relleno; con opacidad < 1 se mezcla sólo esa región"""
+    zona = _recortar(frame, x1, y1, y2 - y1, x2 - x1)
+    if zona is None:
+        return
+    ry1, ry2, rx1, rx2, _, _ = zona
+    region = frame[ry1:ry2, rx1:rx2]
+    if opacidad >= 1.0:
+        region[:] = color
+        return
+    fondo = np.empty_like(region)
+    fondo[:] = color
+    region[:] = cv2.addWeighted(fondo, opacidad, region, 1 - opacidad, 0)
+
+
+def dibujar_detecciones(frame, detecciones, colores=None, grosor=2, etiquetas=True,
+                        escala=0.45, fondo_etiqueta=True):
+    """
+    Dibuja las cajas de un objeto Detecciones. `colores` puede ser un color
+    BGR, un array (N, 3) o None para colorear por clase con PALETA.
+    """
+    if len(detecciones) == 0:
+        return frame
+
+    if colores is None:
+        colores = PALETA[detecciones.clases % len(PALETA)]
+    else:
+        colores = np.broadcast_to(np.asarray(colores, dtype=np.uint8), (len(detecciones), 3))
+
+    cajas = detecciones.cajas.astype(np.int32).tolist()
+    colores = [tuple(c) for c in colores.tolist()]
+    textos = None
+    if etiquetas:
+        confianzas = np.rint(detecciones.confianzas * 100).astype(np.int32).tolist()
+        textos = [f"{nombre} {conf}%" for nombre, conf in zip(detecciones.etiquetas(), confianzas)]
+
+    for i, (x1, y1, x2, y2) in enumerate(cajas):
+        color = colores[i]
+        cv2.rectangle(frame, (x1, y1), (x2, y2), color, grosor)
+        if textos is None:
+            continue
+
+        color_texto = (255, 255, 255) if fondo_etiqueta else color
+        imagen, alfa, inverso, ascenso = _sprite(textos[i], color_texto, escala, 1)
+        y_texto = max(y1 - 4, ascenso + 2)
+        if fondo_etiqueta:
+            cv2.rectangle(frame, (x1, y_texto - ascenso - 2), (x1 + alfa.shape[1], y_texto + 3), color, -1)
+        mezclar(frame, x1, y_texto - ascenso, imagen, alfa, inverso)
+    return frame
+
+
+class Panel:
+    """
+    Panel estático pre-renderizado: fondo semitransparente, borde opcional y
+    textos fijos se componen una vez en una imagen con su canal alfa;
+    aplicarlo cuesta una sola mezcla sobre su región.
+    """
+
+    def __init__(self, ancho, alto, fondo=(0, 0, 0), opacidad=0.7, borde=None, grosor_borde=1):
+        self.ancho = ancho
+        self.alto = alto
+        self.color = np.zeros((alto, ancho, 3), dtype=np.float32)
+        self.color[:] = fondo
+        self.alfa = np.full((alto, ancho), opacidad, dtype=np.float32)
+        if borde is not None:
+            borde_mascara = np.zeros((alto, ancho), dtype=np.uint8)
+            cv2.rectangle(borde_mascara, (0, 0), (ancho - 1, alto - 1), 255, grosor_borde)
+            self._componer(0, 0, borde, borde_mascara)
+        self._listo = None
+
+    def texto(self, texto, origen, color, escala=0.5, grosor=1):
+        """Añade un texto fijo (origen relativo al panel, en la línea base)"""
+        mascara, ascenso = mascara_texto(texto, escala, grosor)
+        self._componer(origen[0], origen[1] - ascenso, color, mascara)
+        return self
+
+    def _componer(self, x, y, color, mascara):
+        zona = _recortar(self.color, x, y, *mascara.shape[:2])
+        if zona is None:
+            return
+        y1, y2, x1, x2, dy, dx = zona
+        a = mascara[dy:dy + y2 - y1, dx:dx + x2 - x1].astype(np.float32) / 255
+        self.color[y1:y2, x1:x2] = self.color[y1:y2, x1:x2] * (1 - a[:, :, None]) + np.asarray(color) * a[:, :, None]
+        self.alfa[y1:y2, x1:x2] = self.alfa[y1:y2, x1:x2] * (1 - a) + a
+        self._listo = None
+
+    def aplicar(self, frame, x=0, y=0):
+        if self._listo is None:
+            alfa = np.ascontiguousarray(self.alfa)
+            self._listo = (np.rint(self.color).astype(np.uint8), alfa, 1 - alfa)
+        mezclar(frame, x, y, *self._listo)
+        return frame
+
+
+class CachePaneles:
+    """Paneles construidos bajo demanda y reutilizados mientras no cambie su clave"""
+
+    def __init__(self, maximo=16):
+        self.maximo = maximo
+        self._paneles = {}
+
+    def obtener(self, clave, construir):
+        panel = self._paneles.get(clave)
+        if panel is None:
+            if len(self._paneles) >= self.maximo:
+                self._paneles.pop(next(iter(self._paneles)))
+            panel = self._paneles[clave] = construir()
+        return panel
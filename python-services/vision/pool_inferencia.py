@@ -0,0 +1,250 @@
+"""
+🧵 POOL DE PROCESOS DE INFERENCIA
+Un `predict` en CPU deja núcleos ociosos entre frames y el pre/post-proceso
+en Python está limitado por el GIL. El pool lanza N procesos, cada uno con
+su propio modelo, y les pasa los frames por memoria compartida (sin
+serializar la imagen): el padre copia el frame a una ranura libre y sólo
+envía el índice de la ranura.
+
+Los resultados se devuelven en orden de secuencia aunque los trabajadores
+terminen desordenados. Si llegan frames más rápido de lo que el pool puede
+procesar, la política decide qué hacer con los pendientes:
+
+  'descartar_antiguo'  se descarta el pendiente más viejo (baja latencia)
+  'descartar_nuevo'    se rechaza el frame que llega
+  'bloquear'           `enviar` espera a que haya hueco (no se pierde nada)
+
+Los frames descartados se entregan como (seq, None) para no frenar el orden.
+"""
+import os
+import threading
+import time
+from collections import deque
+from multiprocessing import shared_memory
+
+import multiprocessing as mp
+import numpy as np
+
+from vision.detecciones import Detecciones
+
+POLITICAS = ('descartar_antiguo', 'descartar_nuevo', 'bloquear')
+BYTES_POR_RANURA = 1280 * 720 * 3
+
+
+def _trabajador(indice, nombre_memoria, bytes_por_ranura, pesos, backend, imgsz, hilos,
+                opciones, tareas, resultados):
+    """Proceso trabajador: un modelo propio y frames leídos de la memoria compartida"""
+    from vision.modelos import cargar_modelo, limitar_hilos
+
+    # Repartir los núcleos entre trabajadores antes de cargar el modelo
+    limitar_hilos(hilos)
+
+    memoria = shared_memory.SharedMemory(name=nombre_memoria)
+    try:
+        modelo = cargar_modelo(pesos, backend, imgsz)
+        resultados.put(('listo', indice, dict(modelo.names)))
+    except Exception as e:
+        resultados.put(('fallo', indice, str(e)))
+        memoria.close()
+        return
+
+    while True:
+        tarea = tareas.get()
+        if tarea is None:
+            break
+        ranura, seq, forma = tarea
+        frame = np.ndarray(forma, dtype=np.uint8, buffer=memoria.buf, offset=ranura * bytes_por_ranura)
+        try:
+            datos = modelo.predict(frame, verbose=False, imgsz=imgsz, **opciones)[0].boxes.data
+            if hasattr(datos, 'cpu'):
+                datos = datos.cpu().numpy()
+            resultados.put(('ok', indice, (ranura, seq, np.asarray(datos, dtype=np.float32))))
+        except Exception as e:
+            resultados.put(('error', indice, (ranura, seq, str(e))))
+        del frame
+
+    memoria.close()
+
+
+class PoolInferencia:
+    """N procesos con su propio modelo; entrada por memoria compartida y salida en orden"""
+
+    def __init__(self, pesos='yolo11n.pt', backend='onnx', imgsz=640, trabajadores=None,
+                 politica='descartar_antiguo', max_pendientes=None, bytes_por_ranura=BYTES_POR_RANURA,
+                 **opciones):
+        if politica not in POLITICAS:
+            raise ValueError(f"Política no válida: {politica} (opciones: {POLITICAS})")
+
+        self.pesos = pesos
+        self.backend = backend
+        self.imgsz = imgsz
+        self.trabajadores = trabajadores or max(1, (os.cpu_count() or 2) // 2)
+        self.politica = politica
+        self.max_pendientes = max_pendientes if max_pendientes is not None else self.trabajadores
+        self.bytes_por_ranura = bytes_por_ranura
+        self.opciones = opciones
+        self.hilos = max(1, (os.cpu_count() or 1) // self.trabajadores)
+        self.nombres = {}
+
+        # Una ranura por trabajador ocupado más las de los pendientes
+        self.ranuras = self.trabajadores + self.max_pendientes
+        self._memoria = None
+        self._procesos = []
+        self._tareas = []
+        self._resultados = None
+
+        self._lock = threading.Condition()
+        self._libres = deque(range(self.ranuras))
+        self._ociosos = deque()
+        self._pendientes = deque()     # (ranura, seq, forma) esperando trabajador
+        self._listos = {}              # seq → Detecciones o None (descartado)
+        self._orden = deque()          # secuencias aceptadas aún sin entregar
+        self._activo = False
+
+        # Estadísticas
+        self.enviados = 0
+        self.procesados = 0
+        self.descartados = 0
+        self.errores = 0
+
+    def iniciar(self, timeout=300):
+        ctx = mp.get_context("spawn")
+        self._memoria = shared_memory.SharedMemory(create=True, size=self.ranuras * self.bytes_por_ranura)
+        self._resultados = ctx.Queue()
+
+        for i in range(self.trabajadores):
+            tareas = ctx.Queue()
+            proceso = ctx.Process(
+                target=_trabajador, daemon=True,
+                args=(i, self._memoria.name, self.bytes_por_ranura, self.pesos, self.backend,
+                      self.imgsz, self.hilos, self.opciones, tareas, self._resultados))
+            proceso.start()
+            self._procesos.append(proceso)
+            self._tareas.append(tareas)
+
+        # Esperar a que todos los trabajadores tengan el modelo cargado
+        for _ in range(self.trabajadores):
+            tipo, indice, contenido = self._resultados.get(timeout=timeout)
+            if tipo == 'fallo':
+                self.cerrar()
+                raise RuntimeError(f"El trabajador {indice} no pudo cargar el modelo: {contenido}")
+            self.nombres = contenido
+            self._ociosos.append(indice)
+
+        self._activo = True
+        threading.Thread(target=self._recoger, daemon=True).start()
+        return self
+
+    def enviar(self, seq, frame, timeout=None):
+        """
+        Encola un frame (las secuencias deben ser crecientes). Devuelve False si
+        la política lo rechazó o no hubo hueco dentro de `timeout`.
+        """
+        if frame.nbytes > self.bytes_por_ranura:
+            raise ValueError(f"Frame de {frame.nbytes} bytes mayor que la ranura ({self.bytes_por_ranura})")
+
+        with self._lock:
+            if not self._libres:
+                if self.politica == 'descartar_nuevo':
+                    self.descartados += 1
+                    return False
+                if self.politica == 'descartar_antiguo' and self._pendientes:
+                    ranura, seq_viejo, _ = self._pendientes.popleft()
+                    self._libres.append(ranura)
+                    self._marcar(seq_viejo, None)
+                    self.descartados += 1
+                elif not self._lock.wait_for(lambda: self._libres or not self._activo, timeout):
+                    return False
+            if not self._activo:
+                return False
+
+            ranura = self._libres.popleft()
+            destino = np.ndarray(frame.shape, dtype=np.uint8, buffer=self._memoria.buf,
+                                 offset=ranura * self.bytes_por_ranura)
+            destino[...] = frame
+            del destino
+
+            self.enviados += 1
+            self._orden.append(seq)
+            self._pendientes.append((ranura, seq, frame.shape))
+            self._despachar()
+            return True
+
+    def _despachar(self):
+        """Asigna pendientes a trabajadores ociosos (con el lock tomado)"""
+        while self._ociosos and self._pendientes:
+            indice = self._ociosos.popleft()
+            self._tareas[indice].put(self._pendientes.popleft())
+
+    def _marcar(self, seq, detecciones):
+        self._listos[seq] = detecciones
+        self._lock.notify_all()
+
+    def _recoger(self):
+        """Hilo que recibe resultados, libera ranuras y reparte trabajo"""
+        while self._activo:
+            try:
+                tipo, indice, contenido = self._resultados.get(timeout=0.5)
+            except Exception:
+                continue
+
+            ranura, seq = contenido[0], contenido[1]
+            if tipo == 'ok':
+                detecciones = Detecciones(contenido[2][:, :4], contenido[2][:, 4], contenido[2][:, 5], self.nombres)
+            else:
+                detecciones = None
+
+            with self._lock:
+                if tipo == 'ok':
+                    self.procesados += 1
+                else:
+                    self.errores += 1
+                self._libres.append(ranura)
+                self._ociosos.append(indice)
+                self._marcar(seq, detecciones)
+                self._despachar()
+
+    def tomar(self, timeout=None):
+        """
+        Siguiente resultado en orden de secuencia: (seq, Detecciones), o
+        (seq, None) si ese frame se descartó o falló. None si no hay a tiempo.
+        """
+        with self._lock:
+            listo = self._lock.wait_for(lambda: self._orden and self._orden[0] in self._listos, timeout)
+            if not listo:
+                return None
+            seq = self._orden.popleft()
+            return seq, self._listos.pop(seq)
+
+    def estadisticas(self):
+        with self._lock:
+            return {
+                'trabajadores': self.trabajadores,
+                'politica': self.politica,
+                'enviados': self.enviados,
+                'procesados': self.procesados,
+                'descartados': self.descartados,
+                'errores': self.errores,
+                'pendientes': len(self._pendientes),
+            }
+
+    def cerrar(self):
+        with self._lock:
+            self._activo = False
+            self._lock.notify_all()
+        for tareas in self._tareas:
+            tareas.put(None)
+        for proceso in self._procesos:
+            proceso.join(timeout=5)
+            if proceso.is_alive():
+                proceso.terminate()
+        if self._memoria is not None:
+            self._memoria.close()
+            self._memoria.unlink()
+            self._memoria = None
+
+    def __enter__(self):
+        return self.iniciar()
+
+    def __exit__(self, *exc):
+        self.cerrar()
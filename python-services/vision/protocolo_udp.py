@@ -0,0 +1,74 @@
+"""
+📡 PROTOCOLO UDP DE LA ESP32-CAM
+Cada frame JPEG llega como un paquete de 4 bytes con el tamaño total,
+seguido de fragmentos de hasta 1200 bytes (ver esp32-firmware/rovercamara)
+"""
+import socket
+import struct
+
+TAMANO_FRAGMENTO = 1200
+TAMANO_MIN_FRAME = 500
+TAMANO_MAX_FRAME = 200000
+MARGEN_DESBORDE = 50000
+
+
+def obtener_socket_udp(port, rcvbuf=8388608, timeout=1.0):
+    """Configura socket UDP para recibir video"""
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, rcvbuf)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind(("", port))
+    sock.settimeout(timeout)
+    return sock
+
+
+class ReensambladorJPEG:
+    """Reconstruye los JPEG a partir de los datagramas de la ESP32"""
+
+    def __init__(self):
+        self.buffer = bytearray()
+        self.expected_size = None
+        self.frames_completos = 0
+        self.frames_perdidos = 0
+
+    def agregar(self, data):
+        """Procesa un datagrama. Devuelve los bytes JPEG si se completó un frame"""
+        # Primer paquete: tamaño (4 bytes)
+        if len(data) == 4 and self.expected_size is None:
+            expected_size = struct.unpack("I", data)[0]
+            if expected_size > TAMANO_MAX_FRAME or expected_size < TAMANO_MIN_FRAME:
+                return None
+            self.expected_size = expected_size
+            self.buffer = bytearray()
+            return None
+
+        if not self.expected_size:
+            return None
+
+        self.buffer.extend(data)
+
+        if len(self.buffer) >= self.expected_size:
+            jpeg = bytes(self.buffer[:self.expected_size])
+            self.expected_size = None
+            self.buffer = bytearray()
+            self.frames_completos += 1
+            return jpeg
+
+        if len(self.buffer) > self.expected_size + MARGEN_DESBORDE:
+            self.descartar()
+
+        return None
+
+    def descartar(self):
+        """Descarta el frame a medio recibir (timeout o datos corruptos)"""
+        if self.buffer or self.expected_size:
+            self.frames_perdidos += 1
+        self.buffer = bytearray()
+        self.expected_size = None
+
+
+def enviar_jpeg_udp(sock, destino, jpeg):
+    """Envía un JPEG con el mismo formato que usa la ESP32-CAM"""
+    sock.sendto(struct.pack("I", len(jpeg)), destino)
+    for offset in range(0, len(jpeg), TAMANO_FRAGMENTO):
+        sock.sendto(jpeg[offset:offset + TAMANO_FRAGMENTO], destino)
@@ -0,0 +1,42 @@
+"""
+🔍 INFERENCIA EN REGIÓN DE INTERÉS ALREDEDOR DEL OBJETIVO
+Mientras se sigue un objetivo sólo interesa una clase cerca de su última
+posición: se recorta una región ampliada alrededor de la caja y el detector
+se ejecuta sólo sobre ese recorte y esa clase. El recorte es más pequeño que
+el frame (inferencia más rápida) y, al escalarse a imgsz, los objetivos
+lejanos ganan resolución efectiva.
+"""
+FACTOR_EXPANSION = 2.0
+TAMANO_MIN_ROI = 128
+
+
+def calcular_roi(caja, ancho, alto, factor=FACTOR_EXPANSION, minimo=TAMANO_MIN_ROI):
+    """Región cuadrada centrada en la caja, ampliada `factor` veces y dentro del frame"""
+    x1, y1, x2, y2 = caja
+    cx, cy = (x1 + x2) / 2, (y1 + y2) / 2
+    lado = max((x2 - x1) * factor, (y2 - y1) * factor, minimo)
+    lado = min(lado, ancho, alto)
+
+    rx1 = int(min(max(cx - lado / 2, 0), ancho - lado))
+    ry1 = int(min(max(cy - lado / 2, 0), alto - lado))
+    return rx1, ry1, int(rx1 + lado), int(ry1 + lado)
+
+
+def id_clase(nombres, clase):
+    """Índice de una clase a partir del diccionario `names` del modelo"""
+    for indice, nombre in nombres.items():
+        if nombre.lower() == clase.lower():
+            return int(indice)
+    return None
+
+
+def predecir_roi(modelo, frame, roi, clases=None, **opciones):
+    """
+    Ejecuta el detector sobre el recorte `roi` (x1, y1, x2, y2).
+    Devuelve (results, (dx, dy)): las cajas de results están en coordenadas
+    del recorte y hay que sumarles el desplazamiento.
+    """
+    x1, y1, x2, y2 = roi
+    recorte = frame[y1:y2, x1:x2]
+    results = modelo.predict(recorte, classes=clases, verbose=False, **opciones)
+    return results, (x1, y1)
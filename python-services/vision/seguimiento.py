@@ -0,0 +1,231 @@
+"""
+🎯 SEGUIMIENTO HÍBRIDO DETECTOR + TRACKER
+El detector (YOLO) sólo se ejecuta cada N frames o cuando la confianza cae;
+entre detecciones la caja del objetivo se propaga con flujo óptico
+(Lucas-Kanade) sobre una imagen gris reducida y se suaviza con un filtro de
+Kalman de velocidad constante. Así el controlador recibe posiciones al ritmo
+de la cámara aunque la inferencia vaya a pocos FPS.
+
+Como las detecciones llegan con retraso (pertenecen a un frame anterior), el
+seguidor guarda un historial corto de frames y, al anclar una detección,
+vuelve a propagar la caja desde ese frame hasta el más reciente.
+"""
+import threading
+import time
+from collections import deque
+
+import cv2
+import numpy as np
+
+DETECTAR_CADA = 5           # Frames entre detecciones forzadas
+CONFIANZA_MINIMA = 0.35     # Por debajo se pide una detección nueva
+DECAIMIENTO_CONFIANZA = 0.97
+ESCALA_FLUJO = 0.5          # Resolución relativa usada para el flujo óptico
+MIN_PUNTOS = 6
+MAX_FRAMES_SIN_MEDIDA = 5   # Frames sólo con predicción de Kalman antes de perder el objetivo
+TIMEOUT_DETECCION = 2.0     # Segundos antes de dar por perdida una detección pedida
+
+# Clases COCO que la interfaz permite seguir (TAB) y para las que se destila el modelo nano
+CLASES_SEGUIBLES = ("person", "car", "bicycle", "dog", "cat", "bottle", "cell phone", "laptop")
+
+
+def a_gris_reducido(frame, escala=ESCALA_FLUJO):
+    """Convierte a gris y reduce la imagen para el flujo óptico"""
+    gris = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    if escala != 1.0:
+        gris = cv2.resize(gris, None, fx=escala, fy=escala, interpolation=cv2.INTER_AREA)
+    return gris
+
+
+def iou(a, b):
+    """Intersección sobre unión de dos cajas (x1, y1, x2, y2)"""
+    ix1, iy1 = max(a[0], b[0]), max(a[1], b[1])
+    ix2, iy2 = min(a[2], b[2]), min(a[3], b[3])
+    inter = max(0.0, ix2 - ix1) * max(0.0, iy2 - iy1)
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter
+    return inter / union if union > 0 else 0.0
+
+
+class FiltroKalmanCaja:
+    """Kalman de velocidad constante sobre (cx, cy, w, h)"""
+
+    def __init__(self, ruido_proceso=1e-2, ruido_medida=1e-1):
+        kf = cv2.KalmanFilter(8, 4)
+        kf.transitionMatrix = np.eye(8, dtype=np.float32)
+        for i in range(4):
+            kf.transitionMatrix[i, i + 4] = 1.0
+        kf.measurementMatrix = np.eye(4, 8, dtype=np.float32)
+        kf.processNoiseCov = np.eye(8, dtype=np.float32) * ruido_proceso
+        kf.measurementNoiseCov = np.eye(4, dtype=np.float32) * ruido_medida
+        self.kf = kf
+
+    @staticmethod
+    def _a_medida(caja):
+        x1, y1, x2, y2 = caja
+        return np.array([[(x1 + x2) / 2], [(y1 + y2) / 2], [x2 - x1], [y2 - y1]], dtype=np.float32)
+
+    @staticmethod
+    def _a_caja(estado):
+        cx, cy, w, h = (float(v) for v in estado[:4, 0])
+        return (cx - w / 2, cy - h / 2, cx + w / 2, cy + h / 2)
+
+    def reiniciar(self, caja):
+        estado = np.zeros((8, 1), dtype=np.float32)
+        estado[:4] = self._a_medida(caja)
+        self.kf.statePost = estado
+        self.kf.errorCovPost = np.eye(8, dtype=np.float32)
+
+    def predecir(self):
+        return self._a_caja(self.kf.predict())
+
+    def corregir(self, caja):
+        return self._a_caja(self.kf.correct(self._a_medida(caja)))
+
+
+class SeguidorHibrido:
+    """Propaga la caja del objetivo entre detecciones del modelo"""
+
+    def __init__(self, detectar_cada=DETECTAR_CADA, confianza_minima=CONFIANZA_MINIMA,
+                 escala=ESCALA_FLUJO, historial=30):
+        self.detectar_cada = detectar_cada
+        self.confianza_minima = confianza_minima
+        self.escala = escala
+        self._historial = deque(maxlen=historial)
+        self._lock = threading.Lock()
+        self._kalman = FiltroKalmanCaja()
+        self._reiniciar_estado()
+
+    def _reiniciar_estado(self):
+        self.caja = None               # En coordenadas del frame original
+        self.confianza = 0.0
+        self.frames_desde_deteccion = 0
+        self._puntos = None
+        self._gris_anterior = None
+        self._sin_medida = 0
+        self._deteccion_pedida = 0.0
+
+    def reiniciar(self):
+        with self._lock:
+            self._historial.clear()
+            self._reiniciar_estado()
+
+    def necesita_deteccion(self):
+        """True si conviene lanzar el detector sobre el frame actual"""
+        with self._lock:
+            if time.time() - self._deteccion_pedida < TIMEOUT_DETECCION:
+                return False
+            return (self.caja is None
+                    or self.frames_desde_deteccion >= self.detectar_cada
+                    or self.confianza < self.confianza_minima)
+
+    def marcar_deteccion_pedida(self):
+        """Evita encolar varias detecciones mientras una está en curso"""
+        with self._lock:
+            self._deteccion_pedida = time.time()
+
+    def agregar_frame(self, seq, gris):
+        """Propaga la caja al nuevo frame; devuelve la caja o None si no hay objetivo"""
+        with self._lock:
+            self._historial.append((seq, gris))
+            if self.caja is not None:
+                self._propagar(gris)
+            self._gris_anterior = gris
+            return self.caja
+
+    def anclar(self, seq, caja, confianza):
+        """Fija la caja detectada en el frame `seq` y la trae hasta el presente"""
+        with self._lock:
+            self._deteccion_pedida = 0.0
+            frames = list(self._historial)
+            inicio = next((i for i, (s, _) in enumerate(frames) if s == seq), None)
+            if inicio is None:
+                # El frame ya salió del historial: anclar en el más reciente
+                inicio = len(frames) - 1 if frames else None
+
+            self.caja = tuple(float(v) for v in caja)
+            self.confianza = confianza
+            self.frames_desde_deteccion = 0
+            self._sin_medida = 0
+            self._kalman.reiniciar(self.caja)
+
+            if inicio is None:
+                self._puntos = None
+                self._gris_anterior = None
+                return self.caja
+
+            _, gris = frames[inicio]
+            self._gris_anterior = gris
+            self._puntos = self._buscar_puntos(gris, self.caja)
+
+            for _, gris in frames[inicio + 1:]:
+                if self.caja is None:
+                    break
+                self._propagar(gris)
+                self._gris_anterior = gris
+
+            # La propagación de recuperación no cuenta como frames sin detección
+            self.frames_desde_deteccion = 0
+            return self.caja
+
+    def perder(self):
+        """El detector no encontró el objetivo"""
+        with self._lock:
+            self._reiniciar_estado()
+
+    def _buscar_puntos(self, gris, caja):
+        x1, y1, x2, y2 = (int(v * self.escala) for v in caja)
+        h, w = gris.shape[:2]
+        x1, y1 = max(0, x1), max(0, y1)
+        x2, y2 = min(w, x2), min(h, y2)
+        if x2 - x1 < 4 or y2 - y1 < 4:
+            return None
+
+        mascara = np.zeros_like(gris)
+        mascara[y1:y2, x1:x2] = 255
+        return cv2.goodFeaturesToTrack(gris, maxCorners=40, qualityLevel=0.01,
+                                       minDistance=3, mask=mascara)
+
+    def _propagar(self, gris):
+        self.frames_desde_deteccion += 1
+        prediccion = self._kalman.predecir()
+        medida = None
+
+        if self._puntos is not None and len(self._puntos) >= MIN_PUNTOS and self._gris_anterior is not None:
+            nuevos, estado, _ = cv2.calcOpticalFlowPyrLK(
+                self._gris_anterior, gris, self._puntos, None, winSize=(15, 15), maxLevel=2)
+            ok = estado.reshape(-1) == 1
+            viejos = self._puntos.reshape(-1, 2)[ok]
+            nuevos = nuevos.reshape(-1, 2)[ok]
+
+            if len(nuevos) >= MIN_PUNTOS:
+                # Desplazamiento y escala robustos (medianas)
+                dx, dy = np.median(nuevos - viejos, axis=0) / self.escala
+                dist_vieja = np.linalg.norm(viejos - viejos.mean(axis=0), axis=1)
+                dist_nueva = np.linalg.norm(nuevos - nuevos.mean(axis=0), axis=1)
+                validos = dist_vieja > 1e-3
+                factor = float(np.median(dist_nueva[validos] / dist_vieja[validos])) if validos.any() else 1.0
+                factor = min(max(factor, 0.8), 1.25)
+
+                x1, y1, x2, y2 = self.caja
+                cx, cy = (x1 + x2) / 2 + dx, (y1 + y2) / 2 + dy
+                w, h = (x2 - x1) * factor, (y2 - y1) * factor
+                medida = (cx - w / 2, cy - h / 2, cx + w / 2, cy + h / 2)
+
+                supervivencia = len(nuevos) / len(self._puntos)
+                self.confianza *= DECAIMIENTO_CONFIANZA * (0.5 + 0.5 * supervivencia)
+                self._puntos = nuevos.reshape(-1, 1, 2)
+
+        if medida is not None:
+            self.caja = self._kalman.corregir(medida)
+            self._sin_medida = 0
+            if len(self._puntos) < 2 * MIN_PUNTOS:
+                self._puntos = self._buscar_puntos(gris, self.caja)
+        else:
+            # Sin puntos suficientes: confiar unos frames en la predicción
+            self._sin_medida += 1
+            self.confianza *= 0.5
+            if self._sin_medida > MAX_FRAMES_SIN_MEDIDA:
+                self._reiniciar_estado()
+                return
+            self.caja = prediccion
+            self._puntos = self._buscar_puntos(gris, self.caja)
@@ -0,0 +1,285 @@
+"""
+🛰️ SERVICIO DE INFERENCIA COMPARTIDO CON LOTES
+Un solo proceso carga los modelos y atiende a varias herramientas o cámaras
+por IPC local (multiprocessing.connection). Las peticiones que llegan casi a
+la vez se agrupan en un lote (hasta LOTE_MAXIMO frames o ESPERA_MAXIMA
+segundos desde la primera) y se resuelven con un único `predict`, que en CPU
+rinde bastante más que un frame por llamada en procesos separados.
+
+Protocolo (tuplas serializadas por la conexión):
+  cliente → ('hola',)                                  ← ('hola', {pesos: names}, pesos_defecto)
+  cliente → ('predecir', id, pesos, imagen, opciones)  ← ('ok', id, boxes.data) | ('error', id, texto)
+  cliente → ('estadisticas',)                          ← ('estadisticas', dict)
+
+`imagen` puede ser un array BGR o los bytes JPEG del frame (se decodifican en
+el servicio, así las fuentes UDP no decodifican dos veces).
+"""
+import queue
+import threading
+import time
+from multiprocessing.connection import Client, Listener
+
+import cv2
+import numpy as np
+
+from vision.detecciones import Detecciones
+
+DIRECCION_POR_DEFECTO = ('127.0.0.1', 6100)
+CLAVE = b'rover-vision'
+LOTE_MAXIMO = 8
+ESPERA_MAXIMA = 0.010
+
+
+def parsear_direccion(texto):
+    """'host:puerto' o ':puerto' → (host, puerto)"""
+    if not texto:
+        return DIRECCION_POR_DEFECTO
+    host, _, puerto = texto.rpartition(':')
+    return (host or DIRECCION_POR_DEFECTO[0], int(puerto))
+
+
+class _Peticion:
+    __slots__ = ('conexion', 'id', 'pesos', 'imagen', 'opciones')
+
+    def __init__(self, conexion, id_peticion, pesos, imagen, opciones):
+        self.conexion = conexion
+        self.id = id_peticion
+        self.pesos = pesos
+        self.imagen = imagen
+        self.opciones = opciones
+
+
+class _Conexion:
+    """Conexión de un cliente; varios hilos responden por ella"""
+
+    def __init__(self, conexion):
+        self.conexion = conexion
+        self.lock = threading.Lock()
+
+    def enviar(self, mensaje):
+        try:
+            with self.lock:
+                self.conexion.send(mensaje)
+        except (OSError, EOFError):
+            pass
+
+
+class ServicioInferencia:
+    """Dueño de los modelos: recibe frames de varios clientes y los procesa por lotes"""
+
+    def __init__(self, modelos, direccion=DIRECCION_POR_DEFECTO, clave=CLAVE,
+                 lote_maximo=LOTE_MAXIMO, espera_maxima=ESPERA_MAXIMA):
+        # modelos: {pesos: modelo ya cargado}; el primero es el de por defecto
+        self.modelos = dict(modelos)
+        self.pesos_defecto = next(iter(self.modelos))
+        self.direccion = direccion
+        self.clave = clave
+        self.lote_maximo = lote_maximo
+        self.espera_maxima = espera_maxima
+
+        self._cola = queue.Queue()
+        self._activo = threading.Event()
+        self._listener = None
+
+        # Estadísticas
+        self.clientes = 0
+        self.lotes = 0
+        self.frames = 0
+        self.errores = 0
+        self.ms_inferencia = 0.0
+
+    def iniciar(self):
+        self._listener = Listener(self.direccion, authkey=self.clave)
+        self._activo.set()
+        threading.Thread(target=self._aceptar, daemon=True).start()
+        threading.Thread(target=self._procesar_lotes, daemon=True).start()
+        return self
+
+    def cerrar(self):
+        self._activo.clear()
+        if self._listener is not None:
+            self._listener.close()
+
+    def _aceptar(self):
+        while self._activo.is_set():
+            try:
+                conexion = self._listener.accept()
+            except (OSError, EOFError):
+                continue
+            threading.Thread(target=self._atender, args=(_Conexion(conexion),), daemon=True).start()
+
+    def _atender(self, cliente):
+        """Lee las peticiones de un cliente y las encola para el agrupador"""
+        self.clientes += 1
+        try:
+            while self._activo.is_set():
+                mensaje = cliente.conexion.recv()
+                tipo = mensaje[0]
+                if tipo == 'predecir':
+                    _, id_peticion, pesos, imagen, opciones = mensaje
+                    self._cola.put(_Peticion(cliente, id_peticion, pesos or self.pesos_defecto, imagen, opciones))
+                elif tipo == 'hola':
+                    nombres = {pesos: dict(modelo.names) for pesos, modelo in self.modelos.items()}
+                    cliente.enviar(('hola', nombres, self.pesos_defecto))
+                elif tipo == 'estadisticas':
+                    cliente.enviar(('estadisticas', self.estadisticas()))
+        except (OSError, EOFError):
+            pass
+        finally:
+            self.clientes -= 1
+            cliente.conexion.close()
+
+    def _tomar_lote(self):
+        """Primera petición disponible más las que lleguen dentro del presupuesto de espera"""
+        try:
+            lote = [self._cola.get(timeout=0.5)]
+        except queue.Empty:
+            return []
+
+        limite = time.perf_counter() + self.espera_maxima
+        while len(lote) < self.lote_maximo:
+            restante = limite - time.perf_counter()
+            try:
+                lote.append(self._cola.get(timeout=restante) if restante > 0 else self._cola.get_nowait())
+            except queue.Empty:
+                break
+        return lote
+
+    def _procesar_lotes(self):
+        while self._activo.is_set():
+            lote = self._tomar_lote()
+
+            # Sólo se pueden agrupar peticiones al mismo modelo y con las mismas opciones
+            grupos = {}
+            for peticion in lote:
+                clave = (peticion.pesos, repr(sorted(peticion.opciones.items())))
+                grupos.setdefault(clave, []).append(peticion)
+
+            for peticiones in grupos.values():
+                self._ejecutar(peticiones)
+
+    def _ejecutar(self, peticiones):
+        modelo = self.modelos.get(peticiones[0].pesos)
+        if modelo is None:
+            for peticion in peticiones:
+                peticion.conexion.enviar(('error', peticion.id, f"Modelo no cargado: {peticion.pesos}"))
+            return
+
+        # Una imagen corrupta sólo falla su propia petición, no el lote entero
+        validas, imagenes = [], []
+        for peticion in peticiones:
+            imagen = peticion.imagen
+            if isinstance(imagen, (bytes, bytearray)):
+                try:
+                    imagen = cv2.imdecode(np.frombuffer(imagen, np.uint8), cv2.IMREAD_COLOR)
+                except cv2.error:
+                    imagen = None  # Buffer vacío
+            if imagen is None:
+                self.errores += 1
+                peticion.conexion.enviar(('error', peticion.id, "No se pudo decodificar la imagen"))
+                continue
+            validas.append(peticion)
+            imagenes.append(imagen)
+        if not validas:
+            return
+
+        inicio = time.perf_counter()
+        try:
+            resultados = modelo.predict(imagenes, verbose=False, **validas[0].opciones)
+        except Exception as e:
+            self.errores += len(validas)
+            for peticion in validas:
+                peticion.conexion.enviar(('error', peticion.id, str(e)))
+            return
+        self.ms_inferencia = (time.perf_counter() - inicio) * 1000
+
+        self.lotes += 1
+        self.frames += len(validas)
+        for peticion, resultado in zip(validas, resultados):
+            # Si esto fallara sin responder, el cliente se quedaría esperando en recv() para siempre
+            try:
+                datos = resultado.boxes.data
+                if hasattr(datos, 'cpu'):
+                    datos = datos.cpu().numpy()
+                respuesta = ('ok', peticion.id, np.asarray(datos, dtype=np.float32))
+            except Exception as e:
+                self.errores += 1
+                respuesta = ('error', peticion.id, str(e))
+            peticion.conexion.enviar(respuesta)
+
+    def estadisticas(self):
+        return {
+            'clientes': self.clientes,
+            'lotes': self.lotes,
+            'frames': self.frames,
+            'errores': self.errores,
+            'lote_medio': round(self.frames / self.lotes, 2) if self.lotes else 0.0,
+            'ms_ultimo_lote': round(self.ms_inferencia, 1),
+            'pendientes': self._cola.qsize(),
+        }
+
+
+class _Cajas:
+    __slots__ = ('data',)
+
+    def __init__(self, data):
+        self.data = data
+
+
+class ResultadoRemoto:
+    """Lo mínimo de un `Results` de ultralytics para construir Detecciones"""
+
+    __slots__ = ('boxes', 'names')
+
+    def __init__(self, data, names):
+        self.boxes = _Cajas(data)
+        self.names = names
+
+
+class ClienteInferencia:
+    """
+    Conexión a un ServicioInferencia. `predict` imita a YOLO.predict para un
+    frame, así las herramientas pueden usarlo en lugar del modelo local.
+    """
+
+    def __init__(self, direccion=DIRECCION_POR_DEFECTO, clave=CLAVE, pesos=None):
+        if isinstance(direccion, str):
+            direccion = parsear_direccion(direccion)
+        self.direccion = direccion
+        self._conexion = Client(direccion, authkey=clave)
+        self._lock = threading.Lock()
+        self._siguiente_id = 0
+
+        self._conexion.send(('hola',))
+        _, self._nombres, pesos_defecto = self._conexion.recv()
+        self.pesos = pesos or pesos_defecto
+        if self.pesos not in self._nombres:
+            raise ValueError(f"El servicio no tiene cargado {self.pesos} (disponibles: {list(self._nombres)})")
+
+    @property
+    def names(self):
+        return self._nombres[self.pesos]
+
+    def predecir(self, imagen, **opciones):
+        """Detecciones de un frame (array BGR o bytes JPEG)"""
+        return Detecciones.desde_resultado(self.predict(imagen, **opciones)[0])
+
+    def predict(self, imagen, verbose=False, **opciones):
+        """Compatible con YOLO.predict: devuelve [resultado]"""
+        with self._lock:
+            self._siguiente_id += 1
+            id_peticion = self._siguiente_id
+            self._conexion.send(('predecir', id_peticion, self.pesos, imagen, opciones))
+            tipo, _, datos = self._conexion.recv()
+
+        if tipo == 'error':
+            raise RuntimeError(f"Servicio de inferencia: {datos}")
+        return [ResultadoRemoto(datos, self.names)]
+
+    def estadisticas(self):
+        with self._lock:
+            self._conexion.send(('estadisticas',))
+            return self._conexion.recv()[1]
+
+    def cerrar(self):
+        self._conexion.close()
@@ -5,20 +5,28 @@ Calcula velocidades reales basadas en PWM (800-2000 = 0-6 cm/s)
 Sirve la cámara en tiempo real en /video_feed
 """
 
+import argparse
 import asyncio
+import os
+import sys
 import websockets
 import json
 import paho.mqtt.client as mqtt
 import threading
 import time
-import cv2
 from flask import Flask, Response
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from vision.fuentes import abrir_fuente
+from vision.mensajes_detecciones import TOPIC_CLASES, TOPIC_DETECCIONES, a_json_navegador, decodificar
+
 # ================= CONFIGURACIÓN =================
 MQTT_BROKER = "192.168.1.102"
 MQTT_PORT = 1883
 WEBSOCKET_PORT = 8765
 FLASK_PORT = 5000
+VIDEO_SOURCE = "camara://0"  # Cambiar a tu fuente real si es otra (p.ej. udp://:5005)
 
 # Velocidades físicas del rover
 PWM_MIN = 800
@@ -29,8 +37,10 @@ VELOCIDAD_MAX_CM_S = 6.0  # cm/s a PWM máximo
 velocidad_pwm_actual = 800
 comando_actual = "stop"
 velocidades_ruedas = [0.0, 0.0, 0.0, 0.0, 0.0, 0.0]  # cm/s
+nombres_clases = {}  # id → nombre, publicado retenido por el proceso de visión
 clientes_ws = set()
-frame_actual = None  # Para la cámara
+frame_actual = None  # Para la cámara (bytes JPEG del último frame)
+frame_nuevo = threading.Condition()
 control_activo = threading.Event()
 control_activo.set()
 
@@ -72,10 +82,26 @@ def on_mqtt_connect(client, userdata, flags, rc, properties=None):
     print(f"✅ MQTT conectado (código {rc})")
     client.subscribe("rover/control")
     client.subscribe("rover/speed")
+    client.subscribe(TOPIC_CLASES)
+    client.subscribe(TOPIC_DETECCIONES)
 
 def on_mqtt_message(client, userdata, msg):
-    global comando_actual, velocidad_pwm_actual, velocidades_ruedas
+    global comando_actual, velocidad_pwm_actual, velocidades_ruedas, nombres_clases
     topic = msg.topic
+
+    # Los mensajes de visión son binarios: se tratan antes de decodificar texto
+    if topic == TOPIC_CLASES:
+        nombres_clases = {int(k): v for k, v in json.loads(msg.payload).items()}
+        return
+    if topic == TOPIC_DETECCIONES:
+        try:
+            mensaje = decodificar(msg.payload, nombres_clases)
+        except Exception as e:
+            print(f"⚠️ Mensaje de detecciones no válido: {e}")
+            return
+        asyncio.run(broadcast_detecciones(a_json_navegador(mensaje)))
+        return
+
     payload = msg.payload.decode('utf-8')
 
     if topic == "rover/control":
@@ -134,27 +160,40 @@ async def broadcast_velocidades():
     })
     websockets.broadcast(clientes_ws, mensaje)
 
+async def broadcast_detecciones(detecciones):
+    if not clientes_ws:
+        return
+    websockets.broadcast(clientes_ws, json.dumps({'detecciones': detecciones}))
+
 async def main_websocket():
     async with websockets.serve(handler, "0.0.0.0", WEBSOCKET_PORT):
         print(f"🌐 WebSocket servidor escuchando en puerto {WEBSOCKET_PORT}")
         await asyncio.Future()
 
 # ================= FLASK / CAMARA =================
-def capturar_video():
+def capturar_video(source_uri=VIDEO_SOURCE):
     global frame_actual
-    cap = cv2.VideoCapture(0)  # Cambiar a tu fuente real si es otra
+    fuente = abrir_fuente(source_uri)  # La fuente marca el ritmo de captura
     while control_activo.is_set():
-        ret, frame = cap.read()
-        if ret:
-            frame_actual = frame
+        fotograma = fuente.leer(timeout=1.0)
+        if fotograma is None:
+            continue
+        jpeg = fotograma.jpeg  # Se codifica una sola vez para todos los clientes
+        if jpeg is None:
+            continue
+        with frame_nuevo:
+            frame_actual = jpeg
+            frame_nuevo.notify_all()
+    fuente.cerrar()
 
 def gen_frames():
-    global frame_actual
     while True:
-        if frame_actual is None:
+        # Esperar al siguiente frame en vez de reenviar el mismo en bucle
+        with frame_nuevo:
+            frame_nuevo.wait(timeout=1.0)
+            frame = frame_actual
+        if frame is None:
             continue
-        ret, buffer = cv2.imencode('.jpg', frame_actual)
-        frame = buffer.tobytes()
         yield (b'--frame\r\n'
                b'Content-Type: image/jpeg\r\n\r\n' + frame + b'\r\n')
 
@@ -168,19 +207,24 @@ def iniciar_flask():
 
 # ================= MAIN =================
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Puente MQTT ↔ WebSocket + cámara")
+    parser.add_argument("--fuente", default=VIDEO_SOURCE,
+                        help="camara://0, udp://:5005, archivo://<grabación>, sintetica://320x240@30")
+    args = parser.parse_args()
+
     print("=" * 70)
     print("🌉 PUENTE MQTT ↔ WebSocket + Cámara")
     print("=" * 70)
     print(f"📡 MQTT Broker: {MQTT_BROKER}:{MQTT_PORT}")
     print(f"🌐 WebSocket: ws://localhost:{WEBSOCKET_PORT}")
-    print(f"🎥 Cámara Flask: http://localhost:{FLASK_PORT}/video_feed")
+    print(f"🎥 Cámara Flask: http://localhost:{FLASK_PORT}/video_feed ({args.fuente})")
     print(f"⚙️  PWM Range: {PWM_MIN}-{PWM_MAX}")
     print(f"🏎️  Velocidad máxima: {VELOCIDAD_MAX_CM_S} cm/s")
     print("=" * 70)
     print()
 
     # Hilos de video y Flask
-    threading.Thread(target=capturar_video, daemon=True).start()
+    threading.Thread(target=capturar_video, args=(args.fuente,), daemon=True).start()
     threading.Thread(target=iniciar_flask, daemon=True).start()
 
     # Hilo MQTT